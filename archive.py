@@ -0,0 +1,237 @@
+import datetime
+import json
+import logging
+
+import database
+from birth import birth_schema
+from models import LIST_FIELDS, person_factory, select_columns
+
+# 归档分区：离职或长期未变动的人员移入 personnel_archive，主列表、查询与导出默认只读在册人员。
+# 归档表保留人员表的全部列与原 id，人才库状态随行保存，恢复时原样放回；
+# 归档与恢复都不改动修改时间与复制来源，不产生删除记录，增量导出与离线复制不把归档视为删除。
+
+# 新库默认不自动归档：定时维护按策略归档，策略由管理员以 renshi archive policy 或维护窗口设置后才生效
+DEFAULT_STATUSES = ()
+
+# 归档表在人员表列之外的列
+_ARCHIVE_COLUMNS = ('archived_at', 'archive_reason', 'in_talent_pool', 'talent_reason', 'talent_add_time')
+
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+
+def archive_schema(c):
+    """创建归档表与归档策略表；人员表新增的列同样补到归档表"""
+    c.execute('''CREATE TABLE IF NOT EXISTS personnel_archive (
+        id INTEGER PRIMARY KEY,
+        archived_at TEXT,
+        archive_reason TEXT,
+        in_talent_pool INTEGER,
+        talent_reason TEXT,
+        talent_add_time TEXT
+    )''')
+    _columns(c)
+    for name, columns in (('uuid', 'uuid'), ('division', 'province, city'), ('name_key', 'name_key'),
+                          ('phone_key', 'phone_key'), ('id_key', 'id_key'), ('archived_at', 'archived_at')):
+        unique = "UNIQUE " if name == 'uuid' else ""
+        c.execute(f"CREATE {unique}INDEX IF NOT EXISTS idx_personnel_archive_{name} ON personnel_archive({columns})")
+    # 归档人员同样按身份证号推算出生日期，含归档人员的查询与在册人员同列
+    birth_schema(c, 'personnel_archive')
+    c.execute('''CREATE TABLE IF NOT EXISTS archive_policy (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        statuses TEXT,
+        inactive_days INTEGER,
+        updated_at TEXT
+    )''')
+    c.execute("INSERT OR IGNORE INTO archive_policy (id, statuses, inactive_days, updated_at) VALUES (1, ?, 0, ?)",
+              (json.dumps(DEFAULT_STATUSES, ensure_ascii=False), datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def _columns(c):
+    """人员表的存储列（不含生成列）；归档表缺少的列在此补上"""
+    columns = [row[1] for row in c.execute("PRAGMA table_info(personnel)")]
+    existing = {row[1] for row in c.execute("PRAGMA table_info(personnel_archive)")}
+    for name in columns:
+        if name not in existing:
+            c.execute(f"ALTER TABLE personnel_archive ADD COLUMN {name} TEXT")
+    return columns
+
+
+def move_to_archive(c, condition, params=(), reason=None):
+    """把人员表中满足 condition 的行连同人才库状态移入归档表，返回归档人数"""
+    names = _columns(c)
+    c.execute("DROP TABLE IF EXISTS temp.archive_ids")
+    c.execute(f"CREATE TEMP TABLE archive_ids AS SELECT id FROM personnel WHERE {condition}", params)
+    c.execute(f"""INSERT INTO personnel_archive ({select_columns(names + list(_ARCHIVE_COLUMNS))})
+        SELECT {select_columns(names, 'p')}, {_NOW_SQL}, ?, t.id IS NOT NULL, t.reason, t.add_time
+        FROM personnel p LEFT JOIN talent_pool t ON t.id = (SELECT MAX(id) FROM talent_pool WHERE person_id = p.id)
+        WHERE p.id IN (SELECT id FROM temp.archive_ids)""", (reason,))
+    moved = c.rowcount
+    c.execute("DELETE FROM talent_pool WHERE person_id IN (SELECT id FROM temp.archive_ids)")
+    # 归档表中已有该 id，删除记录触发器不会记为删除
+    c.execute("DELETE FROM personnel WHERE id IN (SELECT id FROM temp.archive_ids)")
+    c.execute("DROP TABLE temp.archive_ids")
+    return moved
+
+
+def restore_from_archive(c, condition, params=()):
+    """把归档表中满足 condition 的行放回人员表与人才库，保留原 id、修改时间与复制来源，返回恢复人数"""
+    columns = select_columns(_columns(c))
+    c.execute("DROP TABLE IF EXISTS temp.restore_ids")
+    c.execute(f"CREATE TEMP TABLE restore_ids AS SELECT id FROM personnel_archive WHERE {condition}", params)
+    c.execute(f"INSERT INTO personnel ({columns}) SELECT {columns} FROM personnel_archive "
+              "WHERE id IN (SELECT id FROM temp.restore_ids)")
+    restored = c.rowcount
+    c.execute("INSERT INTO talent_pool (person_id, add_time, reason) SELECT id, talent_add_time, talent_reason "
+              "FROM personnel_archive WHERE in_talent_pool AND id IN (SELECT id FROM temp.restore_ids)")
+    # 新增与人才库触发器会把修改时间记为现在，恢复归档前的版本；显式设置修改时间，不触发修改时间触发器
+    c.execute("UPDATE personnel SET (updated_at, origin, origin_at) = "
+              "(SELECT a.updated_at, a.origin, a.origin_at FROM personnel_archive a WHERE a.id = personnel.id) "
+              "WHERE id IN (SELECT id FROM temp.restore_ids)")
+    c.execute("DELETE FROM personnel_archive WHERE id IN (SELECT id FROM temp.restore_ids)")
+    c.execute("DROP TABLE temp.restore_ids")
+    return restored
+
+
+def get_archive_policy():
+    with database.connect() as conn:
+        statuses, inactive_days = conn.execute("SELECT statuses, inactive_days FROM archive_policy WHERE id = 1").fetchone()
+    return {'statuses': json.loads(statuses or "[]"), 'inactive_days': inactive_days or 0}
+
+
+def describe_policy(policy):
+    parts = []
+    if policy['statuses']:
+        parts.append("在职状态为" + "、".join(policy['statuses']))
+    if policy['inactive_days']:
+        parts.append(f"超过 {policy['inactive_days']} 天未修改")
+    return "或".join(parts) if parts else "不自动归档"
+
+
+@database.retry_db_operation()
+def set_archive_policy(statuses=None, inactive_days=None):
+    """修改归档策略；statuses 为空列表、inactive_days 为 0 时不按该条件归档"""
+    try:
+        if inactive_days is not None and int(inactive_days) < 0:
+            return None, "未修改天数不能为负数"
+        with database.write_connection() as conn:
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if statuses is not None:
+                statuses = [status.strip() for status in statuses if status and status.strip()]
+                conn.execute("UPDATE archive_policy SET statuses = ?, updated_at = ? WHERE id = 1",
+                             (json.dumps(statuses, ensure_ascii=False), now))
+            if inactive_days is not None:
+                conn.execute("UPDATE archive_policy SET inactive_days = ?, updated_at = ? WHERE id = 1", (int(inactive_days), now))
+        return f"归档策略：{describe_policy(get_archive_policy())}", None
+    except Exception as e:
+        database._raise_if_busy(e)
+        logging.error(f"设置归档策略失败：{str(e)}")
+        return None, f"设置归档策略失败：{str(e)}"
+
+
+def _policy_condition(policy):
+    conditions, params = [], []
+    if policy['statuses']:
+        conditions.append(f"status IN ({', '.join('?' for _ in policy['statuses'])})")
+        params.extend(policy['statuses'])
+    if policy['inactive_days']:
+        # 以来源时间为准：其他站点合并来的旧修改不因合并而算作近期变动
+        conditions.append("COALESCE(origin_at, updated_at) < strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime', ?)")
+        params.append(f"-{int(policy['inactive_days'])} days")
+    return " OR ".join(conditions), params
+
+
+@database.retry_db_operation()
+def apply_archive_policy(dry_run=False):
+    """按归档策略归档人员，返回 (信息, 错误)；dry_run 时只统计符合条件的人数"""
+    try:
+        policy = get_archive_policy()
+        condition, params = _policy_condition(policy)
+        if not condition:
+            return "未设置归档策略，无需归档", None
+        if dry_run:
+            with database.connect() as conn:
+                count = conn.execute(f"SELECT COUNT(*) FROM personnel WHERE {condition}", params).fetchone()[0]
+            return f"符合归档策略（{describe_policy(policy)}）的人员 {count} 名", None
+        with database.write_connection() as conn:
+            c = conn.cursor()
+            moved = move_to_archive(c, condition, params, describe_policy(policy))
+            if moved:
+                c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) VALUES (?, ?, ?)",
+                          ("按策略归档", f"{moved} 人", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        if moved:
+            database.person_cache.clear()
+            database.notify_person_changes()
+        logging.info(f"按策略归档人员 {moved} 名：{describe_policy(policy)}")
+        return f"已归档 {moved} 名人员（{describe_policy(policy)}）", None
+    except Exception as e:
+        database._raise_if_busy(e)
+        logging.error(f"按策略归档失败：{str(e)}")
+        return None, f"归档失败：{str(e)}"
+
+
+@database.retry_db_operation()
+def archive_persons(person_ids, reason="手动归档"):
+    if not person_ids:
+        return None, "未选择任何人员"
+    try:
+        with database.write_connection() as conn:
+            c = conn.cursor()
+            database._stage_person_ids(c, person_ids)
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) "
+                      "SELECT '归档人员', real_name, ? FROM personnel WHERE id IN (SELECT id FROM temp.bulk_ids)", (now,))
+            moved = move_to_archive(c, "id IN (SELECT id FROM temp.bulk_ids)", (), reason)
+        database.person_cache.invalidate(person_ids)
+        database.notify_person_changes(person_ids)
+        logging.info(f"归档人员完成：{moved} 名")
+        return f"已归档 {moved} 名人员", None
+    except Exception as e:
+        database._raise_if_busy(e)
+        logging.error(f"归档人员失败：{str(e)}")
+        return None, f"归档失败：{str(e)}"
+
+
+@database.retry_db_operation()
+def restore_persons(person_ids):
+    """恢复归档人员：一次操作放回人员表，人才库状态一并恢复"""
+    if not person_ids:
+        return None, "未选择任何人员"
+    try:
+        with database.write_connection() as conn:
+            c = conn.cursor()
+            database._stage_person_ids(c, person_ids)
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) "
+                      "SELECT '恢复归档人员', real_name, ? FROM personnel_archive WHERE id IN (SELECT id FROM temp.bulk_ids)", (now,))
+            restored = restore_from_archive(c, "id IN (SELECT id FROM temp.bulk_ids)")
+        database.person_cache.invalidate(person_ids)
+        database.notify_person_changes(person_ids)
+        logging.info(f"恢复归档人员完成：{restored} 名")
+        return f"已恢复 {restored} 名人员", None
+    except Exception as e:
+        database._raise_if_busy(e)
+        logging.error(f"恢复归档人员失败：{str(e)}")
+        return None, f"恢复失败：{str(e)}"
+
+
+def list_archived(search="", fields=LIST_FIELDS, limit=None):
+    """归档人员，最近归档的在前"""
+    query = f"SELECT {select_columns(fields)}, 1 AS archived, archived_at, archive_reason FROM personnel_archive"
+    params = []
+    if search:
+        keyword, params = database._keyword_condition(search)
+        query += " WHERE " + keyword
+    query += " ORDER BY archived_at DESC, id"
+    if limit:
+        query += " LIMIT ?"
+        params.append(int(limit))
+    with database.connect() as conn:
+        conn.row_factory = person_factory
+        return conn.execute(query, params).fetchall()
+
+
+def archive_counts():
+    with database.connect() as conn:
+        hot = conn.execute("SELECT COUNT(*) FROM personnel").fetchone()[0]
+        archived = conn.execute("SELECT COUNT(*) FROM personnel_archive").fetchone()[0]
+    return hot, archived
@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+from models import LIST_FIELDS, person_factory
+
+_STOP = object()
+
+
+def _reader(name):
+    func = getattr(database, name)
+
+    @functools.wraps(func)
+    async def method(self, *args, **kwargs):
+        return await self._run_read(func, *args, **kwargs)
+    return method
+
+
+def _writer(name):
+    func = getattr(database, name)
+
+    @functools.wraps(func)
+    async def method(self, *args, **kwargs):
+        return await self._run_write(func, *args, **kwargs)
+    return method
+
+
+class AsyncDatabase:
+    """database 模块的异步版本，SQLite 操作在专用线程中执行，不阻塞事件循环
+
+    读操作由读线程池并发执行；写操作进入有界队列，由唯一的写线程按顺序执行，
+    队列满时 await 会等待，形成背压。用法：
+
+        async with AsyncDatabase() as db:
+            person_id, message, error = await db.save_person(data, "add", None)
+            async for person in db.iter_personnel(province="广东"):
+                ...
+    """
+
+    def __init__(self, max_pending_writes=100, readers=4):
+        self.max_pending_writes = max_pending_writes
+        self._read_executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="async-read")
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="async-write")
+        self._write_queue = None
+        self._writer_task = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def pending_writes(self):
+        return self._write_queue.qsize() if self._write_queue else 0
+
+    async def _run_read(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_executor, functools.partial(func, *args, **kwargs))
+
+    async def _run_write(self, func, *args, **kwargs):
+        if self._writer_task is None:
+            self._write_queue = asyncio.Queue(maxsize=self.max_pending_writes)
+            self._writer_task = asyncio.create_task(self._drain_writes())
+        future = asyncio.get_running_loop().create_future()
+        await self._write_queue.put((functools.partial(func, *args, **kwargs), future))
+        return await future
+
+    async def _drain_writes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._write_queue.get()
+            if item is _STOP:
+                break
+            call, future = item
+            # 调用方在执行前已取消的写入直接丢弃；已开始执行的写入会完成
+            if future.cancelled():
+                continue
+            try:
+                result = await loop.run_in_executor(self._write_executor, call)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+
+    async def close(self):
+        """等待已排队的写入完成后关闭线程池"""
+        if self._writer_task is not None:
+            await self._write_queue.put(_STOP)
+            await self._writer_task
+            self._writer_task = None
+        self._read_executor.shutdown(wait=True)
+        self._write_executor.shutdown(wait=True)
+        logging.info("异步数据访问已关闭")
+
+    load_admin_data = _reader('load_admin_data')
+    list_personnel = _reader('list_personnel')
+    query_personnel = _reader('query_personnel')
+    list_talent_pool = _reader('list_talent_pool')
+    get_person_detail = _reader('get_person_detail')
+    export_data = _reader('export_data')
+    export_talent_pool = _reader('export_talent_pool')
+    find_duplicates = _reader('find_duplicates')
+    get_headcount_overview = _reader('get_headcount_overview')
+
+    save_person = _writer('save_person')
+    save_and_add_to_talent_pool = _writer('save_and_add_to_talent_pool')
+    add_to_talent_pool = _writer('add_to_talent_pool')
+    delete_person = _writer('delete_person')
+    bulk_delete_persons = _writer('bulk_delete_persons')
+    bulk_add_to_talent_pool = _writer('bulk_add_to_talent_pool')
+    bulk_update_persons = _writer('bulk_update_persons')
+    bulk_remove_from_talent_pool = _writer('bulk_remove_from_talent_pool')
+    merge_persons = _writer('merge_persons')
+
+    async def import_data(self, file_paths, refresh_callback=None):
+        return await self._run_write(database.import_data, file_paths, refresh_callback or (lambda: None))
+
+    async def _iter_query(self, query, params, batch_size):
+        conn = await self._run_read(database.connect, False)
+        try:
+            conn.row_factory = person_factory
+            cursor = await self._run_read(conn.execute, query, params)
+            while True:
+                rows = await self._run_read(cursor.fetchmany, batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            await self._run_read(conn.close)
+
+    def iter_personnel(self, province=None, city=None, search=None, fields=LIST_FIELDS, batch_size=500):
+        """按批读取人员列表的异步迭代器，大结果集不必整体载入内存"""
+        query, params = database.personnel_query(province, city, search, fields)
+        return self._iter_query(query, params, batch_size)
+
+    def iter_talent_pool(self, search="", pinyin_order=False, batch_size=500):
+        query, params = database.talent_pool_query(search, pinyin_order)
+        return self._iter_query(query, params, batch_size)
@@ -0,0 +1,71 @@
+import datetime
+
+# 出生日期、生日与性别由身份证号推算：人员表与归档表上的虚拟生成列，由 id_key（校验过的18位身份证号）计算，
+# 随身份证号自动更新，不需要逐行回填；建索引时 SQLite 以一次扫描为已有人员算出全部取值。
+# 年龄随日期变化，不能存为列：按出生日期在查询时计算，出生日期未知时沿用手填的年龄（age 列）。
+# 年龄条件换算为出生日期范围，出生日期已知、未知两部分都能走 (birth_date, age) 索引。
+
+BIRTH_FIELDS = ('birth_date', 'birthday', 'id_gender')
+
+_BIRTH_TEXT = "substr(id_key, 7, 4) || '-' || substr(id_key, 11, 2) || '-' || substr(id_key, 13, 2)"
+
+GENERATED_COLUMNS = (
+    # 不存在的日期（如 2 月 30 日）经 date() 规范化后与原文不同，记为空
+    ('birth_date', f"CASE WHEN date({_BIRTH_TEXT}, '+0 days') = {_BIRTH_TEXT} THEN {_BIRTH_TEXT} END"),
+    # 月-日，用于生日名单
+    ('birthday', "substr(birth_date, 6)"),
+    # 第 17 位奇数为男、偶数为女
+    ('id_gender', "CASE substr(id_key, 17, 1) % 2 WHEN 1 THEN '男' WHEN 0 THEN '女' END"),
+)
+
+# 与 age_on 相同：当年减出生年，今年生日未到再减一；出生日期未知时为手填的年龄（非数值视为未填写）
+AGE_SQL = ("COALESCE(CAST(strftime('%Y', 'now', 'localtime') AS INTEGER) - CAST(substr(birth_date, 1, 4) AS INTEGER)"
+           " - (strftime('%m-%d', 'now', 'localtime') < birthday), CASE WHEN typeof(age) IN ('integer', 'real') THEN age END)")
+
+
+def birth_schema(c, table='personnel'):
+    """为人员表或归档表添加推算列及索引"""
+    existing = {row[1] for row in c.execute(f"PRAGMA table_xinfo({table})")}
+    for name, expression in GENERATED_COLUMNS:
+        if name not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} TEXT GENERATED ALWAYS AS ({expression}) VIRTUAL")
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_birth_age ON {table}(birth_date, age)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_birthday ON {table}(birthday)")
+
+
+def age_on(birth_date, today=None):
+    today = today or datetime.date.today()
+    return today.year - int(birth_date[:4]) - ((today.month, today.day) < (int(birth_date[5:7]), int(birth_date[8:10])))
+
+
+def birth_cutoff(age, today=None):
+    """年满 age 岁的人出生日期不晚于此日期；按字符串比较，2 月 29 日出生的同样适用"""
+    today = today or datetime.date.today()
+    return f"{today.year - age:04d}-{today.month:02d}-{today.day:02d}"
+
+
+def age_range(low, high, params, today=None):
+    """年龄在 [low, high] 之间（None 表示不限）的 SQL 条件，参数追加到 params"""
+    known, unknown = [], ["birth_date IS NULL"]
+    unknown_params = []
+    if high is not None:
+        known.append("birth_date > ?")
+        params.append(birth_cutoff(high + 1, today))
+    if low is not None:
+        known.append("birth_date <= ?")
+        params.append(birth_cutoff(low, today))
+        unknown.append("age >= ?")
+        unknown_params.append(low)
+    if high is not None:
+        unknown.append("age <= ?")
+        unknown_params.append(high)
+    else:
+        # 文本排在数值之后，早期导入留下的空字符串不能算作年龄很大
+        unknown.append("typeof(age) IN ('integer', 'real')")
+    params.extend(unknown_params)
+    return f"(({' AND '.join(known)}) OR ({' AND '.join(unknown)}))"
+
+
+def select_fields(fields):
+    """查询列表：age 换成按出生日期计算的年龄"""
+    return ", ".join(f"{AGE_SQL} AS age" if name == 'age' else name for name in fields)
@@ -0,0 +1,71 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+
+class PersonCache:
+    """按人员ID缓存详情记录的有界LRU缓存，线程安全"""
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self):
+        # 每次写入或失效都会递增，后台预取据此丢弃过期结果
+        return self._generation
+
+    def get(self, person_id):
+        key = int(person_id)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._items.pop(key, None)
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def __contains__(self, person_id):
+        with self._lock:
+            return int(person_id) in self._items
+
+    def put(self, person):
+        with self._lock:
+            self._generation += 1
+            self._store(person)
+
+    def fill(self, persons, generation):
+        # 仅当期间没有任何写入时才写回预取结果
+        with self._lock:
+            if generation != self._generation:
+                logging.debug("缓存预取结果已过期，丢弃")
+                return False
+            for person in persons:
+                if person.id not in self._items:
+                    self._store(person)
+            return True
+
+    def invalidate(self, person_ids):
+        with self._lock:
+            self._generation += 1
+            for person_id in person_ids:
+                self._items.pop(int(person_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+
+    def _store(self, person):
+        self._items[person.id] = (time.monotonic(), person)
+        self._items.move_to_end(person.id)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
@@ -0,0 +1,278 @@
+import datetime
+import json
+import logging
+import os
+import sqlite3
+
+import database
+from stats import rebuild_summary
+
+# 记录变更的表；行映像不含时间戳列，恢复时由变更时间重建；复制来源属于同步状态，也不记录
+JOURNAL_TABLES = ('personnel', 'talent_pool', 'personnel_archive')
+# 以变更时间重建时间戳的表
+_TIMESTAMPED = ('personnel', 'personnel_archive')
+_UNJOURNALED = ('created_at', 'updated_at', 'origin', 'origin_at')
+
+# 保留的基准快照个数，更早的快照及其之前的变更日志会被清理
+SNAPSHOT_KEEP = 8
+
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+
+def journal_schema():
+    return [
+        '''CREATE TABLE IF NOT EXISTS change_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            changed_at TEXT,
+            tbl TEXT,
+            op TEXT,
+            row_id INTEGER,
+            version INTEGER,
+            row_image TEXT
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_change_journal_changed_at ON change_journal(changed_at)",
+        # 行映像为按列顺序排列的 JSON 数组，列顺序随表结构变化分版本记录
+        '''CREATE TABLE IF NOT EXISTS journal_columns (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT,
+            columns TEXT,
+            created_at TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS journal_snapshot (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT,
+            taken_at TEXT,
+            journal_seq INTEGER,
+            journal_at TEXT
+        )''',
+    ]
+
+
+def _journal_columns(c, table):
+    # table_info 不含生成列，提升的 extra 属性列由 extra 计算，无需记录
+    return [row[1] for row in c.execute(f"PRAGMA table_info({table})") if row[1] not in _UNJOURNALED]
+
+
+def _triggers(table, version, columns):
+    image = "json_array(" + ", ".join(f"NEW.{name}" for name in columns) + ")"
+    changed = " OR ".join(f"OLD.{name} IS NOT NEW.{name}" for name in columns)
+    insert = "INSERT INTO change_journal (changed_at, tbl, op, row_id, version, row_image)"
+    return [
+        f"""CREATE TRIGGER trg_journal_{table}_insert AFTER INSERT ON {table} BEGIN
+            {insert} VALUES ({_NOW_SQL}, '{table}', 'I', NEW.id, {version}, {image});
+        END""",
+        # 只改时间戳的更新（由时间戳触发器产生）不记录
+        f"""CREATE TRIGGER trg_journal_{table}_update AFTER UPDATE ON {table} WHEN {changed} BEGIN
+            {insert} VALUES ({_NOW_SQL}, '{table}', 'U', NEW.id, {version}, {image});
+        END""",
+        f"""CREATE TRIGGER trg_journal_{table}_delete AFTER DELETE ON {table} BEGIN
+            {insert} VALUES ({_NOW_SQL}, '{table}', 'D', OLD.id, {version}, NULL);
+        END""",
+    ]
+
+
+def install_journal(c):
+    """创建变更日志表；表结构变化时登记新的列版本并重建记录触发器"""
+    for statement in journal_schema():
+        c.execute(statement)
+    for table in JOURNAL_TABLES:
+        columns = _journal_columns(c, table)
+        c.execute("SELECT version, columns FROM journal_columns WHERE tbl=? ORDER BY version DESC LIMIT 1", (table,))
+        latest = c.fetchone()
+        c.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name LIKE ?", (f"trg_journal_{table}_%",))
+        if latest and json.loads(latest[1]) == columns and c.fetchone()[0] == 3:
+            continue
+        c.execute("INSERT INTO journal_columns (tbl, columns, created_at) VALUES (?, ?, ?)",
+                  (table, json.dumps(columns), datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        version = c.lastrowid
+        for op in ('insert', 'update', 'delete'):
+            c.execute(f"DROP TRIGGER IF EXISTS trg_journal_{table}_{op}")
+        for statement in _triggers(table, version, columns):
+            c.execute(statement)
+        logging.info(f"变更日志：{table} 表记录触发器已更新为第 {version} 版列结构")
+
+
+def snapshot_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(database.DB_PATH)), "snapshots")
+
+
+def _copy_database(source, target_path):
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+
+
+@database.retry_db_operation()
+def take_snapshot():
+    """以在线备份生成基准快照，快照中的最大日志序号即为回放起点"""
+    try:
+        os.makedirs(snapshot_dir(), exist_ok=True)
+        taken_at = datetime.datetime.now()
+        path = os.path.join(snapshot_dir(), f"snapshot-{taken_at:%Y%m%d-%H%M%S}.db")
+        if os.path.exists(path):
+            os.remove(path)
+        source = database.connect()
+        try:
+            _copy_database(source, path)
+        finally:
+            source.close()
+        conn = sqlite3.connect(path)
+        try:
+            journal_seq, journal_at = conn.execute("SELECT MAX(seq), MAX(changed_at) FROM change_journal").fetchone()
+        finally:
+            conn.close()
+        with database.write_connection() as conn:
+            conn.execute("INSERT INTO journal_snapshot (path, taken_at, journal_seq, journal_at) VALUES (?, ?, ?, ?)",
+                         (path, taken_at.strftime("%Y-%m-%d %H:%M:%S"), journal_seq or 0, journal_at or ""))
+            pruned = _prune(conn)
+        logging.info(f"基准快照已保存：{path}，日志序号 {journal_seq or 0}")
+        message = f"基准快照已保存：{os.path.basename(path)}"
+        if pruned:
+            message += f"，清理变更日志 {pruned} 条"
+        return message, None
+    except Exception as e:
+        database._raise_if_busy(e)
+        logging.error(f"保存基准快照失败：{str(e)}")
+        return None, f"保存快照失败：{str(e)}"
+
+
+def _prune(conn):
+    # 只保留最近 SNAPSHOT_KEEP 个快照；最早保留快照之前的日志已不可能被回放
+    old = conn.execute("SELECT id, path FROM journal_snapshot ORDER BY id DESC LIMIT -1 OFFSET ?", (SNAPSHOT_KEEP,)).fetchall()
+    if not old:
+        return 0
+    conn.execute(f"DELETE FROM journal_snapshot WHERE id IN ({', '.join('?' for _ in old)})", [sid for sid, _ in old])
+    oldest_seq = conn.execute("SELECT MIN(journal_seq) FROM journal_snapshot").fetchone()[0] or 0
+    pruned = conn.execute("DELETE FROM change_journal WHERE seq <= ?", (oldest_seq,)).rowcount
+    for _, path in old:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.warning(f"删除过期快照 {path} 失败：{str(e)}")
+    return pruned
+
+
+def list_snapshots():
+    with database.connect() as conn:
+        return conn.execute("SELECT id, path, taken_at, journal_seq, journal_at FROM journal_snapshot ORDER BY id").fetchall()
+
+
+def _normalize_time(value):
+    """接受 "YYYY-MM-DD"、"YYYY-MM-DD HH:MM[:SS]" 等格式，转为与日志一致的毫秒精度字符串"""
+    try:
+        moment = datetime.datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"时间格式无效：{value}")
+    return moment.strftime("%Y-%m-%d %H:%M:%S.") + f"{moment.microsecond // 1000:03d}"
+
+
+def _select_snapshot(as_of):
+    with database.connect() as conn:
+        return conn.execute("SELECT id, path, journal_seq, journal_at FROM journal_snapshot "
+                            "WHERE journal_at <= ? ORDER BY journal_seq DESC, id DESC LIMIT 1", (as_of,)).fetchone()
+
+
+def _replay(c, snapshot_seq, snapshot_at, as_of):
+    """在恢复目标库上批量回放：每行只取最后一次变更的映像，按列版本整批写入"""
+    c.execute("CREATE TEMP TABLE replay AS SELECT * FROM src.change_journal WHERE seq > ? AND changed_at <= ?",
+              (snapshot_seq, as_of))
+    c.execute("""CREATE TEMP TABLE final AS SELECT * FROM (
+        SELECT r.*, MIN(CASE WHEN op = 'I' THEN changed_at END) OVER w AS inserted_at,
+               ROW_NUMBER() OVER (PARTITION BY tbl, row_id ORDER BY seq DESC) AS rn
+        FROM temp.replay r WINDOW w AS (PARTITION BY tbl, row_id)) WHERE rn = 1""")
+    c.execute("CREATE INDEX temp.idx_final ON final(tbl, row_id)")
+    c.execute("UPDATE temp.final SET inserted_at = COALESCE((SELECT p.created_at FROM main.personnel p WHERE p.id = final.row_id), "
+              "inserted_at) WHERE tbl = 'personnel'")
+    versions = {version: json.loads(columns) for version, columns in c.execute("SELECT version, columns FROM src.journal_columns")}
+    for table in JOURNAL_TABLES:
+        existing = {row[1] for row in c.execute(f"PRAGMA main.table_info({table})")}
+        if not existing:
+            # 快照早于该表创建时，按当前库的定义补建
+            c.execute(c.execute("SELECT sql FROM src.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0])
+            existing = {row[1] for row in c.execute(f"PRAGMA main.table_info({table})")}
+        c.execute(f"DELETE FROM main.{table} WHERE id IN (SELECT row_id FROM temp.final WHERE tbl = ?)", (table,))
+        for (version,) in c.execute("SELECT DISTINCT version FROM temp.final WHERE tbl = ? AND op != 'D'", (table,)).fetchall():
+            columns = versions[version]
+            for name in columns:
+                if name not in existing:
+                    c.execute(f"ALTER TABLE main.{table} ADD COLUMN {name} TEXT")
+                    existing.add(name)
+            targets = list(columns)
+            values = [f"json_extract(row_image, '$[{i}]')" for i in range(len(columns))]
+            if table in _TIMESTAMPED:
+                targets += ['created_at', 'updated_at']
+                values += ['inserted_at', 'changed_at']
+            c.execute(f"INSERT INTO main.{table} ({', '.join(targets)}) SELECT {', '.join(values)} "
+                      f"FROM temp.final WHERE tbl = ? AND version = ? AND op != 'D'", (table, version))
+    # 快照可能早于删除记录表增加列，只复制两边共有的列
+    existing = {row[1] for row in c.execute("PRAGMA main.table_info(personnel_deleted)")}
+    deleted_columns = ", ".join(row[1] for row in c.execute("PRAGMA src.table_info(personnel_deleted)") if row[1] in existing)
+    c.execute(f"INSERT INTO main.personnel_deleted ({deleted_columns}) SELECT {deleted_columns} FROM src.personnel_deleted "
+              "WHERE deleted_at > ? AND deleted_at <= ?", (snapshot_at, as_of))
+    c.execute("INSERT OR IGNORE INTO main.journal_columns SELECT * FROM src.journal_columns")
+    c.execute("INSERT INTO main.change_journal SELECT * FROM temp.replay")
+    return c.execute("SELECT COUNT(*) FROM temp.replay").fetchone()[0], c.execute("SELECT COUNT(*) FROM temp.final").fetchone()[0]
+
+
+def restore_to(as_of, target_path):
+    """将数据库恢复到 as_of 时刻的状态并写入 target_path，当前数据库不受影响"""
+    try:
+        as_of = _normalize_time(as_of)
+        snapshot = _select_snapshot(as_of)
+        if snapshot is None:
+            return None, "没有早于该时间的基准快照，无法恢复"
+        snapshot_id, snapshot_path, snapshot_seq, snapshot_at = snapshot
+        if os.path.abspath(target_path) == os.path.abspath(database.DB_PATH):
+            return None, "恢复目标不能是当前数据库"
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        source = sqlite3.connect(snapshot_path)
+        try:
+            _copy_database(source, target_path)
+        finally:
+            source.close()
+        target = sqlite3.connect(target_path, isolation_level=None)
+        try:
+            c = target.cursor()
+            c.execute("ATTACH DATABASE ? AS src", (os.path.abspath(database.DB_PATH),))
+            c.execute("BEGIN")
+            # 回放期间移除触发器，避免重复记录日志和重复计数，完成后原样重建
+            triggers = c.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger'").fetchall()
+            for name, _ in triggers:
+                c.execute(f"DROP TRIGGER {name}")
+            replayed, rows = _replay(c, snapshot_seq, snapshot_at, as_of)
+            for _, sql in triggers:
+                c.execute(sql)
+            rebuild_summary(c)
+            c.execute("COMMIT")
+            c.execute("DETACH DATABASE src")
+        except BaseException:
+            if target.in_transaction:
+                target.rollback()
+            raise
+        finally:
+            target.close()
+        logging.info(f"已恢复到 {as_of}：快照 {snapshot_id}，回放 {replayed} 条变更，涉及 {rows} 行")
+        return f"已恢复到 {as_of}：基于 {os.path.basename(snapshot_path)}，回放 {replayed} 条变更", None
+    except Exception as e:
+        logging.error(f"时间点恢复失败：{str(e)}")
+        return None, f"恢复失败：{str(e)}"
+
+
+def export_change_set(since=None, until=None):
+    """导出时间范围内的变更，含列版本说明，可用 json 序列化"""
+    since = _normalize_time(since) if since else ""
+    until = _normalize_time(until) if until else "9999"
+    with database.connect() as conn:
+        columns = {version: {'table': table, 'columns': json.loads(names)}
+                   for version, table, names in conn.execute("SELECT version, tbl, columns FROM journal_columns")}
+        changes = [[seq, changed_at, table, op, row_id, version, json.loads(image) if image else None]
+                   for seq, changed_at, table, op, row_id, version, image in conn.execute(
+                       "SELECT seq, changed_at, tbl, op, row_id, version, row_image FROM change_journal "
+                       "WHERE changed_at > ? AND changed_at <= ? ORDER BY seq", (since, until))]
+    used = {change[5] for change in changes}
+    return {'since': since or None, 'until': None if until == "9999" else until,
+            'columns': {str(version): info for version, info in columns.items() if version in used},
+            'changes': changes}
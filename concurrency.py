@@ -0,0 +1,83 @@
+import random
+import sqlite3
+import threading
+from collections import defaultdict
+
+# 单次等待锁的上限（秒），超时后由退避重试接管
+BUSY_TIMEOUT = 5.0
+
+_BUSY_CODES = {getattr(sqlite3, name) for name in ('SQLITE_BUSY', 'SQLITE_LOCKED') if hasattr(sqlite3, name)}
+
+
+class DatabaseBusyError(Exception):
+    """多次重试后数据库仍被其他进程占用"""
+
+
+def is_busy_error(error):
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None and (code & 0xFF) in _BUSY_CODES:
+        return True
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message or "database table is locked" in message
+
+
+def backoff_delays(max_attempts, base_delay, max_delay):
+    """指数退避并加入随机抖动，避免多个进程同时醒来再次冲突"""
+    for attempt in range(max_attempts - 1):
+        delay = min(max_delay, base_delay * (2 ** attempt))
+        yield random.uniform(delay / 2, delay * 1.5)
+
+
+class ContentionStats:
+    """记录本进程的锁等待时间与重试次数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.lock_waits = 0
+            self.lock_wait_total = 0.0
+            self.lock_wait_max = 0.0
+            self.calls = defaultdict(int)
+            self.retries = defaultdict(int)
+            self.failures = defaultdict(int)
+            self.backoff_total = 0.0
+
+    def record_lock_wait(self, seconds):
+        with self._lock:
+            self.lock_waits += 1
+            self.lock_wait_total += seconds
+            self.lock_wait_max = max(self.lock_wait_max, seconds)
+
+    def record_call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def record_retry(self, name, delay):
+        with self._lock:
+            self.retries[name] += 1
+            self.backoff_total += delay
+
+    def record_failure(self, name):
+        with self._lock:
+            self.failures[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'lock_waits': self.lock_waits,
+                'lock_wait_total': self.lock_wait_total,
+                'lock_wait_max': self.lock_wait_max,
+                'lock_wait_avg': self.lock_wait_total / self.lock_waits if self.lock_waits else 0.0,
+                'calls': dict(self.calls),
+                'retries': dict(self.retries),
+                'failures': dict(self.failures),
+                'backoff_total': self.backoff_total,
+            }
+
+
+contention_stats = ContentionStats()
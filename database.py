@@ -2,32 +2,144 @@ import sqlite3
 import logging
 import time
 import functools
+import contextlib
+import os
 import datetime
+import json
+import csv
+import uuid
+import re
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import openpyxl
 from openpyxl.styles import Alignment, Font
+from models import FORM_FIELDS, LIST_FIELDS, TALENT_LIST_FIELDS, DETAIL_FIELDS, PINYIN_FIELDS, SYNC_FIELDS, EXPORT_FIELDS, FIELD_LABELS, person_factory, select_columns
+from cache import PersonCache
+from dedup import KEY_FIELDS, person_keys, register_functions, find_duplicate_groups
+from filters import compile_filter, compile_order
+from pinyin import person_pinyin, is_pinyin_query, backfill_pinyin, available as pinyin_available
+from stats import STAT_DIMENSIONS, summary_schema, rebuild_summary, headcount, age_brackets
+from birth import AGE_SQL, birth_schema, select_fields
+import divisions
+from concurrency import BUSY_TIMEOUT, DatabaseBusyError, is_busy_error, backoff_delays, contention_stats
+from querylog import TimedConnection
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def retry_db_operation(max_attempts=3, delay=0.5):
+DB_PATH = os.environ.get('RENSHI_DB', 'hr_data.db')
+
+# 分会模式（--branch）下 DB_PATH 是本省的分库，只能保存本省的人员；为 None 时不限制
+BRANCH_PROVINCE = os.environ.get('RENSHI_BRANCH') or None
+
+# 数据库结构版本，记录在 PRAGMA user_version 中；migrate_db 增加迁移步骤时加一
+SCHEMA_VERSION = 5
+
+person_cache = PersonCache(maxsize=256)
+_prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="person-prefetch")
+
+# 人员表变更通知：写入提交后以变更的人员 ID 列表调用各回调，None 表示变更范围未知（如导入、合并变更集）
+_change_listeners = []
+
+def add_change_listener(callback):
+    _change_listeners.append(callback)
+
+def remove_change_listener(callback):
+    if callback in _change_listeners:
+        _change_listeners.remove(callback)
+
+def notify_person_changes(person_ids=None):
+    # 回调出错只记录日志，不影响已提交的写入
+    for callback in list(_change_listeners):
+        try:
+            callback(None if person_ids is None else list(person_ids))
+        except Exception as e:
+            logging.warning(f"人员变更通知处理失败：{str(e)}")
+
+def retry_db_operation(max_attempts=5, delay=0.1, max_delay=2.0):
+    """数据库被其他进程锁定时按指数退避（带随机抖动）重试，重试耗尽后抛出 DatabaseBusyError"""
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            for attempt in range(max_attempts):
+            contention_stats.record_call(func.__name__)
+            delays = backoff_delays(max_attempts, delay, max_delay)
+            attempt = 0
+            while True:
                 try:
                     return func(*args, **kwargs)
                 except sqlite3.OperationalError as e:
-                    if "database is locked" in str(e) and attempt < max_attempts - 1:
-                        logging.warning(f"数据库锁冲突，重试 {attempt + 1}/{max_attempts}")
-                        time.sleep(delay)
-                    else:
+                    if not is_busy_error(e):
                         raise
-            raise Exception("数据库操作失败：超过最大重试次数")
+                    wait = next(delays, None)
+                    if wait is None:
+                        contention_stats.record_failure(func.__name__)
+                        logging.error(f"数据库锁冲突，{func.__name__} 重试 {max_attempts - 1} 次后仍失败")
+                        raise DatabaseBusyError("数据库正被其他用户使用，请稍后重试") from e
+                    attempt += 1
+                    contention_stats.record_retry(func.__name__, wait)
+                    logging.warning(f"数据库锁冲突，{wait:.2f} 秒后重试 {func.__name__} {attempt}/{max_attempts - 1}")
+                    time.sleep(wait)
         return wrapper
     return decorator
 
-def init_db():
-    with sqlite3.connect('hr_data.db') as conn:
+def _raise_if_busy(e):
+    # 锁冲突交给 retry_db_operation 退避重试，不在函数内转成错误信息
+    if is_busy_error(e):
+        raise e
+
+def set_db_path(path):
+    global DB_PATH
+    DB_PATH = path
+    person_cache.clear()
+    notify_person_changes()
+
+def set_branch(province):
+    global BRANCH_PROVINCE
+    BRANCH_PROVINCE = province
+
+def _branch_problem(province):
+    """分会模式下其他省份的人员不能写入本省分库，返回提示；path 明确指定分库的写入不经此检查"""
+    if BRANCH_PROVINCE is None:
+        return None
+    from shards import UNKNOWN_PROVINCE, province_key
+    key = province_key(province)
+    if key == BRANCH_PROVINCE:
+        return None
+    if key == UNKNOWN_PROVINCE:
+        return f"请填写省份（本分会为{BRANCH_PROVINCE}）"
+    return f"{key}的人员不属于本分会（{BRANCH_PROVINCE}），请由{key}分会或总部录入"
+
+def connect(check_same_thread=True, path=None):
+    """读连接：等待写锁释放最多 BUSY_TIMEOUT 秒；path 默认为 DB_PATH"""
+    return sqlite3.connect(path or DB_PATH, timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread, factory=TimedConnection)
+
+@contextlib.contextmanager
+def write_connection(path=None):
+    """写事务连接：开始即以 BEGIN IMMEDIATE 取得写锁，避免两个进程都持有读锁后互相等待升级
+
+    正常退出时提交，异常时回滚，最后关闭连接。path 默认为 DB_PATH。
+    """
+    conn = sqlite3.connect(path or DB_PATH, timeout=BUSY_TIMEOUT, isolation_level=None, factory=TimedConnection)
+    try:
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        finally:
+            waited = time.perf_counter() - started
+            contention_stats.record_lock_wait(waited)
+        if waited >= 1:
+            logging.warning(f"等待数据库写锁 {waited:.2f} 秒")
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def init_db(path=None):
+    with write_connection(path) as conn:
         c = conn.cursor()
         c.execute('''CREATE TABLE IF NOT EXISTS personnel (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -49,8 +161,21 @@ def init_db():
             donation_days TEXT,
             address TEXT,
             bio TEXT,
-            photo_path TEXT
+            photo_path TEXT,
+            extra TEXT,
+            name_key TEXT,
+            phone_key TEXT,
+            id_key TEXT,
+            name_pinyin TEXT,
+            name_initials TEXT,
+            city_pinyin TEXT,
+            uuid TEXT,
+            origin TEXT,
+            origin_at TEXT,
+            created_at TEXT,
+            updated_at TEXT
         )''')
+        _create_key_indexes(c)
         c.execute('''CREATE TABLE IF NOT EXISTS operation_log (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             operation_type TEXT,
@@ -64,22 +189,122 @@ def init_db():
             reason TEXT,
             FOREIGN KEY (person_id) REFERENCES personnel(id)
         )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS extra_promoted (
+            key TEXT PRIMARY KEY,
+            column_name TEXT UNIQUE,
+            promoted_at TEXT
+        )''')
         c.execute('''CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             password_hash TEXT,
             password_enabled INTEGER DEFAULT 1  -- 新增字段
         )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS icons (
+            name TEXT PRIMARY KEY,
+            data BLOB
+        )''')
         conn.commit()
     logging.info("数据库初始化完成")
 
-def migrate_db():
-    with sqlite3.connect('hr_data.db') as conn:
+def _user_version():
+    # 末位记录迁移时是否已安装 pypinyin：之后安装的，下次启动仍会执行一次迁移回填拼音
+    return SCHEMA_VERSION * 2 + int(pinyin_available())
+
+def schema_is_current(path=None):
+    with connect(path=path) as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    return version // 2 >= SCHEMA_VERSION and (version % 2 == 1 or not pinyin_available())
+
+def ensure_schema(path=None):
+    """启动时的结构检查：只读取一次 user_version，已是当前版本时跳过建表与迁移；返回是否执行了迁移。path 默认为 DB_PATH"""
+    if schema_is_current(path):
+        return False
+    init_db(path)
+    migrate_db(path)
+    return True
+
+def migrate_db(path=None):
+    with write_connection(path) as conn:
         c = conn.cursor()
         c.execute("PRAGMA table_info(talent_pool)")
         columns = [info[1] for info in c.fetchall()]
         if 'reason' not in columns:
             c.execute("ALTER TABLE talent_pool ADD COLUMN reason TEXT")
             logging.info("数据库迁移：talent_pool 表添加 reason 列")
+        c.execute("PRAGMA table_info(personnel)")
+        columns = [info[1] for info in c.fetchall()]
+        if 'extra' not in columns:
+            c.execute("ALTER TABLE personnel ADD COLUMN extra TEXT")
+            logging.info("数据库迁移：personnel 表添加 extra 列")
+        _fold_legacy_columns(c, columns)
+        missing_keys = [key for key in KEY_FIELDS if key not in columns]
+        for key in missing_keys:
+            c.execute(f"ALTER TABLE personnel ADD COLUMN {key} TEXT")
+        if missing_keys:
+            _create_key_indexes(c)
+            register_functions(conn)
+            c.execute("UPDATE personnel SET name_key = normalize_name(real_name), phone_key = normalize_phone(phone), "
+                      "id_key = normalize_id_number(id_number)")
+            logging.info(f"数据库迁移：personnel 表添加查重键并回填 {c.rowcount} 条")
+        missing_timestamps = [name for name in TIMESTAMP_FIELDS if name not in columns]
+        for name in missing_timestamps:
+            c.execute(f"ALTER TABLE personnel ADD COLUMN {name} TEXT")
+        missing_pinyin = [name for name in PINYIN_FIELDS if name not in columns]
+        for name in missing_pinyin:
+            c.execute(f"ALTER TABLE personnel ADD COLUMN {name} TEXT")
+        if missing_pinyin:
+            logging.info("数据库迁移：personnel 表添加拼音列")
+        _create_filter_indexes(c)
+        birth_schema(c)
+        # 新增列，或此前未安装 pypinyin 时留空的拼音在此补齐
+        backfill_pinyin(c)
+        missing_sync = [name for name in SYNC_FIELDS if name not in columns]
+        if missing_sync:
+            # 修改时间与删除记录触发器需要按复制列重建；在此之前回填行标识，不改动各行的修改时间
+            c.execute("DROP TRIGGER IF EXISTS trg_personnel_updated")
+            c.execute("DROP TRIGGER IF EXISTS trg_personnel_deleted")
+            for name in missing_sync:
+                c.execute(f"ALTER TABLE personnel ADD COLUMN {name} TEXT")
+            c.execute("UPDATE personnel SET uuid = lower(hex(randomblob(16))) WHERE uuid IS NULL")
+            logging.info(f"数据库迁移：personnel 表添加复制列并为 {c.rowcount} 人生成行标识")
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_personnel_uuid ON personnel(uuid)")
+        c.execute("PRAGMA table_info(personnel_deleted)")
+        deleted_columns = [info[1] for info in c.fetchall()]
+        for name in SYNC_FIELDS:
+            if deleted_columns and name not in deleted_columns:
+                c.execute(f"ALTER TABLE personnel_deleted ADD COLUMN {name} TEXT")
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='personnel_archive'")
+        if c.fetchone() is None:
+            # 删除记录触发器需要跳过归档的人员，按新定义重建
+            c.execute("DROP TRIGGER IF EXISTS trg_personnel_deleted")
+            logging.info("数据库迁移：创建人员归档表")
+        from archive import archive_schema
+        archive_schema(c)
+        # 早期导入去掉“省”“市”时留下的不规范名称按行政区划改正。这不是本地修改：先去掉修改时间触发器
+        # （随后由 _change_tracking_schema 重建），各行的修改时间与复制来源保持不变，增量导出与离线复制不会重发
+        c.execute("DROP TRIGGER IF EXISTS trg_personnel_updated")
+        for table in ("personnel", "personnel_archive"):
+            divisions.normalize_divisions(c, table)
+        for statement in _change_tracking_schema():
+            c.execute(statement)
+        if missing_timestamps:
+            c.execute(f"UPDATE personnel SET created_at = COALESCE(created_at, {_NOW_SQL}), updated_at = COALESCE(updated_at, {_NOW_SQL})")
+            logging.info("数据库迁移：personnel 表添加 created_at/updated_at 列")
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='headcount_summary'")
+        summary_exists = c.fetchone() is not None
+        for statement in summary_schema():
+            c.execute(statement)
+        if not summary_exists:
+            rebuild_summary(c)
+            logging.info("数据库迁移：创建统计汇总表并完成初始汇总")
+        from maintenance import maintenance_schema
+        for statement in maintenance_schema():
+            c.execute(statement)
+        from cdc import install_journal
+        install_journal(c)
+        from replication import replication_schema
+        for statement in replication_schema():
+            c.execute(statement)
         c.execute("PRAGMA table_info(users)")
         columns = [info[1] for info in c.fetchall()]
         if not columns:
@@ -94,99 +319,224 @@ def migrate_db():
             from utils import hash_password
             c.execute("INSERT INTO users (id, password_hash, password_enabled) VALUES (1, ?, 1)", (hash_password('123456'),))
             logging.info("初始化默认密码")
+        c.execute(f"PRAGMA user_version = {_user_version()}")
         conn.commit()
     logging.info("数据库迁移检查完成")
 
+TIMESTAMP_FIELDS = ('created_at', 'updated_at')
+
+# 毫秒精度的本地时间，增量导出按此比较
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+def _change_tracking_schema():
+    return [
+        "CREATE INDEX IF NOT EXISTS idx_personnel_updated_at ON personnel(updated_at)",
+        '''CREATE TABLE IF NOT EXISTS personnel_deleted (
+            person_id INTEGER,
+            real_name TEXT,
+            phone TEXT,
+            id_number TEXT,
+            province TEXT,
+            city TEXT,
+            deleted_at TEXT,
+            uuid TEXT,
+            origin TEXT,
+            origin_at TEXT
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_personnel_deleted_at ON personnel_deleted(deleted_at)",
+        "CREATE INDEX IF NOT EXISTS idx_personnel_deleted_uuid ON personnel_deleted(uuid)",
+        '''CREATE TABLE IF NOT EXISTS export_watermark (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scope TEXT,
+            watermark TEXT,
+            exported_at TEXT,
+            changed_count INTEGER,
+            deleted_count INTEGER
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_export_watermark_scope ON export_watermark(scope, id)",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_personnel_created AFTER INSERT ON personnel BEGIN
+            UPDATE personnel SET created_at = COALESCE(NEW.created_at, {_NOW_SQL}), updated_at = {_NOW_SQL} WHERE id = NEW.id;
+        END""",
+        # 本站修改即为本站的变更，清除合并时记录的来源；合并写入时显式设置修改时间与来源时间，不会触发
+        f"""CREATE TRIGGER IF NOT EXISTS trg_personnel_updated AFTER UPDATE ON personnel
+        WHEN NEW.updated_at IS OLD.updated_at AND NEW.origin_at IS OLD.origin_at BEGIN
+            UPDATE personnel SET updated_at = {_NOW_SQL}, origin = NULL, origin_at = NULL WHERE id = NEW.id;
+        END""",
+        # 移入归档表不是删除，不记删除记录（见 archive 模块）
+        f"""CREATE TRIGGER IF NOT EXISTS trg_personnel_deleted AFTER DELETE ON personnel
+        WHEN NOT EXISTS (SELECT 1 FROM personnel_archive a WHERE a.id = OLD.id) BEGIN
+            INSERT INTO personnel_deleted (person_id, real_name, phone, id_number, province, city, deleted_at, uuid)
+            VALUES (OLD.id, OLD.real_name, OLD.phone, OLD.id_number, OLD.province, OLD.city, {_NOW_SQL}, OLD.uuid);
+        END""",
+        # 保存时已生成行标识，其余途径插入的行在此补上
+        """CREATE TRIGGER IF NOT EXISTS trg_personnel_uuid AFTER INSERT ON personnel WHEN NEW.uuid IS NULL BEGIN
+            UPDATE personnel SET uuid = lower(hex(randomblob(16))) WHERE id = NEW.id;
+        END""",
+    ] + [
+        # 加入、移出人才库也算人员的变更，增量导出与离线复制都依据修改时间
+        f"""CREATE TRIGGER IF NOT EXISTS trg_talent_pool_touch_{event.lower()} AFTER {event} ON talent_pool BEGIN
+            UPDATE personnel SET updated_at = {_NOW_SQL}, origin = NULL, origin_at = NULL WHERE id = {row}.person_id;
+        END"""
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD"))
+    ]
+
+def _create_filter_indexes(c):
+    # 常用筛选与排序列
+    c.execute("CREATE INDEX IF NOT EXISTS idx_personnel_division ON personnel(province, city)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_personnel_status ON personnel(status)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_personnel_position ON personnel(position)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_personnel_age ON personnel(age)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_personnel_join_date ON personnel(join_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_personnel_name_pinyin ON personnel(name_pinyin)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_personnel_name_initials ON personnel(name_initials)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_talent_pool_person ON talent_pool(person_id)")
+
+def _create_key_indexes(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_personnel_name_key ON personnel(name_key, province)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_personnel_phone_key ON personnel(phone_key)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_personnel_id_key ON personnel(id_key)")
+
+def _extra_path(key):
+    return '$."' + str(key).replace('"', '') + '"'
+
+def _extra_value_sql(key):
+    # SQLite 的 JSON 路径无法表示含双引号的键名，这类属性改由 json_each 按键名取值
+    if '"' in str(key):
+        return f"(SELECT value FROM json_each(extra) WHERE key = {_quote_literal(key)})"
+    return f"json_extract(extra, {_quote_literal(_extra_path(key))})"
+
+def _quote_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _fold_legacy_columns(c, columns):
+    # 早期导入通过 ALTER TABLE 追加的列并入 extra，随后删除该列
+    legacy = [col for col in columns if col not in DETAIL_FIELDS + KEY_FIELDS + PINYIN_FIELDS + SYNC_FIELDS + TIMESTAMP_FIELDS]
+    for col in legacy:
+        c.execute(f"UPDATE personnel SET extra = json_set(COALESCE(extra, '{{}}'), ?, {_quote_identifier(col)}) "
+                  f"WHERE {_quote_identifier(col)} IS NOT NULL AND {_quote_identifier(col)} != ''", (_extra_path(col),))
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            c.execute(f"ALTER TABLE personnel DROP COLUMN {_quote_identifier(col)}")
+        logging.info(f"数据库迁移：列 {col} 已并入 extra")
+
 def load_admin_data():
-    admin_data = {}
-    with sqlite3.connect('hr_data.db') as conn:
-        c = conn.cursor()
-        c.execute("SELECT DISTINCT province FROM personnel WHERE province IS NOT NULL AND province != ''")
-        provinces = sorted(set(row[0].replace("省", "") for row in c.fetchall()))
-        for province in provinces:
-            admin_data[province] = []
-            c.execute("SELECT DISTINCT city FROM personnel WHERE province=? AND city IS NOT NULL AND city != ''", (province,))
-            cities = sorted(set(row[0].replace("市", "") for row in c.fetchall()))
-            admin_data[province] = cities
-    logging.info("行政数据加载完成")
-    return admin_data
+    # 省份、城市来自随程序发布的行政区划数据，不查询人员表
+    return divisions.admin_data()
+
+def _is_duplicate(c, name_key, phone_key, id_key, batch_keys):
+    # 身份证号或姓名+手机号任一相同即视为重复；无手机号和身份证号时按姓名判断，与原有导入规则一致
+    conditions, params, keys = [], [], []
+    if id_key:
+        conditions.append("id_key=?")
+        params.append(id_key)
+        keys.append(('id', id_key))
+    if phone_key:
+        conditions.append("(name_key IS ? AND phone_key=?)")
+        params.extend([name_key, phone_key])
+        keys.append(('name_phone', name_key, phone_key))
+    if not conditions:
+        conditions.append("name_key IS ?")
+        params.append(name_key)
+        keys.append(('name', name_key))
+    if any(key in batch_keys for key in keys):
+        return True
+    # 已归档的人员同样视为已有，不重复导入
+    for table in ("personnel", "personnel_archive"):
+        c.execute(f"SELECT 1 FROM {table} WHERE {' OR '.join(conditions)} LIMIT 1", params)
+        if c.fetchone():
+            return True
+    batch_keys.update(keys)
+    return False
+
+IMPORT_COLUMN_MAPPING = {
+    '姓名': 'real_name', '真实姓名': 'real_name', '性别': 'gender', '年龄': 'age',
+    '身份证': 'id_number', '身份证号': 'id_number', '电话': 'phone', '手机号': 'phone',
+    '省': 'province', '省份': 'province', '市': 'city', '城市': 'city',
+    '县': 'county', '县区': 'county', '昵称': 'nickname', '学历': 'education',
+    '政治面貌': 'political_status', '职业': 'occupation', '个人职业': 'occupation',
+    '职务': 'position', '分会职务': 'position', '状态': 'status', '在职状态': 'status',
+    '加入时间': 'join_date', '加入组织时间': 'join_date', '跟捐天数': 'donation_days',
+    '地址': 'address', '家庭住址': 'address', '简历': 'bio', '个人简历': 'bio'
+}
+
+def read_import_files(file_paths):
+    """读取待导入的表格，每个文件解析为人员字段字典的列表"""
+    frames = [pd.read_csv(file_path, encoding='utf-8') if file_path.endswith('.csv') else pd.read_excel(file_path)
+              for file_path in file_paths]
+    return [parse_import_frame(df) for df in frames]
+
+def parse_import_frame(df):
+    import_columns = list(df.columns)
+    mapped_columns = {}
+    extra_columns = []
+    for col in import_columns:
+        found = False
+        for key, value in IMPORT_COLUMN_MAPPING.items():
+            if key in col:
+                mapped_columns[col] = value
+                found = True
+                break
+        if not found:
+            # 未识别的列写入 extra 属性，不再修改表结构
+            extra_columns.append(col)
+
+    rows = []
+    for _, row in df.iterrows():
+        data = {col: '' for col in FORM_FIELDS}
+        data['status'] = '在职'
+
+        for import_col, db_col in mapped_columns.items():
+            if import_col in row and pd.notna(row[import_col]):
+                if db_col == 'age':
+                    # 表格中的年龄常为 35.0 或 “35岁”；无法识别时留空，有身份证号的人员年龄按出生日期计算
+                    match = re.match(r'\s*(\d{1,3})', str(row[import_col]))
+                    data[db_col] = int(match.group(1)) if match else None
+                else:
+                    data[db_col] = str(row[import_col])
+        extra = {str(col).strip(): str(row[col]) for col in extra_columns if pd.notna(row[col])}
+        data['extra'] = json.dumps(extra, ensure_ascii=False) if extra else None
+        rows.append(data)
+    return rows
 
-@retry_db_operation()
 def import_data(file_paths, refresh_callback):
     try:
-        with sqlite3.connect('hr_data.db') as conn:
+        # 先读完所有文件再开启写事务，解析大表格期间不占用写锁
+        batches = read_import_files(file_paths)
+    except Exception as e:
+        logging.error(f"导入数据失败：{str(e)}")
+        return None, f"导入失败：{str(e)}"
+    return import_rows(batches, refresh_callback)
+
+@retry_db_operation()
+def import_rows(batches, refresh_callback=None, path=None):
+    """在一个写事务中写入已解析的人员（batches 为字段字典列表的列表），跳过库内及本批中重复的人员；path 默认为 DB_PATH"""
+    try:
+        # 省份、城市按行政区划规范，无法识别的按原文保存并在结果中列出
+        unknown_divisions = [problem for rows in batches for problem in divisions.normalize_rows(rows)]
+        with write_connection(path) as conn:
             c = conn.cursor()
             total_count = 0
             total_skipped = 0
             skipped_reasons = []
 
-            c.execute("PRAGMA table_info(personnel)")
-            existing_columns = {info[1] for info in c.fetchall() if info[1] not in ['id', 'photo_path']}
-
-            column_mapping = {
-                '姓名': 'real_name', '真实姓名': 'real_name', '性别': 'gender', '年龄': 'age',
-                '身份证': 'id_number', '身份证号': 'id_number', '电话': 'phone', '手机号': 'phone',
-                '省': 'province', '省份': 'province', '市': 'city', '城市': 'city',
-                '县': 'county', '县区': 'county', '昵称': 'nickname', '学历': 'education',
-                '政治面貌': 'political_status', '职业': 'occupation', '个人职业': 'occupation',
-                '职务': 'position', '分会职务': 'position', '状态': 'status', '在职状态': 'status',
-                '加入时间': 'join_date', '加入组织时间': 'join_date', '跟捐天数': 'donation_days',
-                '地址': 'address', '家庭住址': 'address', '简历': 'bio', '个人简历': 'bio'
-            }
-
-            for file_path in file_paths:
-                if file_path.endswith('.csv'):
-                    df = pd.read_csv(file_path, encoding='utf-8')
-                else:
-                    df = pd.read_excel(file_path)
-
-                import_columns = list(df.columns)
-                mapped_columns = {}
-                for col in import_columns:
-                    found = False
-                    for key, value in column_mapping.items():
-                        if key in col:
-                            mapped_columns[col] = value
-                            found = True
-                            break
-                    if not found:
-                        new_col = col.replace(" ", "_").replace("/", "_")
-                        mapped_columns[col] = new_col
-                        if new_col not in existing_columns:
-                            c.execute(f"ALTER TABLE personnel ADD COLUMN '{new_col}' TEXT")
-                            existing_columns.add(new_col)
-
+            batch_keys = set()
+            for rows in batches:
                 count = 0
                 skipped = 0
-                for _, row in df.iterrows():
-                    real_name = str(row.get('真实姓名', row.get('姓名', '')))
-                    phone = str(row.get('手机号', row.get('电话', '')))
-                    if phone.strip():
-                        c.execute("SELECT id FROM personnel WHERE real_name=? AND phone=?", (real_name, phone))
-                    else:
-                        c.execute("SELECT id FROM personnel WHERE real_name=?", (real_name,))
-                    if c.fetchone():
+                for data in rows:
+                    problem = _branch_problem(data['province']) if path is None else None
+                    if problem:
                         skipped += 1
-                        skipped_reasons.append(f"记录 '{real_name}' (手机号: {phone or '无'}) 已存在")
+                        skipped_reasons.append(f"记录 '{data['real_name']}'：{problem}")
                         continue
-
-                    data = {col: '' for col in existing_columns}
-                    data['photo_path'] = ''
-                    data['status'] = '在职'
-
-                    for import_col, db_col in mapped_columns.items():
-                        if import_col in row and pd.notna(row[import_col]):
-                            if db_col == 'province':
-                                data[db_col] = str(row[import_col]).strip().replace("省", "")
-                            elif db_col == 'city':
-                                data[db_col] = str(row[import_col]).strip().replace("市", "")
-                            elif db_col == 'age':
-                                try:
-                                    data[db_col] = int(row[import_col])
-                                except:
-                                    data[db_col] = 0
-                            else:
-                                data[db_col] = str(row[import_col])
+                    name_key, phone_key, id_key = person_keys(data['real_name'], data['phone'], data['id_number'])
+                    if _is_duplicate(c, name_key, phone_key, id_key, batch_keys):
+                        skipped += 1
+                        skipped_reasons.append(f"记录 '{data['real_name']}' (手机号: {data['phone'] or '无'}) 已存在")
+                        continue
+                    data = dict(data, name_key=name_key, phone_key=phone_key, id_key=id_key, uuid=uuid.uuid4().hex)
 
                     columns = list(data.keys())
                     values = list(data.values())
@@ -197,63 +547,226 @@ def import_data(file_paths, refresh_callback):
                 total_count += count
                 total_skipped += skipped
 
+            # 拼音按不同的姓名、城市批量计算，不逐行计算
+            backfill_pinyin(c)
+
             c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) VALUES (?, ?, ?)",
                       ("导入数据", f"导入了{total_count}条数据，跳过了{total_skipped}条", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
             conn.commit()
+        notify_person_changes()
 
-        refresh_callback()
+        if refresh_callback:
+            refresh_callback()
 
         message = f"成功导入 {total_count} 条数据"
         if total_skipped > 0:
             message += f"\n跳过了 {total_skipped} 条数据，原因如下：\n" + "\n".join(skipped_reasons[:5])
+        if unknown_divisions:
+            message += f"\n{len(unknown_divisions)} 条数据的地区无法识别，已按原文保存：\n" + "\n".join(unknown_divisions[:5])
         return message, None
     except Exception as e:
+        _raise_if_busy(e)
         logging.error(f"导入数据失败：{str(e)}")
         return None, f"导入失败：{str(e)}"
 
 @retry_db_operation()
-def export_data(export_type, province, city, admin_data):
-    with sqlite3.connect('hr_data.db') as conn:
-        query = "SELECT * FROM personnel"
-        params = []
-        default_filename = ""
-        if export_type == "division":
-            conditions = []
-            if province != "全部":
-                conditions.append("province=?")
-                params.append(province)
-                default_filename += province + "分会"
-            if city != "全部":
-                conditions.append("city=?")
-                params.append(city)
-                default_filename += city + "分会"
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-            default_filename += "管理层名单"
-        else:
-            default_filename = "全部数据管理层名单"
+def export_data(export_type, province, city, admin_data, criteria=None, order_by=None, include_archived=False):
+    """导出人员数据；export_type 为 "filtered" 时按与界面相同的筛选条件和排序导出；默认不含已归档人员"""
+    with connect() as conn:
+        where, order, params, default_filename = _export_scope(export_type, province, city, criteria, order_by)
+        query = f"SELECT {select_fields(EXPORT_FIELDS)}, extra FROM {personnel_source(include_archived)}{where}{order}"
 
         df = pd.read_sql_query(query, conn, params=params)
 
         if len(df) == 0:
             return None, "未查询到符合条件的数据，请检查选择的分会信息！"
 
-        column_mapping = {
-            'real_name': '真实姓名', 'gender': '性别', 'age': '年龄', 'id_number': '身份证号',
-            'phone': '手机号', 'province': '省份', 'city': '城市', 'nickname': '昵称',
-            'education': '学历', 'political_status': '政治面貌', 'occupation': '个人职业',
-            'position': '分会职务', 'status': '在职状态', 'join_date': '加入组织时间',
-            'donation_days': '跟捐天数', 'address': '家庭住址', 'bio': '个人简历'
-        }
-        df = df[list(column_mapping.keys())]
-        df.rename(columns=column_mapping, inplace=True)
+        return export_frame(df), default_filename
+
+def _export_scope(export_type, province, city, criteria=None, order_by=None):
+    """导出范围对应的 WHERE 子句、ORDER BY 子句、参数与默认文件名"""
+    if export_type == "filtered":
+        where, params = compile_filter(criteria)
+        return where, compile_order(order_by), params, "筛选结果名单"
+    if export_type != "division":
+        return "", "", [], "全部数据管理层名单"
+    conditions, params, default_filename = [], [], ""
+    if province != "全部":
+        conditions.append("province=?")
+        params.append(province)
+        default_filename += province + "分会"
+    if city != "全部":
+        conditions.append("city=?")
+        params.append(city)
+        default_filename += city + "分会"
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, "", params, default_filename + "管理层名单"
+
+def export_frame(df):
+    """把 EXPORT_FIELDS 与 extra 列的查询结果转为导出表格：列名换成中文，extra 展开为单独的列"""
+    df.rename(columns={name: FIELD_LABELS[name] for name in EXPORT_FIELDS}, inplace=True)
+    extra = df.pop('extra')
+    if extra.notna().any():
+        # extra 为 NULL 的行读出为 NaN（pandas 3）或 None，均按无属性处理
+        extra_df = pd.DataFrame.from_records([json.loads(value) if isinstance(value, str) and value else {} for value in extra],
+                                             index=df.index)
+        extra_df = extra_df[[col for col in extra_df.columns if col not in df.columns]]
+        df = pd.concat([df, extra_df], axis=1)
+    return df
 
-        return df, default_filename
+# 流式导出每次从游标读取的行数
+STREAM_BATCH = 2000
+
+def export_filename(export_type, province="全部", city="全部"):
+    """导出范围的默认文件名（不含扩展名）"""
+    return _export_scope(export_type, province, city)[3]
+
+def stream_export(output, fmt="csv", export_type="all", province="全部", city="全部", criteria=None, order_by=None,
+                  include_archived=False, batch_size=STREAM_BATCH):
+    """流式导出：逐批读取游标并写出，不构造 DataFrame，内存占用与导出人数无关
+
+    fmt 为 "csv"（列名为中文，写入文件时带 BOM，Excel 可直接打开）或 "jsonl"（每行一个 JSON 对象，键为字段名）；
+    extra 中的属性展开为单独的列（键）。output 为文件路径或已打开的文本流（如 sys.stdout）。返回 (信息, 错误)。
+    """
+    if fmt not in ("csv", "jsonl"):
+        return None, f"不支持的导出格式：{fmt}"
+    try:
+        where, order, params, _ = _export_scope(export_type, province, city, criteria, order_by)
+        source = personnel_source(include_archived)
+        with connect() as conn:
+            c = conn.cursor()
+            if fmt == "csv":
+                # 先在 SQL 中汇总 extra 的属性名作为表头，各属性由 json_extract 取出，不必为收集列名读入全部数据
+                labels = {FIELD_LABELS[name] for name in EXPORT_FIELDS}
+                extra_keys = [key for (key,) in c.execute(
+                    f"SELECT DISTINCT j.key FROM (SELECT extra FROM {source}{where}) s, json_each(s.extra) j "
+                    f"WHERE s.extra IS NOT NULL ORDER BY j.key", params) if key not in labels]
+                header = [FIELD_LABELS[name] for name in EXPORT_FIELDS] + extra_keys
+                columns = [select_fields(EXPORT_FIELDS)] + [_extra_value_sql(key) for key in extra_keys]
+            else:
+                # 每行的 JSON 直接由 SQLite 生成：字段在前，extra 中与字段同名的属性不覆盖字段
+                header = None
+                fields = ", ".join(f"'{name}', {AGE_SQL if name == 'age' else name}" for name in EXPORT_FIELDS)
+                shadowed = ", ".join(f"'$.{name}'" for name in EXPORT_FIELDS)
+                columns = [f"json_patch(json_object({fields}), json_remove(COALESCE(extra, '{{}}'), {shadowed}))"]
+            c.execute(f"SELECT {', '.join(columns)} FROM {source}{where}{order}", params)
+            if isinstance(output, str):
+                with open(output, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="") as f:
+                    count = _write_stream(c, f, header, batch_size)
+            else:
+                count = _write_stream(c, output, header, batch_size)
+        logging.info(f"流式导出 {fmt} 完成：{count} 条")
+        return f"成功导出 {count} 条数据", None
+    except Exception as e:
+        _raise_if_busy(e)
+        logging.error(f"流式导出失败：{str(e)}")
+        return None, f"导出失败：{str(e)}"
+
+def _write_stream(c, f, header, batch_size):
+    # header 为 None 时每行只有一列 JSON 文本
+    writer = None
+    if header is not None:
+        writer = csv.writer(f)
+        writer.writerow(header)
+    count = 0
+    while True:
+        rows = c.fetchmany(batch_size)
+        if not rows:
+            return count
+        count += len(rows)
+        if writer:
+            writer.writerows(rows)
+        else:
+            f.write("\n".join(row[0] for row in rows) + "\n")
+
+def _division_scope(province, city):
+    conditions, params, scope = [], [], "全部"
+    if province and province != "全部":
+        conditions.append("province=?")
+        params.append(province)
+        scope = province
+    if city and city != "全部":
+        conditions.append("city=?")
+        params.append(city)
+        scope += "/" + city
+    return conditions, params, scope
+
+def get_export_watermark(province="全部", city="全部"):
+    scope = _division_scope(province, city)[2]
+    with connect() as conn:
+        c = conn.cursor()
+        c.execute("SELECT watermark FROM export_watermark WHERE scope=? ORDER BY id DESC LIMIT 1", (scope,))
+        row = c.fetchone()
+    return row[0] if row else None
+
+@retry_db_operation()
+def export_delta(province="全部", city="全部", since=None):
+    """导出自上次导出（或 since）以来变更和删除的人员
+
+    返回 (变更数据, 删除数据, 新水位, 默认文件名) 或 (None, None, None, 错误信息)。
+    新水位取本次读到的最大修改时间；SQLite 同时只有一个写事务，之后提交的记录时间必然更晚。
+    """
+    conditions, params, scope = _division_scope(province, city)
+    with connect() as conn:
+        c = conn.cursor()
+        # 在同一读事务中取数与水位，避免导出期间的写入被遗漏
+        c.execute("BEGIN")
+        if since is None:
+            c.execute("SELECT watermark FROM export_watermark WHERE scope=? ORDER BY id DESC LIMIT 1", (scope,))
+            row = c.fetchone()
+            since = row[0] if row else None
+        c.execute("SELECT MAX(ts) FROM (SELECT MAX(updated_at) AS ts FROM personnel UNION ALL SELECT MAX(deleted_at) FROM personnel_deleted)")
+        watermark = c.fetchone()[0] or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.000")
+
+        changed_conditions = list(conditions)
+        changed_params = list(params)
+        deleted_params = list(params)
+        if since:
+            changed_conditions.append("updated_at > ?")
+            changed_params.append(since)
+        query = f"SELECT {select_fields(EXPORT_FIELDS)}, extra, created_at, updated_at FROM personnel"
+        if changed_conditions:
+            query += " WHERE " + " AND ".join(changed_conditions)
+        query += " ORDER BY updated_at"
+        changed = pd.read_sql_query(query, conn, params=changed_params)
+
+        deleted_query = "SELECT real_name, phone, id_number, province, city, deleted_at FROM personnel_deleted"
+        deleted_conditions = list(conditions)
+        if since:
+            deleted_conditions.append("deleted_at > ?")
+            deleted_params.append(since)
+        if deleted_conditions:
+            deleted_query += " WHERE " + " AND ".join(deleted_conditions)
+        deleted = pd.read_sql_query(deleted_query + " ORDER BY deleted_at", conn, params=deleted_params)
+        conn.rollback()
+
+    if len(changed) == 0 and len(deleted) == 0:
+        return None, None, None, f"自 {since} 以来没有变更的数据" if since else "未查询到符合条件的数据"
+
+    # 时间列先换成中文名，extra 中同名的属性不覆盖这两列
+    changed.rename(columns={'created_at': '创建时间', 'updated_at': '最后修改时间'}, inplace=True)
+    changed = export_frame(changed)
+    deleted.columns = ['真实姓名', '手机号', '身份证号', '省份', '城市', '删除时间']
+    default_filename = ("全部数据" if scope == "全部" else scope.replace("/", "") + "分会") + "增量名单"
+    return changed, deleted, watermark, default_filename
+
+@retry_db_operation()
+def record_export_watermark(province, city, watermark, changed_count, deleted_count):
+    # 文件写出成功后再推进水位，导出失败时下次仍从旧水位开始
+    scope = _division_scope(province, city)[2]
+    with write_connection() as conn:
+        c = conn.cursor()
+        c.execute("INSERT INTO export_watermark (scope, watermark, exported_at, changed_count, deleted_count) VALUES (?, ?, ?, ?, ?)",
+                  (scope, watermark, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), changed_count, deleted_count))
+        c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) VALUES (?, ?, ?)",
+                  ("增量导出", f"{scope}：变更{changed_count}条，删除{deleted_count}条", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        conn.commit()
+    logging.info(f"增量导出水位更新：{scope} -> {watermark}")
 
 @retry_db_operation()
 def export_talent_pool():
     try:
-        with sqlite3.connect('hr_data.db') as conn:
+        with connect() as conn:
             query = """
                 SELECT p.real_name, p.gender, p.age, p.phone, p.province, p.city, 
                        p.position, p.status, p.bio, t.reason, t.add_time
@@ -265,63 +778,343 @@ def export_talent_pool():
                      '分会职务', '在职状态', '个人简历', '加入人才库理由', '加入人才库时间']
         return df, None
     except Exception as e:
+        _raise_if_busy(e)
         logging.error(f"导出人才库失败：{str(e)}")
         return None, f"导出失败：{str(e)}"
 
+_SAVED_FIELDS = FORM_FIELDS + KEY_FIELDS + PINYIN_FIELDS
+_INSERT_PERSON_SQL = (f"INSERT INTO personnel ({select_columns(_SAVED_FIELDS)}, uuid) "
+                      f"VALUES ({', '.join('?' for _ in _SAVED_FIELDS)}, ?)")
+_UPDATE_PERSON_SQL = f"UPDATE personnel SET {', '.join(f'{name}=?' for name in _SAVED_FIELDS)} WHERE id=?"
+
+def _resolve_divisions(data):
+    """表单数据的省份、城市、县区按行政区划规范，返回 (数据, 错误)"""
+    data = list(data)
+    indexes = [FORM_FIELDS.index(name) for name in ('province', 'city', 'county')]
+    *resolved, problem = divisions.resolve(*(str(data[i] or '') for i in indexes))
+    for i, value in zip(indexes, resolved):
+        data[i] = value or None
+    return data, problem
+
+def _with_keys(data):
+    values = dict(zip(FORM_FIELDS, data))
+    return (*data, *person_keys(values['real_name'], values['phone'], values['id_number']),
+            *person_pinyin(values['real_name'], values['city']))
+
+def _keyword_condition(search, alias=""):
+    # 纯字母关键字同时按姓名全拼、首字母前缀匹配，前缀写成范围比较以使用索引
+    conditions = [f"{alias}real_name LIKE ?", f"{alias}phone LIKE ?"]
+    params = [f"%{search}%", f"%{search}%"]
+    if is_pinyin_query(search):
+        prefix = search.lower()
+        for name in ('name_pinyin', 'name_initials'):
+            conditions.append(f"({alias}{name} >= ? AND {alias}{name} < ?)")
+            params.extend([prefix, prefix + '\U0010ffff'])
+    return "(" + " OR ".join(conditions) + ")", params
+
+def get_person(person_id, fields=DETAIL_FIELDS):
+    with connect() as conn:
+        conn.row_factory = person_factory
+        c = conn.cursor()
+        c.execute(f"SELECT {select_columns(fields)} FROM personnel WHERE id=?", (person_id,))
+        return c.fetchone()
+
+_PERSON_DETAIL_SQL = f"""
+    SELECT {select_columns(DETAIL_FIELDS, 'p')}, t.person_id IS NOT NULL AS in_talent_pool,
+           t.reason AS talent_reason, t.add_time AS talent_add_time
+    FROM personnel p
+    LEFT JOIN talent_pool t ON t.person_id = p.id
+"""
+
+def _fetch_person_details(conn, person_ids):
+    conn.row_factory = person_factory
+    placeholders = ", ".join("?" for _ in person_ids)
+    rows = conn.execute(_PERSON_DETAIL_SQL + f" WHERE p.id IN ({placeholders})", [int(pid) for pid in person_ids]).fetchall()
+    conn.row_factory = None
+    return rows
+
+_ARCHIVED_DETAIL_SQL = f"""
+    SELECT {select_columns(DETAIL_FIELDS)}, 1 AS archived, archived_at, archive_reason,
+           in_talent_pool, talent_reason, talent_add_time
+    FROM personnel_archive WHERE id = ?
+"""
+
+def get_person_detail(person_id):
+    """人员详情、人才库状态与理由一次查询取回，命中缓存时不访问数据库；已归档人员从归档表读取，不缓存"""
+    person = person_cache.get(person_id)
+    if person is not None:
+        return person
+    generation = person_cache.generation
+    with connect() as conn:
+        rows = _fetch_person_details(conn, [person_id])
+        if not rows:
+            conn.row_factory = person_factory
+            return conn.execute(_ARCHIVED_DETAIL_SQL, (int(person_id),)).fetchone()
+    person_cache.fill(rows, generation)
+    return rows[0]
+
+def _prefetch(person_ids, generation):
+    try:
+        with connect() as conn:
+            rows = _fetch_person_details(conn, person_ids)
+        person_cache.fill(rows, generation)
+        logging.debug(f"预取人员详情：{len(rows)} 条")
+    except Exception as e:
+        logging.warning(f"预取人员详情失败：{str(e)}")
+
+def prefetch_persons(person_ids):
+    missing = [pid for pid in person_ids if pid not in person_cache]
+    if missing:
+        _prefetch_executor.submit(_prefetch, missing[:50], person_cache.generation)
+
+def _refresh_cached_person(conn, person_id):
+    # 在提交之后调用，读取失败时只丢弃缓存，不能让重试装饰器重复执行已提交的写入
+    try:
+        rows = _fetch_person_details(conn, [person_id])
+    except sqlite3.Error as e:
+        logging.warning(f"刷新人员缓存失败：{str(e)}")
+        person_cache.invalidate([person_id])
+        return
+    if rows:
+        person_cache.put(rows[0])
+    else:
+        person_cache.invalidate([person_id])
+
+def personnel_query(province=None, city=None, search=None, fields=LIST_FIELDS):
+    query = f"SELECT {select_columns(fields)} FROM personnel"
+    params = []
+    conditions = []
+    if province and province != "全部":
+        conditions.append("province LIKE ?")
+        params.append(f"%{province}%")
+    if city and city != "全部":
+        conditions.append("city LIKE ?")
+        params.append(f"%{city}%")
+    if search:
+        keyword, keyword_params = _keyword_condition(search)
+        conditions.append(keyword)
+        params.extend(keyword_params)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, params
+
+def list_personnel(province=None, city=None, search=None, fields=LIST_FIELDS):
+    query, params = personnel_query(province, city, search, fields)
+    with connect() as conn:
+        conn.row_factory = person_factory
+        c = conn.cursor()
+        c.execute(query, params)
+        return c.fetchall()
+
+def personnel_source(include_archived=False):
+    """查询的数据源：默认只有在册人员；含归档人员时两表的公共列合并为同名子查询，筛选与排序语句不变"""
+    if not include_archived:
+        return "personnel"
+    columns = select_columns(_UNION_FIELDS)
+    return (f"(SELECT {columns}, 0 AS archived FROM personnel "
+            f"UNION ALL SELECT {columns}, 1 AS archived FROM personnel_archive) AS personnel")
+
+_UNION_FIELDS = DETAIL_FIELDS + KEY_FIELDS + PINYIN_FIELDS + TIMESTAMP_FIELDS
+
+def query_personnel(criteria=None, order_by=None, fields=LIST_FIELDS, limit=None, include_archived=False):
+    """按筛选条件树查询人员，条件与排序编译为一条参数化 SQL（见 filters 模块）；include_archived 时含已归档人员"""
+    where, params = compile_filter(criteria)
+    columns = select_columns(fields) + (", archived" if include_archived else "")
+    query = f"SELECT {columns} FROM {personnel_source(include_archived)}{where}{compile_order(order_by)}"
+    if limit:
+        query += " LIMIT ?"
+        params.append(int(limit))
+    with connect() as conn:
+        conn.row_factory = person_factory
+        c = conn.cursor()
+        c.execute(query, params)
+        return c.fetchall()
+
+def list_birthdays(days=30, fields=LIST_FIELDS + ('birthday',)):
+    """今天起 days 天内过生日的在册人员，按生日先后排列；生日（月-日）列上的索引范围查询，跨年时分两段"""
+    today = datetime.date.today()
+    start = today.strftime("%m-%d")
+    end = (today + datetime.timedelta(days=max(int(days), 0))).strftime("%m-%d")
+    if int(days) >= 365:
+        condition, params = "birthday IS NOT NULL", []
+    elif start <= end:
+        condition, params = "birthday BETWEEN ? AND ?", [start, end]
+    else:
+        condition, params = "(birthday >= ? OR birthday <= ?)", [start, end]
+    query = (f"SELECT {select_columns(fields)} FROM personnel WHERE {condition} "
+             "ORDER BY birthday < ?, birthday, id")
+    with connect() as conn:
+        conn.row_factory = person_factory
+        return conn.execute(query, params + [start]).fetchall()
+
+def talent_pool_query(search="", pinyin_order=False):
+    """pinyin_order 为真时按姓名拼音排序，否则按加入人才库时间倒序"""
+    query = f"""
+        SELECT {select_columns(TALENT_LIST_FIELDS, 'p')}, t.reason AS talent_reason, t.add_time AS talent_add_time
+        FROM personnel p
+        JOIN talent_pool t ON p.id = t.person_id
+    """
+    params = []
+    if search:
+        keyword, params = _keyword_condition(search, "p.")
+        query += " WHERE " + keyword
+    query += " ORDER BY p.name_pinyin, p.id" if pinyin_order else " ORDER BY t.add_time DESC"
+    return query, params
+
+def list_talent_pool(search="", pinyin_order=False):
+    query, params = talent_pool_query(search, pinyin_order)
+    with connect() as conn:
+        conn.row_factory = person_factory
+        c = conn.cursor()
+        c.execute(query, params)
+        return c.fetchall()
+
+def list_extra_keys():
+    """统计 extra 中各属性出现的人数，用于决定是否提升为独立列"""
+    with connect() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT j.key, COUNT(*) FROM personnel p, json_each(p.extra) j
+            WHERE p.extra IS NOT NULL
+            GROUP BY j.key ORDER BY COUNT(*) DESC
+        """)
+        counts = c.fetchall()
+        c.execute("SELECT key, column_name FROM extra_promoted")
+        promoted = dict(c.fetchall())
+    return [(key, count, promoted.get(key)) for key, count in counts]
+
+def _promoted_columns(c):
+    c.execute("SELECT key, column_name FROM extra_promoted")
+    return dict(c.fetchall())
+
+@retry_db_operation()
+def promote_extra_attribute(key):
+    try:
+        with write_connection() as conn:
+            c = conn.cursor()
+            promoted = _promoted_columns(c)
+            if key in promoted:
+                return f"属性 {key} 已提升为列 {promoted[key]}", None
+            if '"' in str(key):
+                # 生成列中不能使用子查询，含双引号的键名无法按 JSON 路径取值
+                return None, f"属性名 {key} 含双引号，不能提升为列"
+            c.execute("SELECT COALESCE(MAX(CAST(SUBSTR(column_name, 7) AS INTEGER)), 0) + 1 FROM extra_promoted")
+            column_name = f"extra_{c.fetchone()[0]}"
+            c.execute(f"ALTER TABLE personnel ADD COLUMN {column_name} TEXT GENERATED ALWAYS AS ({_extra_value_sql(key)}) VIRTUAL")
+            c.execute(f"CREATE INDEX IF NOT EXISTS idx_personnel_{column_name} ON personnel({column_name})")
+            c.execute("INSERT INTO extra_promoted (key, column_name, promoted_at) VALUES (?, ?, ?)",
+                      (key, column_name, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+        logging.info(f"extra 属性 {key} 已提升为索引列 {column_name}")
+        return f"属性 {key} 已提升为索引列 {column_name}", None
+    except Exception as e:
+        _raise_if_busy(e)
+        logging.error(f"提升 extra 属性失败：{str(e)}")
+        return None, f"提升失败：{str(e)}"
+
 @retry_db_operation()
-def save_person(data, mode, person, from_talent=False):
+def demote_extra_attribute(key):
     try:
-        with sqlite3.connect('hr_data.db') as conn:
+        with write_connection() as conn:
+            c = conn.cursor()
+            column_name = _promoted_columns(c).get(key)
+            if not column_name:
+                return None, f"属性 {key} 未被提升"
+            c.execute(f"DROP INDEX IF EXISTS idx_personnel_{column_name}")
+            c.execute(f"ALTER TABLE personnel DROP COLUMN {column_name}")
+            c.execute("DELETE FROM extra_promoted WHERE key=?", (key,))
+            conn.commit()
+        return f"属性 {key} 已取消提升", None
+    except Exception as e:
+        _raise_if_busy(e)
+        logging.error(f"取消提升 extra 属性失败：{str(e)}")
+        return None, f"取消提升失败：{str(e)}"
+
+def find_by_extra(key, value, fields=LIST_FIELDS):
+    # 已提升的属性走生成列索引，否则回退到按 extra 取值
+    with connect() as conn:
+        column_name = _promoted_columns(conn.cursor()).get(key)
+        conn.row_factory = person_factory
+        if column_name:
+            condition, params = f"{column_name} = ?", [value]
+        else:
+            condition, params = f"{_extra_value_sql(key)} = ?", [value]
+        return conn.execute(f"SELECT {select_columns(fields)} FROM personnel WHERE {condition}", params).fetchall()
+
+@retry_db_operation()
+def save_person(data, mode, person, from_talent=False, talent_reason=None, path=None):
+    # 无法识别的省份、城市按原文保存，在结果中提示；path 默认为 DB_PATH
+    data, problem = _resolve_divisions(data)
+    error = _branch_problem(data[FORM_FIELDS.index('province')]) if path is None else None
+    if error:
+        return None, None, f"保存失败：{error}"
+    try:
+        with write_connection(path) as conn:
             c = conn.cursor()
             photo_updated = False
-            if mode == "edit" and person and person[-1] != data[-1]:
+            if mode == "edit" and person and person.photo_path != data[-1]:
                 photo_updated = True
             if mode == "add":
-                c.execute("INSERT INTO personnel (real_name, gender, age, id_number, phone, province, city, county, nickname, education, political_status, occupation, position, status, join_date, donation_days, address, bio, photo_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", data)
+                c.execute(_INSERT_PERSON_SQL, (*_with_keys(data), uuid.uuid4().hex))
                 person_id = c.lastrowid
                 operation_type = "新增人员"
                 message = "新增人员完成"
             else:
-                c.execute("UPDATE personnel SET real_name=?, gender=?, age=?, id_number=?, phone=?, province=?, city=?, county=?, nickname=?, education=?, political_status=?, occupation=?, position=?, status=?, join_date=?, donation_days=?, address=?, bio=?, photo_path=? WHERE id=?", (*data, person[0]))
-                person_id = person[0]
+                c.execute(_UPDATE_PERSON_SQL, (*_with_keys(data), person.id))
+                person_id = person.id
                 operation_type = "编辑人员"
                 message = "编辑信息完成"
-                if from_talent:
-                    talent_reason = data[-2]  # 假设理由在 data[-2]
-                    c.execute("UPDATE talent_pool SET reason=? WHERE person_id=?", (talent_reason, person[0]))
+                if from_talent and talent_reason is not None:
+                    # 理由被清空时同样写入，不保留旧理由
+                    c.execute("UPDATE talent_pool SET reason=? WHERE person_id=?", (talent_reason or None, person.id))
                     operation_type = "编辑人员及人才库理由"
                     message = "编辑信息及人才库理由完成"
             c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) VALUES (?, ?, ?)",
                       (operation_type, data[0], datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
             conn.commit()
+            _refresh_cached_person(conn, person_id)
+        notify_person_changes([person_id])
         if photo_updated:
             message += "\n照片已更新"
+        if problem:
+            message += f"\n{problem}，已按原文保存"
         return person_id, message, None
     except Exception as e:
+        _raise_if_busy(e)
         logging.error(f"保存人员失败：{str(e)}")
         return None, None, f"保存失败：数据库操作错误，请重试！"
 
 @retry_db_operation()
 def save_and_add_to_talent_pool(data, reason):
+    data, problem = _resolve_divisions(data)
+    error = _branch_problem(data[FORM_FIELDS.index('province')])
+    if error:
+        return None, None, f"保存失败：{error}"
     try:
-        with sqlite3.connect('hr_data.db') as conn:
+        with write_connection() as conn:
             c = conn.cursor()
-            c.execute("INSERT INTO personnel (real_name, gender, age, id_number, phone, province, city, county, nickname, education, political_status, occupation, position, status, join_date, donation_days, address, bio, photo_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", data)
+            c.execute(_INSERT_PERSON_SQL, (*_with_keys(data), uuid.uuid4().hex))
             person_id = c.lastrowid
             c.execute("INSERT INTO talent_pool (person_id, add_time, reason) VALUES (?, ?, ?)",
                       (person_id, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), reason))
             c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) VALUES (?, ?, ?)",
                       ("新增并加入人才库", data[0], datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
             conn.commit()
-        return person_id, f"新增人员 {data[0]} 并加入人才库完成", None
+            _refresh_cached_person(conn, person_id)
+        notify_person_changes([person_id])
+        message = f"新增人员 {data[0]} 并加入人才库完成"
+        if problem:
+            message += f"\n{problem}，已按原文保存"
+        return person_id, message, None
     except Exception as e:
+        _raise_if_busy(e)
         logging.error(f"保存并加入人才库失败：{str(e)}")
         return None, None, f"保存失败：数据库操作错误，请重试！"
 
 @retry_db_operation()
 def add_to_talent_pool(person_id, reason):
     try:
-        with sqlite3.connect('hr_data.db') as conn:
+        with write_connection() as conn:
             c = conn.cursor()
             c.execute("SELECT real_name FROM personnel WHERE id=?", (person_id,))
             result = c.fetchone()
@@ -333,15 +1126,17 @@ def add_to_talent_pool(person_id, reason):
             c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) VALUES (?, ?, ?)",
                       ("加入人才库", real_name, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
             conn.commit()
+            _refresh_cached_person(conn, person_id)
         return f"人员 {real_name} 已加入人才库", None
     except Exception as e:
+        _raise_if_busy(e)
         logging.error(f"加入人才库失败：{str(e)}")
         return None, f"加入人才库失败：{str(e)}"
 
 @retry_db_operation()
-def delete_person(person_id):
+def delete_person(person_id, path=None):
     try:
-        with sqlite3.connect('hr_data.db') as conn:
+        with write_connection(path) as conn:
             c = conn.cursor()
             c.execute("SELECT real_name FROM personnel WHERE id=?", (person_id,))
             real_name = c.fetchone()[0]
@@ -350,7 +1145,218 @@ def delete_person(person_id):
             c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) VALUES (?, ?, ?)",
                       ("删除人员", real_name, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
             conn.commit()
+        person_cache.invalidate([person_id])
+        notify_person_changes([person_id])
         return "人员已删除", None
     except Exception as e:
+        _raise_if_busy(e)
         logging.error(f"删除人员失败：{str(e)}")
-        return None, f"删除失败：{str(e)}"
\ No newline at end of file
+        return None, f"删除失败：{str(e)}"
+
+def _stage_person_ids(c, person_ids):
+    # 将批量操作的人员ID写入临时表，后续语句以集合方式关联，避免逐条处理与参数数量上限
+    c.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_ids (id INTEGER PRIMARY KEY)")
+    c.execute("DELETE FROM temp.bulk_ids")
+    c.executemany("INSERT OR IGNORE INTO temp.bulk_ids (id) VALUES (?)", [(int(pid),) for pid in person_ids])
+
+@retry_db_operation()
+def bulk_delete_persons(person_ids):
+    if not person_ids:
+        return None, "未选择任何人员"
+    try:
+        with write_connection() as conn:
+            c = conn.cursor()
+            _stage_person_ids(c, person_ids)
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) "
+                      "SELECT '删除人员', real_name, ? FROM personnel WHERE id IN (SELECT id FROM temp.bulk_ids)", (now,))
+            c.execute("DELETE FROM talent_pool WHERE person_id IN (SELECT id FROM temp.bulk_ids)")
+            c.execute("DELETE FROM personnel WHERE id IN (SELECT id FROM temp.bulk_ids)")
+            deleted = c.rowcount
+            conn.commit()
+        person_cache.invalidate(person_ids)
+        notify_person_changes(person_ids)
+        logging.info(f"批量删除人员完成：{deleted} 条")
+        return f"已删除 {deleted} 名人员", None
+    except Exception as e:
+        _raise_if_busy(e)
+        logging.error(f"批量删除人员失败：{str(e)}")
+        return None, f"删除失败：{str(e)}"
+
+@retry_db_operation()
+def bulk_add_to_talent_pool(person_ids, reason):
+    if not person_ids:
+        return None, "未选择任何人员"
+    try:
+        with write_connection() as conn:
+            c = conn.cursor()
+            _stage_person_ids(c, person_ids)
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            # 已不存在（被删除或归档）的人员与已在人才库中的人员分别计数，均不加入
+            c.execute("DELETE FROM temp.bulk_ids WHERE id NOT IN (SELECT id FROM personnel)")
+            missing = c.rowcount
+            c.execute("DELETE FROM temp.bulk_ids WHERE id IN (SELECT person_id FROM talent_pool)")
+            existing = c.rowcount
+            c.execute("INSERT INTO talent_pool (person_id, add_time, reason) SELECT id, ?, ? FROM temp.bulk_ids",
+                      (now, reason))
+            added = c.rowcount
+            c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) "
+                      "SELECT '加入人才库', real_name, ? FROM personnel WHERE id IN (SELECT id FROM temp.bulk_ids)", (now,))
+            conn.commit()
+        person_cache.invalidate(person_ids)
+        message = f"已将 {added} 名人员加入人才库"
+        if existing > 0:
+            message += f"，跳过 {existing} 名已在人才库中的人员"
+        if missing > 0:
+            message += f"，{missing} 名人员已不存在"
+        logging.info(f"批量加入人才库完成：{added} 条")
+        return message, None
+    except Exception as e:
+        _raise_if_busy(e)
+        logging.error(f"批量加入人才库失败：{str(e)}")
+        return None, f"加入人才库失败：{str(e)}"
+
+@retry_db_operation()
+def bulk_update_persons(person_ids, status=None, position=None):
+    if not person_ids:
+        return None, "未选择任何人员"
+    assignments = []
+    params = []
+    changes = []
+    if status is not None:
+        assignments.append("status=?")
+        params.append(status)
+        changes.append(f"在职状态→{status}")
+    if position is not None:
+        assignments.append("position=?")
+        params.append(position)
+        changes.append(f"分会职务→{position or '无职务'}")
+    if not assignments:
+        return None, "未指定需要修改的字段"
+    try:
+        with write_connection() as conn:
+            c = conn.cursor()
+            _stage_person_ids(c, person_ids)
+            c.execute(f"UPDATE personnel SET {', '.join(assignments)} WHERE id IN (SELECT id FROM temp.bulk_ids)", params)
+            updated = c.rowcount
+            c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) "
+                      "SELECT ?, real_name, ? FROM personnel WHERE id IN (SELECT id FROM temp.bulk_ids)",
+                      ("批量修改：" + "，".join(changes), datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+        person_cache.invalidate(person_ids)
+        notify_person_changes(person_ids)
+        logging.info(f"批量修改人员完成：{updated} 条")
+        return f"已修改 {updated} 名人员", None
+    except Exception as e:
+        _raise_if_busy(e)
+        logging.error(f"批量修改人员失败：{str(e)}")
+        return None, f"修改失败：{str(e)}"
+
+@retry_db_operation()
+def bulk_remove_from_talent_pool(person_ids):
+    if not person_ids:
+        return None, "未选择任何人员"
+    try:
+        with write_connection() as conn:
+            c = conn.cursor()
+            _stage_person_ids(c, person_ids)
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) "
+                      "SELECT '从人才库中移除', p.real_name, ? FROM personnel p "
+                      "WHERE p.id IN (SELECT person_id FROM talent_pool WHERE person_id IN (SELECT id FROM temp.bulk_ids))", (now,))
+            c.execute("DELETE FROM talent_pool WHERE person_id IN (SELECT id FROM temp.bulk_ids)")
+            removed = c.rowcount
+            conn.commit()
+        person_cache.invalidate(person_ids)
+        logging.info(f"批量移出人才库完成：{removed} 条")
+        return f"已从人才库中移除 {removed} 名人员", None
+    except Exception as e:
+        _raise_if_busy(e)
+        logging.error(f"批量移出人才库失败：{str(e)}")
+        return None, f"移除失败：{str(e)}"
+
+
+def find_duplicates(max_block=50):
+    with connect() as conn:
+        groups = find_duplicate_groups(conn, max_block)
+        ids = [pid for group in groups for pid in group['ids']]
+        _stage_person_ids(conn.cursor(), ids)
+        conn.row_factory = person_factory
+        persons = {p.id: p for p in conn.execute(
+            f"SELECT {select_columns(LIST_FIELDS + ('id_number', 'extra'))} FROM personnel WHERE id IN (SELECT id FROM temp.bulk_ids)")}
+    for group in groups:
+        group['persons'] = [persons[pid] for pid in group['ids'] if pid in persons]
+    logging.info(f"查重完成：{len(groups)} 组疑似重复")
+    return groups
+
+@retry_db_operation()
+def merge_persons(keep_id, merge_ids):
+    """将 merge_ids 合并到 keep_id：保留记录为空的字段由被合并记录补齐，人才库身份随之转移"""
+    merge_ids = [int(pid) for pid in merge_ids if int(pid) != int(keep_id)]
+    if not merge_ids:
+        return None, "未选择需要合并的人员"
+    try:
+        with write_connection() as conn:
+            c = conn.cursor()
+            _stage_person_ids(c, merge_ids)
+            fill_fields = FORM_FIELDS + KEY_FIELDS + PINYIN_FIELDS
+            assignments = ", ".join(
+                f"{name} = COALESCE(NULLIF({name}, ''), (SELECT m.{name} FROM personnel m "
+                f"WHERE m.id IN (SELECT id FROM temp.bulk_ids) AND m.{name} IS NOT NULL AND m.{name} != '' "
+                f"ORDER BY m.id DESC LIMIT 1))"
+                for name in fill_fields)
+            c.execute(f"UPDATE personnel SET {assignments} WHERE id=?", (keep_id,))
+            if c.rowcount == 0:
+                raise ValueError("保留人员不存在")
+            # extra 属性合并，保留记录的值优先
+            c.execute("SELECT extra FROM personnel WHERE id IN (SELECT id FROM temp.bulk_ids) AND extra IS NOT NULL ORDER BY id")
+            for (extra,) in c.fetchall():
+                c.execute("UPDATE personnel SET extra = json_patch(?, COALESCE(extra, '{}')) WHERE id=?", (extra, keep_id))
+            c.execute("SELECT 1 FROM talent_pool WHERE person_id=?", (keep_id,))
+            if not c.fetchone():
+                c.execute("UPDATE talent_pool SET person_id=? WHERE id = (SELECT id FROM talent_pool "
+                          "WHERE person_id IN (SELECT id FROM temp.bulk_ids) ORDER BY add_time LIMIT 1)", (keep_id,))
+            c.execute("DELETE FROM talent_pool WHERE person_id IN (SELECT id FROM temp.bulk_ids)")
+            c.execute("SELECT real_name FROM personnel WHERE id=?", (keep_id,))
+            real_name = c.fetchone()[0]
+            c.execute("DELETE FROM personnel WHERE id IN (SELECT id FROM temp.bulk_ids)")
+            merged = c.rowcount
+            c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) VALUES (?, ?, ?)",
+                      ("合并重复人员", f"{real_name}（合并 {merged} 条）", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+        person_cache.invalidate([keep_id, *merge_ids])
+        notify_person_changes([keep_id, *merge_ids])
+        return f"已将 {merged} 条重复记录合并到 {real_name}", None
+    except Exception as e:
+        _raise_if_busy(e)
+        logging.error(f"合并人员失败：{str(e)}")
+        return None, f"合并失败：{str(e)}"
+
+
+def get_headcount_stats(dimension):
+    if dimension not in STAT_DIMENSIONS and dimension != 'total':
+        raise ValueError(f"不支持的统计维度：{dimension}")
+    with connect() as conn:
+        return headcount(conn.cursor(), dimension)
+
+def get_headcount_overview():
+    with connect() as conn:
+        c = conn.cursor()
+        total = headcount(c, 'total')
+        overview = {dimension: headcount(c, dimension) for dimension in STAT_DIMENSIONS}
+        overview['age'] = age_brackets(c)
+    overview['total'] = total[0][1:] if total else (0, 0)
+    return overview
+
+@retry_db_operation()
+def rebuild_headcount_stats():
+    try:
+        with write_connection() as conn:
+            rebuild_summary(conn.cursor())
+            conn.commit()
+        logging.info("统计汇总表已重建")
+        return "统计数据已重新汇总", None
+    except Exception as e:
+        _raise_if_busy(e)
+        logging.error(f"重建统计汇总失败：{str(e)}")
+        return None, f"重建失败：{str(e)}"
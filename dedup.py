@@ -0,0 +1,125 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+KEY_FIELDS = ('name_key', 'phone_key', 'id_key')
+
+_ID_WEIGHTS = (7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2)
+_ID_CHECK_CODES = '10X98765432'
+
+
+def _text(value):
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKC', str(value)).strip()
+    # pandas 读入的数字列常带 ".0" 后缀
+    if re.fullmatch(r'\d+\.0', text):
+        text = text[:-2]
+    return '' if text.lower() in ('nan', 'none') else text
+
+
+def normalize_name(name):
+    text = re.sub(r'[\s·•・.]', '', _text(name)).casefold()
+    return text or None
+
+
+def normalize_phone(phone):
+    digits = re.sub(r'\D', '', _text(phone))
+    for prefix in ('0086', '86'):
+        if digits.startswith(prefix) and len(digits) == 11 + len(prefix):
+            digits = digits[len(prefix):]
+            break
+    return digits or None
+
+
+def id_check_code(first17):
+    total = sum(int(d) * w for d, w in zip(first17, _ID_WEIGHTS))
+    return _ID_CHECK_CODES[total % 11]
+
+
+def normalize_id_number(id_number):
+    """身份证号统一为18位大写形式，15位旧号升位；校验位不符时返回 None"""
+    text = re.sub(r'\s', '', _text(id_number)).upper()
+    if re.fullmatch(r'\d{15}', text):
+        first17 = text[:6] + '19' + text[6:]
+        return first17 + id_check_code(first17)
+    if re.fullmatch(r'\d{17}[\dX]', text) and id_check_code(text[:17]) == text[17]:
+        return text
+    return None
+
+
+def person_keys(real_name, phone, id_number):
+    return normalize_name(real_name), normalize_phone(phone), normalize_id_number(id_number)
+
+
+def register_functions(conn):
+    # 供迁移回填时以集合方式计算规范化键
+    conn.create_function('normalize_name', 1, normalize_name, deterministic=True)
+    conn.create_function('normalize_phone', 1, normalize_phone, deterministic=True)
+    conn.create_function('normalize_id_number', 1, normalize_id_number, deterministic=True)
+
+
+# 分块规则：(名称, 键列, 分组表达式, 权重)。同一块内的记录视为疑似重复
+BLOCKING_RULES = (
+    ('身份证号相同', 'id_key', 'id_key', 3),
+    ('手机号相同', 'phone_key', 'phone_key', 2),
+    ('同省同名', 'name_key', "name_key, COALESCE(province, '')", 1),
+)
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+def find_duplicate_groups(conn, max_block=50):
+    """按规范化键分块查找疑似重复人员，每条规则一次 GROUP BY，不做两两比较
+
+    返回 [{'ids': [...], 'reasons': [...], 'score': n}]，按得分降序。
+    超过 max_block 的弱规则分块（常见姓名）被忽略。
+    """
+    uf = _UnionFind()
+    edge_reasons = defaultdict(set)
+    for reason, key_column, group_by, weight in BLOCKING_RULES:
+        rows = conn.execute(
+            f"SELECT group_concat(id) FROM personnel WHERE {key_column} IS NOT NULL "
+            f"GROUP BY {group_by} HAVING COUNT(*) > 1"
+        ).fetchall()
+        for (ids_text,) in rows:
+            ids = [int(i) for i in ids_text.split(',')]
+            if weight < 2 and len(ids) > max_block:
+                continue
+            for other in ids[1:]:
+                uf.union(ids[0], other)
+            edge_reasons[frozenset(ids)].add((reason, weight))
+
+    groups = defaultdict(list)
+    for person_id in list(uf.parent):
+        groups[uf.find(person_id)].append(person_id)
+    reasons_by_root = defaultdict(set)
+    for ids, reasons in edge_reasons.items():
+        root = uf.find(next(iter(ids)))
+        reasons_by_root[root].update(reasons)
+
+    result = []
+    for root, ids in groups.items():
+        reasons = reasons_by_root[root]
+        result.append({
+            'ids': sorted(ids),
+            'reasons': [reason for reason, _ in sorted(reasons, key=lambda r: -r[1])],
+            'score': sum(weight for _, weight in reasons),
+        })
+    result.sort(key=lambda g: (-g['score'], g['ids'][0]))
+    return result
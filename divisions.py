@@ -0,0 +1,240 @@
+import difflib
+import functools
+import logging
+
+from pinyin import to_pinyin
+
+# 行政区划：省级、地级（含省直辖的县级市、县）名称与代码（GB/T 2260），随程序发布，不再从人员表推算。
+# 省份、城市保存简称（去掉“省”“市”等后缀，与已有数据一致）；全称、简称与自治州的“××州”都是别名，
+# 以前缀树匹配，“湖南省长沙市岳麓区”这样连写的地址可以逐级拆开。数据不含县级名称，县区只拆分、不校验；
+# 县级市（如义乌、昆山）填在城市一栏时无法识别，保存与导入都按原文保存并提示，不拒绝。
+
+# 每行一个省级区划：代码前两位、全称[/简称]，其后为地级区划：代码后四位 + 全称[/简称]
+# 简称缺省时去掉全称末尾的“省”“市”“地区”“盟”“县”等；直辖市、特别行政区与台湾的城市即其本身
+_DATA = """\
+11 北京市
+12 天津市
+13 河北省 0100石家庄市 0200唐山市 0300秦皇岛市 0400邯郸市 0500邢台市 0600保定市 0700张家口市 0800承德市 0900沧州市 1000廊坊市 1100衡水市
+14 山西省 0100太原市 0200大同市 0300阳泉市 0400长治市 0500晋城市 0600朔州市 0700晋中市 0800运城市 0900忻州市 1000临汾市 1100吕梁市
+15 内蒙古自治区/内蒙古 0100呼和浩特市 0200包头市 0300乌海市 0400赤峰市 0500通辽市 0600鄂尔多斯市 0700呼伦贝尔市 0800巴彦淖尔市 0900乌兰察布市 2200兴安盟 2500锡林郭勒盟 2900阿拉善盟
+21 辽宁省 0100沈阳市 0200大连市 0300鞍山市 0400抚顺市 0500本溪市 0600丹东市 0700锦州市 0800营口市 0900阜新市 1000辽阳市 1100盘锦市 1200铁岭市 1300朝阳市 1400葫芦岛市
+22 吉林省 0100长春市 0200吉林市 0300四平市 0400辽源市 0500通化市 0600白山市 0700松原市 0800白城市 2400延边朝鲜族自治州/延边
+23 黑龙江省 0100哈尔滨市 0200齐齐哈尔市 0300鸡西市 0400鹤岗市 0500双鸭山市 0600大庆市 0700伊春市 0800佳木斯市 0900七台河市 1000牡丹江市 1100黑河市 1200绥化市 2700大兴安岭地区
+31 上海市
+32 江苏省 0100南京市 0200无锡市 0300徐州市 0400常州市 0500苏州市 0600南通市 0700连云港市 0800淮安市 0900盐城市 1000扬州市 1100镇江市 1200泰州市 1300宿迁市
+33 浙江省 0100杭州市 0200宁波市 0300温州市 0400嘉兴市 0500湖州市 0600绍兴市 0700金华市 0800衢州市 0900舟山市 1000台州市 1100丽水市
+34 安徽省 0100合肥市 0200芜湖市 0300蚌埠市 0400淮南市 0500马鞍山市 0600淮北市 0700铜陵市 0800安庆市 1000黄山市 1100滁州市 1200阜阳市 1300宿州市 1500六安市 1600亳州市 1700池州市 1800宣城市
+35 福建省 0100福州市 0200厦门市 0300莆田市 0400三明市 0500泉州市 0600漳州市 0700南平市 0800龙岩市 0900宁德市
+36 江西省 0100南昌市 0200景德镇市 0300萍乡市 0400九江市 0500新余市 0600鹰潭市 0700赣州市 0800吉安市 0900宜春市 1000抚州市 1100上饶市
+37 山东省 0100济南市 0200青岛市 0300淄博市 0400枣庄市 0500东营市 0600烟台市 0700潍坊市 0800济宁市 0900泰安市 1000威海市 1100日照市 1300临沂市 1400德州市 1500聊城市 1600滨州市 1700菏泽市
+41 河南省 0100郑州市 0200开封市 0300洛阳市 0400平顶山市 0500安阳市 0600鹤壁市 0700新乡市 0800焦作市 0900濮阳市 1000许昌市 1100漯河市 1200三门峡市 1300南阳市 1400商丘市 1500信阳市 1600周口市 1700驻马店市 9001济源市
+42 湖北省 0100武汉市 0200黄石市 0300十堰市 0500宜昌市 0600襄阳市 0700鄂州市 0800荆门市 0900孝感市 1000荆州市 1100黄冈市 1200咸宁市 1300随州市 2800恩施土家族苗族自治州/恩施 9004仙桃市 9005潜江市 9006天门市 9021神农架林区/神农架
+43 湖南省 0100长沙市 0200株洲市 0300湘潭市 0400衡阳市 0500邵阳市 0600岳阳市 0700常德市 0800张家界市 0900益阳市 1000郴州市 1100永州市 1200怀化市 1300娄底市 3100湘西土家族苗族自治州/湘西
+44 广东省 0100广州市 0200韶关市 0300深圳市 0400珠海市 0500汕头市 0600佛山市 0700江门市 0800湛江市 0900茂名市 1200肇庆市 1300惠州市 1400梅州市 1500汕尾市 1600河源市 1700阳江市 1800清远市 1900东莞市 2000中山市 5100潮州市 5200揭阳市 5300云浮市
+45 广西壮族自治区/广西 0100南宁市 0200柳州市 0300桂林市 0400梧州市 0500北海市 0600防城港市 0700钦州市 0800贵港市 0900玉林市 1000百色市 1100贺州市 1200河池市 1300来宾市 1400崇左市
+46 海南省 0100海口市 0200三亚市 0300三沙市 0400儋州市 9001五指山市 9002琼海市 9005文昌市 9006万宁市 9007东方市 9021定安县 9022屯昌县 9023澄迈县 9024临高县 9025白沙黎族自治县/白沙 9026昌江黎族自治县/昌江 9027乐东黎族自治县/乐东 9028陵水黎族自治县/陵水 9029保亭黎族苗族自治县/保亭 9030琼中黎族苗族自治县/琼中
+50 重庆市
+51 四川省 0100成都市 0300自贡市 0400攀枝花市 0500泸州市 0600德阳市 0700绵阳市 0800广元市 0900遂宁市 1000内江市 1100乐山市 1300南充市 1400眉山市 1500宜宾市 1600广安市 1700达州市 1800雅安市 1900巴中市 2000资阳市 3200阿坝藏族羌族自治州/阿坝 3300甘孜藏族自治州/甘孜 3400凉山彝族自治州/凉山
+52 贵州省 0100贵阳市 0200六盘水市 0300遵义市 0400安顺市 0500毕节市 0600铜仁市 2300黔西南布依族苗族自治州/黔西南 2600黔东南苗族侗族自治州/黔东南 2700黔南布依族苗族自治州/黔南
+53 云南省 0100昆明市 0300曲靖市 0400玉溪市 0500保山市 0600昭通市 0700丽江市 0800普洱市 0900临沧市 2300楚雄彝族自治州/楚雄 2500红河哈尼族彝族自治州/红河 2600文山壮族苗族自治州/文山 2800西双版纳傣族自治州/西双版纳 2900大理白族自治州/大理 3100德宏傣族景颇族自治州/德宏 3300怒江傈僳族自治州/怒江 3400迪庆藏族自治州/迪庆
+54 西藏自治区/西藏 0100拉萨市 0200日喀则市 0300昌都市 0400林芝市 0500山南市 0600那曲市 2500阿里地区
+61 陕西省 0100西安市 0200铜川市 0300宝鸡市 0400咸阳市 0500渭南市 0600延安市 0700汉中市 0800榆林市 0900安康市 1000商洛市
+62 甘肃省 0100兰州市 0200嘉峪关市 0300金昌市 0400白银市 0500天水市 0600武威市 0700张掖市 0800平凉市 0900酒泉市 1000庆阳市 1100定西市 1200陇南市 2900临夏回族自治州/临夏 3000甘南藏族自治州/甘南
+63 青海省 0100西宁市 0200海东市 2200海北藏族自治州/海北 2300黄南藏族自治州/黄南 2500海南藏族自治州/海南 2600果洛藏族自治州/果洛 2700玉树藏族自治州/玉树 2800海西蒙古族藏族自治州/海西
+64 宁夏回族自治区/宁夏 0100银川市 0200石嘴山市 0300吴忠市 0400固原市 0500中卫市
+65 新疆维吾尔自治区/新疆 0100乌鲁木齐市 0200克拉玛依市 0400吐鲁番市 0500哈密市 2300昌吉回族自治州/昌吉 2700博尔塔拉蒙古自治州/博尔塔拉 2800巴音郭楞蒙古自治州/巴音郭楞 2900阿克苏地区 3000克孜勒苏柯尔克孜自治州/克孜勒苏 3100喀什地区 3200和田地区 4000伊犁哈萨克自治州/伊犁 4200塔城地区 4300阿勒泰地区 9001石河子市 9002阿拉尔市 9003图木舒克市 9004五家渠市 9005北屯市 9006铁门关市 9007双河市 9008可克达拉市 9009昆玉市 9010胡杨河市 9011新星市 9012白杨市
+71 台湾省
+81 香港特别行政区/香港
+82 澳门特别行政区/澳门
+"""
+
+_DIRECT_PLACEHOLDERS = ("省直辖县级行政区划", "自治区直辖县级行政区划")
+
+_SUFFIXES = ("特别行政区", "地区", "林区", "省", "市", "盟", "县")
+
+
+def _short_name(entry):
+    """“全称/简称”拆为 (全称, 简称)；未写简称时去掉行政区划后缀"""
+    if "/" in entry:
+        return tuple(entry.split("/", 1))
+    for suffix in _SUFFIXES:
+        if entry.endswith(suffix) and len(entry) > len(suffix) + 1:
+            return entry, entry[:-len(suffix)]
+    return entry, entry
+
+
+def _aliases(full, short):
+    aliases = {full, short}
+    if full.endswith("自治州"):
+        # 自治州常简写为“延边州”“恩施州”
+        aliases.add(short + "州")
+    return aliases
+
+
+class _Trie:
+    """别名前缀树：longest_prefix 返回文本开头最长的别名对应的值与剩余文本"""
+
+    def __init__(self):
+        self.root = {}
+        self.names = {}
+
+    def add(self, alias, value):
+        node = self.root
+        for char in alias:
+            node = node.setdefault(char, {})
+        node[None] = value
+        self.names[alias] = value
+
+    def longest_prefix(self, text):
+        node, found, end = self.root, None, 0
+        for i, char in enumerate(text):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                found, end = node[None], i + 1
+        return found, text[end:]
+
+    def suggest(self, text):
+        """与输入最接近的名称，用于提示错别字"""
+        close = difflib.get_close_matches(text, list(self.names), n=1, cutoff=0.5)
+        return self.names[close[0]] if close else None
+
+
+PROVINCES = {}   # 省份简称 -> 代码
+CITIES = {}      # 省份简称 -> {城市简称: 代码}，按代码排序
+_provinces = _Trie()
+_cities = {}     # 省份简称 -> 城市别名前缀树
+_any_city = _Trie()   # 城市别名 -> 所属省份简称集合，用于只填写城市时推断省份
+
+
+def _load():
+    for line in _DATA.splitlines():
+        prefix, province_entry, *city_entries = line.split()
+        full, province = _short_name(province_entry)
+        PROVINCES[province] = prefix + "0000"
+        for alias in _aliases(full, province):
+            _provinces.add(alias, province)
+        trie = _cities[province] = _Trie()
+        if not city_entries:
+            city_entries = [f"0100{province_entry}"]
+        cities = CITIES[province] = {}
+        for entry in city_entries:
+            full, city = _short_name(entry[4:])
+            cities[city] = prefix + entry[:4]
+            for alias in _aliases(full, city):
+                trie.add(alias, city)
+                _any_city.add(alias, _any_city.names.get(alias, frozenset()) | {province})
+
+
+_load()
+
+
+def admin_data():
+    """省份及其城市，供界面下拉框使用"""
+    return {province: list(cities) for province, cities in CITIES.items()}
+
+
+def division_code(province, city=None):
+    if city:
+        return CITIES.get(province, {}).get(city)
+    return PROVINCES.get(province)
+
+
+def _is_municipality(province):
+    return list(CITIES[province]) == [province]
+
+
+def _match(trie, text):
+    """返回 (匹配的值, 剩余的县区文本)；剩余部分只有一个字（如“长沙县”的“县”）时不算匹配"""
+    value, rest = trie.longest_prefix(text)
+    if value is None or len(rest) == 1:
+        return None, text
+    return value, rest
+
+
+def _match_city(province, text):
+    return _match(_cities[province], text)
+
+
+@functools.lru_cache(maxsize=4096)
+def resolve(province, city, county=""):
+    """规范省份、城市、县区，返回 (省份, 城市, 县区, 问题)；无法识别时保留原文，问题为说明，否则为 None"""
+    province, city, county = province.strip(), city.strip(), county.strip()
+    if city in _DIRECT_PLACEHOLDERS and county:
+        # 统计用区划表中省直辖县级市的城市一栏为占位名称，实际城市在县区一栏
+        city, county = county, ""
+    if province:
+        matched, rest = _provinces.longest_prefix(province)
+        if matched is None:
+            return province, city, county, f"省份“{province}”不在行政区划中"
+        province = matched
+        if rest and not city:
+            # 省份一栏连写了城市、县区
+            city = rest
+        elif rest and _match_city(province, rest)[0] != _match_city(province, city)[0]:
+            return province, city, county, f"省份“{province}{rest}”与城市“{city}”不一致"
+    elif city in _provinces.names:
+        # 只填了一个名称、又是省份别名时按省份处理（如“海南”不当作青海的海南州）
+        province, city = _provinces.names[city], ""
+    elif city:
+        provinces, _ = _match(_any_city, city)
+        if provinces and len(provinces) == 1:
+            province = next(iter(provinces))
+        else:
+            matched, rest = _provinces.longest_prefix(city)
+            if matched is None or not rest:
+                return province, city, county, f"无法确定城市“{city}”所在的省份"
+            province, city = matched, rest
+    if not city:
+        return province, city, county, None
+    matched, rest = _match_city(province, city)
+    if matched is None:
+        if _is_municipality(province):
+            # 直辖市、特别行政区的城市一栏常填区名，作为县区保存
+            return province, province, county or city, None
+        problem = f"城市“{city}”不在{province}的地级行政区划中"
+        suggestion = _cities[province].suggest(city)
+        if suggestion:
+            problem += f"，是否为“{suggestion}”？"
+        return province, city, county, problem
+    if county:
+        # 县区一栏带有城市名时去掉
+        in_city, county_rest = _match_city(province, county)
+        if in_city == matched and county_rest:
+            county = county_rest
+    return province, matched, county or rest, None
+
+
+def normalize_rows(rows):
+    """按行政区划规范导入行的省份、城市、县区（就地修改）：相同的组合只解析一次，返回无法识别的说明"""
+    keys = {(data.get('province') or '', data.get('city') or '', data.get('county') or '') for data in rows}
+    resolved = {key: resolve(*key) for key in keys}
+    problems = []
+    for data in rows:
+        province, city, county, problem = resolved[(data.get('province') or '', data.get('city') or '', data.get('county') or '')]
+        data['province'], data['city'], data['county'] = province, city, county
+        if problem:
+            problems.append(f"记录 '{data.get('real_name')}' {problem}")
+    return problems
+
+
+def normalize_divisions(c, table='personnel'):
+    """迁移：按行政区划规范已有人员的省份、城市、县区，无法识别的保持不变；返回修改的人数
+
+    不视为本地修改：调用前须去掉人员表的修改时间触发器，修改时间与复制来源保持原值。
+    """
+    c.execute(f"SELECT DISTINCT province, city, county FROM {table}")
+    updated = 0
+    for old in c.fetchall():
+        province, city, county, problem = resolve(*(value or '' for value in old))
+        new = tuple(value or None for value in (province, city, county))
+        if problem or new == tuple(value or None for value in old):
+            continue
+        c.execute(f"UPDATE {table} SET province = ?, city = ?, county = ?, city_pinyin = ? "
+                  "WHERE province IS ? AND city IS ? AND county IS ?",
+                  (*new, to_pinyin(city)[0] if city else None, *old))
+        updated += c.rowcount
+    if updated:
+        logging.info(f"数据库迁移：{table} 表按行政区划规范省份、城市 {updated} 人")
+    return updated
@@ -0,0 +1,156 @@
+# 人员筛选条件：条件树编译为一条参数化 SQL。
+# 条件与分组都是可 JSON 序列化的普通结构，便于在界面、导出和数据服务之间传递：
+#     条件 {'field': 'status', 'op': 'eq', 'value': '在职'}
+#     分组 {'all': [...]}（全部满足）或 {'any': [...]}（任一满足），可嵌套
+# 排序为 [(字段, 'asc' | 'desc'), ...]。
+from birth import AGE_SQL, age_range
+from models import FIELD_LABELS
+from pinyin import is_pinyin_query
+
+# 可筛选、可排序的列及其取值类型
+FILTER_FIELDS = {
+    'id': int, 'real_name': str, 'gender': str, 'age': int, 'id_number': str, 'phone': str,
+    'province': str, 'city': str, 'county': str, 'nickname': str, 'education': str,
+    'political_status': str, 'occupation': str, 'position': str, 'status': str,
+    'join_date': str, 'donation_days': str, 'address': str, 'created_at': str, 'updated_at': str,
+    'name_pinyin': str, 'name_initials': str, 'city_pinyin': str,
+    'birth_date': str, 'birthday': str, 'id_gender': str,
+}
+
+FILTER_LABELS = dict(FIELD_LABELS, id='ID', created_at='创建时间', updated_at='最后修改时间',
+                     name_pinyin='姓名拼音', name_initials='姓名首字母', city_pinyin='城市拼音',
+                     birth_date='出生日期', birthday='生日（月-日）', id_gender='身份证性别')
+
+OPERATORS = {
+    'eq': '等于', 'ne': '不等于', 'lt': '小于', 'le': '小于等于', 'gt': '大于', 'ge': '大于等于',
+    'contains': '包含', 'startswith': '开头是', 'in': '属于', 'between': '介于',
+    'empty': '为空', 'not_empty': '不为空',
+}
+
+_COMPARISONS = {'eq': '=', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+
+# 年龄比较换算为 [最小, 最大] 年龄范围（见 birth 模块）
+_AGE_RANGES = {'eq': lambda age: (age, age), 'lt': lambda age: (None, age - 1), 'le': lambda age: (None, age),
+               'gt': lambda age: (age + 1, None), 'ge': lambda age: (age, None)}
+
+
+def condition(field, op, value=None):
+    return {'field': field, 'op': op, 'value': value}
+
+
+def all_of(*items):
+    return {'all': [item for item in items if item]}
+
+
+def any_of(*items):
+    return {'any': [item for item in items if item]}
+
+
+def keyword_filter(search):
+    """搜索框关键字：姓名或手机号包含关键字；纯字母时还按姓名全拼、首字母前缀匹配"""
+    if not search:
+        return None
+    items = [condition('real_name', 'contains', search), condition('phone', 'contains', search)]
+    if is_pinyin_query(search):
+        items += [condition('name_pinyin', 'startswith', search.lower()),
+                  condition('name_initials', 'startswith', search.lower())]
+    return any_of(*items)
+
+
+def _coerce(field, value):
+    try:
+        return FILTER_FIELDS[field](value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{FILTER_LABELS.get(field, field)} 的取值无效：{value}")
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _compile_age(op, value, params):
+    # 按出生日期计算的年龄，出生日期未知时比较手填的年龄
+    if op == 'between':
+        low, high = value
+        return age_range(_coerce('age', low), _coerce('age', high), params)
+    if op == 'in':
+        ages = [_coerce('age', v) for v in value or []]
+        if not ages:
+            return "0"
+        return "(" + " OR ".join(age_range(age, age, params) for age in ages) + ")"
+    if op == 'empty':
+        return "(birth_date IS NULL AND (age IS NULL OR age = ''))"
+    if op == 'not_empty':
+        return "(birth_date IS NOT NULL OR (age IS NOT NULL AND age != ''))"
+    age = _coerce('age', value)
+    if op == 'ne':
+        return f"({age_range(None, age - 1, params)} OR {age_range(age + 1, None, params)})"
+    return age_range(*_AGE_RANGES[op](age), params)
+
+
+def _compile_condition(item, params):
+    field, op, value = item.get('field'), item.get('op'), item.get('value')
+    if field not in FILTER_FIELDS:
+        raise ValueError(f"不支持筛选的字段：{field}")
+    if op not in OPERATORS:
+        raise ValueError(f"不支持的运算符：{op}")
+    if field == 'age' and op not in ('contains', 'startswith'):
+        return _compile_age(op, value, params)
+    if op in _COMPARISONS:
+        params.append(_coerce(field, value))
+        return f"{field} {_COMPARISONS[op]} ?"
+    if op == 'contains':
+        params.append(f"%{_escape_like(str(value))}%")
+        return f"{field} LIKE ? ESCAPE '\\'"
+    if op == 'startswith':
+        # 前缀写成范围比较，可以使用该列上的索引
+        prefix = str(value)
+        params.extend([prefix, prefix + '\U0010ffff'])
+        return f"({field} >= ? AND {field} < ?)"
+    if op == 'in':
+        values = [_coerce(field, v) for v in value or []]
+        if not values:
+            return "0"
+        params.extend(values)
+        return f"{field} IN ({', '.join('?' for _ in values)})"
+    if op == 'between':
+        low, high = value
+        params.extend([_coerce(field, low), _coerce(field, high)])
+        return f"{field} BETWEEN ? AND ?"
+    if op == 'empty':
+        return f"({field} IS NULL OR {field} = '')"
+    return f"({field} IS NOT NULL AND {field} != '')"
+
+
+def _compile(node, params):
+    if 'all' in node or 'any' in node:
+        joiner, items = (' AND ', node['all']) if 'all' in node else (' OR ', node['any'])
+        parts = [_compile(item, params) for item in items]
+        parts = [part for part in parts if part]
+        if not parts:
+            return ""
+        return parts[0] if len(parts) == 1 else "(" + joiner.join(parts) + ")"
+    return _compile_condition(node, params)
+
+
+def compile_filter(criteria):
+    """返回 (WHERE 子句, 参数)，没有条件时子句为空字符串"""
+    params = []
+    if not criteria:
+        return "", params
+    clause = _compile(criteria, params)
+    return (f" WHERE {clause}" if clause else ""), params
+
+
+def compile_order(order_by):
+    """返回 ORDER BY 子句，以 id 兜底保证排序稳定"""
+    terms = []
+    for field, direction in order_by or []:
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"不支持排序的字段：{field}")
+        if direction not in ('asc', 'desc'):
+            raise ValueError(f"排序方向无效：{direction}")
+        terms.append(f"{AGE_SQL if field == 'age' else field} {direction.upper()}")
+    if not any(field == 'id' for field, _ in order_by or []):
+        terms.append("id ASC")
+    return " ORDER BY " + ", ".join(terms)
@@ -1,27 +1,514 @@
+import os
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
-from database import init_db, migrate_db, load_admin_data, import_data, export_data, export_talent_pool, save_person, save_and_add_to_talent_pool, add_to_talent_pool, delete_person
+from concurrency import DatabaseBusyError
+from database import connect, write_connection, ensure_schema
+if os.environ.get("RENSHI_SERVER"):
+    # 客户端模式：人员数据经由人事数据服务读写，本地库只保存图标与密码
+    from remote import load_admin_data, import_data, export_data, export_delta, get_export_watermark, record_export_watermark, export_talent_pool, save_person, save_and_add_to_talent_pool, add_to_talent_pool, delete_person, bulk_delete_persons, bulk_add_to_talent_pool, bulk_update_persons, bulk_remove_from_talent_pool, get_person_detail, prefetch_persons, query_personnel, list_talent_pool, find_duplicates, merge_persons, get_headcount_overview, health_report, run_maintenance, archive_persons, restore_persons
+else:
+    from database import load_admin_data, import_data, export_data, export_delta, get_export_watermark, record_export_watermark, export_talent_pool, save_person, save_and_add_to_talent_pool, add_to_talent_pool, delete_person, bulk_delete_persons, bulk_add_to_talent_pool, bulk_update_persons, bulk_remove_from_talent_pool, get_person_detail, prefetch_persons, query_personnel, list_talent_pool, find_duplicates, merge_persons, get_headcount_overview
+    from maintenance import health_report, run_maintenance
+    from archive import archive_persons, restore_persons
+from stats import REPORT_DIMENSIONS
+from maintenance import TASKS, CLIENT_TASKS, MaintenanceScheduler, format_report
+from querylog import profiler, profiled
+from typeahead import LiveSearch
+import snapshot
+from filters import FILTER_FIELDS, FILTER_LABELS, OPERATORS, condition, all_of, keyword_filter
+from models import FIELD_LABELS, BASIC_DETAIL_FIELDS, EXTRA_DETAIL_FIELDS
 from utils import check_password, save_password, validate_password, upload_photo, delete_photo, backup_data, export_person_data
-import sqlite3
 import pandas as pd
 import openpyxl
 from openpyxl.styles import Alignment, Font, Border, Side
 from PIL import Image, ImageTk
-import datetime
-import os
 import logging
 import time
 import re
 import sys
 import io
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# 性能分析模式下以 cProfile 记录的界面处理函数
+PROFILED_HANDLERS = (
+    "verify_password", "create_widgets", "refresh_data", "query_by_division", "sort_by_column", "import_data",
+    "export_data", "backup_data", "show_talent_pool", "show_duplicates_window", "show_stats_dashboard",
+    "show_person_details", "delete_person_from_main", "bulk_add_to_talent_pool",
+)
+
+# 列式快照模式（--snapshot）：主列表在内存中筛选、排序，客户端模式下不可用
+SNAPSHOT_MODE = bool(os.environ.get("RENSHI_SNAPSHOT")) and not os.environ.get("RENSHI_SERVER")
+
+# 登录前预加载的主窗口数据超过此时间（秒）未使用，登录后重新读取
+PRELOAD_MAX_AGE = 300
+
+# 主列表的列与数据库字段对应，用于点击表头排序；姓名、城市按拼音排序
+TREE_COLUMN_FIELDS = {"ID": "id", "姓名": "name_pinyin", "性别": "gender", "年龄": "age", "手机号": "phone",
+                      "省份": "province", "城市": "city_pinyin", "分会职务": "position", "在职状态": "status"}
+
+# 人员详情窗口关闭后隐藏留待复用，再次打开只更新字段；窗口数到此上限后复用最久未打开的隐藏窗口，
+# 都在显示时另建，关闭时超出上限的销毁
+DETAIL_POOL_SIZE = 8
+
+
+def _set_text(text, scrollbar, value, max_lines):
+    """更新只读文本框的内容，超过 max_lines 行时显示滚动条"""
+    text.config(state="normal")
+    text.delete("1.0", tk.END)
+    text.insert(tk.END, value if value else "无")
+    text.config(state="disabled")
+    text.update_idletasks()
+    if text.count("1.0", tk.END, "displaylines")[0] > max_lines:
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    else:
+        scrollbar.pack_forget()
+
+
+class DetailWindow:
+    """人员详情窗口：控件与按钮只创建一次，fill 换成另一名人员的信息"""
+
+    def __init__(self, app):
+        self.app = app
+        self.person = None
+        self.from_talent = False
+        window = self.window = tk.Toplevel(app.root)
+        window.geometry("505x640")
+        window.configure(bg="#F0F0F0")
+        window.protocol("WM_DELETE_WINDOW", lambda: app.close_detail_window(window))
+
+        main_frame = tk.Frame(window, bg="#FFFFFF", bd=2, relief="solid")
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        basic_frame = tk.LabelFrame(main_frame, text="基本信息", font=("Roboto", 10, "bold"), bg="#FFFFFF")
+        basic_frame.pack(fill=tk.X, padx=5, pady=5)
+        basic_inner = tk.Frame(basic_frame, bg="#FFFFFF")
+        basic_inner.pack(fill=tk.X, padx=5, pady=5)
+
+        basic_inner.grid_columnconfigure(0, minsize=100)
+        basic_inner.grid_columnconfigure(1, minsize=180)
+        basic_inner.grid_columnconfigure(2, weight=0, minsize=150)
+
+        self.values = {}
+        for i, name in enumerate(BASIC_DETAIL_FIELDS):
+            field = FIELD_LABELS[name]
+            tk.Label(basic_inner, text=f"{field}：", width=14, anchor="e", font=("Roboto", 10), bg="#FFFFFF").grid(row=i, column=0, sticky="e")
+            wraplength = 180 if field == "分会职务" else 0
+            self.values[name] = tk.Label(basic_inner, anchor="w", wraplength=wraplength, font=("Roboto", 10), bg="#FFFFFF")
+            self.values[name].grid(row=i, column=1, sticky="w")
+
+        photo_wrapper = tk.Frame(basic_inner, bg="#FFFFFF")
+        photo_wrapper.grid(row=0, column=2, rowspan=7, sticky="e", padx=(10, 10), pady=5)
+        photo_frame = tk.Frame(photo_wrapper, width=100, height=130, bd=1, relief="solid", bg="#F5F5F5", highlightbackground="#CCCCCC", highlightthickness=1)
+        photo_frame.pack(expand=True, fill="y")
+        photo_frame.pack_propagate(False)
+        self.photo_label = tk.Label(photo_frame, bg="#F5F5F5")
+        self.photo_label.pack(fill="both")
+        self.no_photo = tk.Label(photo_frame, text="无照片", font=("Roboto", 10), bg="#F5F5F5")
+
+        detail_frame = tk.LabelFrame(main_frame, text="详细信息", font=("Roboto", 10, "bold"), bg="#FFFFFF")
+        detail_frame.pack(fill=tk.X, padx=5, pady=5)
+        detail_inner = tk.Frame(detail_frame, bg="#FFFFFF")
+        detail_inner.pack(fill=tk.X, padx=10, pady=10)
+
+        detail_left = tk.Frame(detail_inner, bg="#FFFFFF")
+        detail_left.pack(side=tk.LEFT, fill=tk.Y)
+        detail_left.grid_columnconfigure(0, minsize=100)
+        detail_left.grid_columnconfigure(1, minsize=180)
+        for i, name in enumerate(EXTRA_DETAIL_FIELDS):
+            field = FIELD_LABELS[name]
+            tk.Label(detail_left, text=f"{field}：", width=14, anchor="e", font=("Roboto", 10), bg="#FFFFFF").grid(row=i, column=0, sticky="e")
+            wraplength = 180 if field in ["个人职业", "家庭住址"] else 250
+            self.values[name] = tk.Label(detail_left, anchor="w", wraplength=wraplength, font=("Roboto", 10), bg="#FFFFFF")
+            self.values[name].grid(row=i, column=1, sticky="w")
+
+        # 加入人才库理由，只在从人才库打开时显示
+        self.reason_panel = tk.Frame(detail_inner, bg="#FFFFFF")
+        tk.Label(self.reason_panel, text="加入人才库理由", font=("Roboto", 10, "bold"), bg="#FFFFFF", anchor="center").pack(fill=tk.X, pady=(0, 5))
+        reason_frame = tk.Frame(self.reason_panel, width=150, height=130, bg="#F5F5F5")
+        reason_frame.pack(fill=tk.X, padx=5, pady=5)
+        reason_frame.pack_propagate(False)
+        self.reason_text = tk.Text(
+            reason_frame, width=18, height=7, wrap=tk.WORD, font=("Roboto", 10),
+            bg="#F5F5F5", bd=0, highlightthickness=0, relief="flat"
+        )
+        self.reason_text.pack(side=tk.LEFT, padx=5, pady=5, fill="both", expand=True)
+        self.reason_scrollbar = ttk.Scrollbar(reason_frame, orient=tk.VERTICAL, command=self.reason_text.yview)
+        self.reason_text.configure(yscrollcommand=self.reason_scrollbar.set)
+
+        # 其他信息（自定义属性）行数因人而异，标签不够时补建，多余的隐藏
+        self.extra_frame = tk.LabelFrame(main_frame, text="其他信息", font=("Roboto", 10, "bold"), bg="#FFFFFF")
+        self.extra_inner = tk.Frame(self.extra_frame, bg="#FFFFFF")
+        self.extra_inner.pack(fill=tk.X, padx=10, pady=5)
+        self.extra_inner.grid_columnconfigure(0, minsize=100)
+        self.extra_labels = []
+
+        self.bio_frame = tk.LabelFrame(main_frame, text="个人简历", font=("Roboto", 10, "bold"), bg="#FFFFFF")
+        self.bio_frame.pack(fill=tk.BOTH, padx=5, pady=5)
+        bio_inner = tk.Frame(self.bio_frame, bg="#F5F5F5")
+        bio_inner.pack(fill=tk.BOTH, padx=5, pady=5, expand=True)
+        self.bio_text = tk.Text(
+            bio_inner, width=45, height=5, wrap=tk.WORD, font=("Roboto", 10),
+            bg="#F5F5F5", bd=0, highlightthickness=0, relief="flat"
+        )
+        self.bio_text.pack(side=tk.LEFT, padx=5, pady=5, fill="both", expand=True)
+        self.bio_scrollbar = ttk.Scrollbar(bio_inner, orient=tk.VERTICAL, command=self.bio_text.yview)
+        self.bio_text.configure(yscrollcommand=self.bio_scrollbar.set)
+
+        button_frame = tk.Frame(main_frame, bg="#FFFFFF")
+        button_frame.pack(fill=tk.X, pady=10)
+        inner_button_frame = tk.Frame(button_frame, bg="#FFFFFF")
+        inner_button_frame.pack(anchor="center")
+        # 按钮的命令读取当前显示的人员，换人时不必重新绑定
+        self.buttons = {}
+        for name, text, command, color, active in (
+                ("restore", "恢复人员", lambda: app.restore_person(self.person.id, window), "#2196F3", "#1976D2"),
+                ("edit", "修改信息", lambda: app.edit_person(self.person.id, window, self.from_talent), "#2196F3", "#1976D2"),
+                ("export", "导出信息", lambda: app.export_person_data(self.person, self.from_talent), "#2196F3", "#1976D2"),
+                ("delete", "删除人员", lambda: app.delete_person(self.person.id, window), "#FF9800", "#F57C00"),
+                ("add", "加入人才库", lambda: app.show_reason_window(self.person.id, window), "#2196F3", "#1976D2")):
+            button = tk.Button(inner_button_frame, text=text, command=command, font=("Roboto", 10), bg=color, fg="white", bd=0, relief="flat", padx=10, pady=5)
+            button.bind("<Enter>", lambda e, button=button, active=active: button.config(bg=active))
+            button.bind("<Leave>", lambda e, button=button, color=color: button.config(bg=color))
+            self.buttons[name] = button
+
+    def shown(self):
+        return bool(self.window.winfo_exists()) and self.window.state() != "withdrawn"
+
+    def fill(self, person, from_talent):
+        self.person = person
+        self.from_talent = from_talent
+        self.window.title("人员详情（已归档）" if person.archived else "人员详情")
+        for name, label in self.values.items():
+            value = getattr(person, name)
+            label.config(text=value if value else "无")
+
+        self.photo_label.config(image="")
+        self.photo_label.image = None
+        loaded = False
+        if person.photo_path and os.path.exists(person.photo_path):
+            try:
+                img = Image.open(person.photo_path)
+                img.thumbnail((100, 130), Image.Resampling.LANCZOS)
+                photo = ImageTk.PhotoImage(img)
+                self.photo_label.config(image=photo)
+                self.photo_label.image = photo
+                loaded = True
+                logging.info(f"详情页加载照片：{person.photo_path}")
+            except Exception as e:
+                messagebox.showwarning("警告", f"无法加载照片：{str(e)}")
+                logging.error(f"加载照片失败：{str(e)}")
+        if loaded:
+            self.no_photo.pack_forget()
+        else:
+            self.no_photo.pack(expand=True)
+
+        if from_talent:
+            self.reason_panel.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 10))
+            _set_text(self.reason_text, self.reason_scrollbar, person.talent_reason, 7)
+        else:
+            self.reason_panel.pack_forget()
+
+        extra_attributes = person.extra_attributes()
+        for i, (field, value) in enumerate(extra_attributes.items()):
+            if i == len(self.extra_labels):
+                self.extra_labels.append((
+                    tk.Label(self.extra_inner, width=14, anchor="e", font=("Roboto", 10), bg="#FFFFFF"),
+                    tk.Label(self.extra_inner, anchor="w", wraplength=120, font=("Roboto", 10), bg="#FFFFFF"),
+                ))
+            name_label, value_label = self.extra_labels[i]
+            name_label.config(text=f"{field}：")
+            value_label.config(text=value if value else "无")
+            name_label.grid(row=i // 2, column=(i % 2) * 2, sticky="e")
+            value_label.grid(row=i // 2, column=(i % 2) * 2 + 1, sticky="w")
+        for name_label, value_label in self.extra_labels[len(extra_attributes):]:
+            name_label.grid_remove()
+            value_label.grid_remove()
+        if extra_attributes:
+            self.extra_frame.pack(fill=tk.X, padx=5, pady=5, before=self.bio_frame)
+            self.window.geometry(f"505x{640 + 25 * ((len(extra_attributes) + 1) // 2) + 30}")
+        else:
+            self.extra_frame.pack_forget()
+            self.window.geometry("505x640")
+
+        _set_text(self.bio_text, self.bio_scrollbar, person.bio, 4)
+
+        for button in self.buttons.values():
+            button.pack_forget()
+        if person.archived:
+            # 归档人员只能查看、导出，恢复后才能修改
+            names = ("restore", "export")
+        elif from_talent:
+            names = ("edit", "export")
+        else:
+            names = ("edit", "export", "delete", "add")
+        for name in names:
+            self.buttons[name].pack(side=tk.LEFT, padx=5)
+        self.buttons["add"].config(state="disabled" if person.in_talent_pool else "normal")
+
+
+class PersonWindow:
+    """新增或编辑人员窗口：关闭时隐藏，再次打开时清空或换成另一名人员的信息"""
+
+    def __init__(self, app, mode):
+        self.app = app
+        self.mode = mode
+        self.person = None
+        self.from_talent = False
+        window = self.window = tk.Toplevel(app.root)
+        window.title("新增人员" if mode == "add" else "编辑人员")
+        window.geometry("505x640")
+        window.configure(bg="#F0F0F0")
+        window.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = tk.Frame(window, bg="#FFFFFF", bd=2, relief="solid")
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        basic_frame = tk.LabelFrame(main_frame, text="基本信息", font=("Roboto", 10, "bold"), bg="#FFFFFF")
+        basic_frame.pack(fill=tk.X, padx=5, pady=5)
+        basic_inner = tk.Frame(basic_frame, bg="#FFFFFF")
+        basic_inner.pack(fill=tk.X, padx=5, pady=5)
+
+        basic_inner.grid_columnconfigure(0, minsize=100)
+        basic_inner.grid_columnconfigure(1, minsize=180)
+        basic_inner.grid_columnconfigure(2, weight=0, minsize=150)
+
+        basic_fields = [
+            ("真实姓名", tk.Entry, None, 20),
+            ("性别", ttk.Combobox, ["男", "女"], 10),
+            ("年龄", tk.Entry, None, 10),
+            ("身份证号", tk.Entry, None, 20),
+            ("手机号", tk.Entry, None, 20),
+            ("分会职务", tk.Entry, None, 20),
+            ("在职状态", ttk.Combobox, ["在职", "离职", "无职务"], 10),
+        ]
+        self.entries = {}
+        for i, (field, widget_type, values, width) in enumerate(basic_fields):
+            tk.Label(basic_inner, text=f"{field}：", width=14, anchor="e", font=("Roboto", 10), bg="#FFFFFF").grid(row=i, column=0, sticky="e")
+            entry = widget_type(basic_inner, width=width, font=("Roboto", 10))
+            if values:
+                entry['values'] = values
+            entry.grid(row=i, column=1, sticky="w")
+            if widget_type == tk.Entry:
+                entry.config(bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
+            self.entries[field] = entry
+
+        photo_wrapper = tk.Frame(basic_inner, bg="#FFFFFF")
+        photo_wrapper.grid(row=0, column=2, rowspan=7, sticky="e", padx=(10, 10), pady=5)
+        photo_frame = tk.Frame(photo_wrapper, width=100, height=130, bd=1, relief="solid", bg="#F5F5F5", highlightbackground="#CCCCCC", highlightthickness=1)
+        photo_frame.pack(expand=True, fill="y")
+        photo_frame.pack_propagate(False)
+        self.photo_label = tk.Label(photo_frame, bg="#F5F5F5")
+        self.photo_label.pack(fill="both")
+        self.photo_path = tk.StringVar()
+
+        button_frame = tk.Frame(photo_wrapper, bg="#FFFFFF")
+        button_frame.pack(fill=tk.X, pady=5)
+        upload_btn = tk.Button(button_frame, text="上传照片", command=app.upload_photo, font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        upload_btn.pack(side=tk.LEFT, padx=5)
+        upload_btn.bind("<Enter>", lambda e: upload_btn.config(bg="#1976D2"))
+        upload_btn.bind("<Leave>", lambda e: upload_btn.config(bg="#2196F3"))
+        if mode == "edit":
+            delete_btn = tk.Button(button_frame, text="删除照片", command=lambda: delete_photo(self.photo_path, self.photo_label), font=("Roboto", 10), bg="#FF9800", fg="white", bd=0, relief="flat", padx=10, pady=5)
+            delete_btn.pack(side=tk.LEFT, padx=5)
+            delete_btn.bind("<Enter>", lambda e: delete_btn.config(bg="#F57C00"))
+            delete_btn.bind("<Leave>", lambda e: delete_btn.config(bg="#FF9800"))
+
+        detail_frame = tk.LabelFrame(main_frame, text="详细信息", font=("Roboto", 10, "bold"), bg="#FFFFFF")
+        detail_frame.pack(fill=tk.X, padx=5, pady=5)
+        detail_inner = tk.Frame(detail_frame, bg="#FFFFFF")
+        detail_inner.pack(fill=tk.X, padx=10, pady=10)
+
+        detail_left = tk.Frame(detail_inner, bg="#FFFFFF")
+        detail_left.pack(side=tk.LEFT, fill=tk.Y)
+        detail_fields = [
+            ("省份", tk.Entry, None, 20),
+            ("城市", tk.Entry, None, 20),
+            ("昵称", tk.Entry, None, 20),
+            ("学历", ttk.Combobox, ["初中", "高中", "大专", "本科", "硕士", "博士"], 10),
+            ("政治面貌", ttk.Combobox, ["中共党员", "共青团员", "群众"], 10),
+            ("个人职业", tk.Entry, None, 20),
+            ("加入组织时间", tk.Entry, None, 20),
+            ("跟捐天数", tk.Entry, None, 20),
+            ("家庭住址", tk.Entry, None, 20),
+        ]
+        for i, (field, widget_type, values, width) in enumerate(detail_fields):
+            tk.Label(detail_left, text=f"{field}：", width=14, anchor="e", font=("Roboto", 10), bg="#FFFFFF").grid(row=i, column=0, sticky="e")
+            entry = widget_type(detail_left, width=width, font=("Roboto", 10))
+            if values:
+                entry['values'] = values
+            entry.grid(row=i, column=1, sticky="w")
+            if widget_type == tk.Entry:
+                entry.config(bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
+            self.entries[field] = entry
+
+        # 加入人才库理由，只在编辑人才库人员时显示
+        self.reason_panel = tk.Frame(detail_inner, bg="#FFFFFF")
+        tk.Label(self.reason_panel, text="加入人才库理由", font=("Roboto", 10, "bold"), bg="#FFFFFF", anchor="center").pack(fill=tk.X, pady=(0, 5))
+        reason_frame = tk.Frame(self.reason_panel, bg="#F5F5F5", highlightbackground="#CCCCCC", highlightthickness=1)
+        reason_frame.pack(fill=tk.X)
+        self.reason_text = scrolledtext.ScrolledText(reason_frame, height=7, width=15, wrap=tk.WORD, font=("Roboto", 10), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
+        self.reason_text.pack(padx=15, pady=5)
+
+        bio_frame = tk.LabelFrame(main_frame, text="个人简历", font=("Roboto", 10, "bold"), bg="#FFFFFF")
+        bio_frame.pack(fill=tk.BOTH, padx=5, pady=5)
+        bio_text = scrolledtext.ScrolledText(bio_frame, height=5, width=45, wrap=tk.WORD, font=("Roboto", 10), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
+        bio_text.pack(fill=tk.X, padx=5, pady=5)
+        self.entries["个人简历"] = bio_text
+
+        button_frame = tk.Frame(main_frame, bg="#FFFFFF")
+        button_frame.pack(fill=tk.X, pady=10)
+        inner_button_frame = tk.Frame(button_frame, bg="#FFFFFF")
+        inner_button_frame.pack(anchor="center")
+        save_btn = tk.Button(inner_button_frame, text="保存", command=self.save, font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        save_btn.pack(side=tk.LEFT, padx=5)
+        save_btn.bind("<Enter>", lambda e: save_btn.config(bg="#1976D2"))
+        save_btn.bind("<Leave>", lambda e: save_btn.config(bg="#2196F3"))
+        cancel_btn = tk.Button(inner_button_frame, text="取消", command=self.close, font=("Roboto", 10), bg="#FF9800", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        cancel_btn.pack(side=tk.LEFT, padx=5)
+        cancel_btn.bind("<Enter>", lambda e: cancel_btn.config(bg="#F57C00"))
+        cancel_btn.bind("<Leave>", lambda e: cancel_btn.config(bg="#FF9800"))
+        self.save_add_btn = None
+        if mode == "add":
+            save_add_btn = self.save_add_btn = tk.Button(inner_button_frame, text="保存并加入人才库", command=lambda: app.save_and_add_to_talent_pool(self.entries, window), font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
+            save_add_btn.bind("<Enter>", lambda e: save_add_btn.config(bg="#1976D2"))
+            save_add_btn.bind("<Leave>", lambda e: save_add_btn.config(bg="#2196F3"))
+
+    def shown(self):
+        return bool(self.window.winfo_exists()) and self.window.state() != "withdrawn"
+
+    def close(self):
+        self.window.withdraw()
+
+    def fill(self, person=None, from_talent=False, talent_reason=""):
+        """清空表单；编辑时填入人员信息"""
+        self.person = person
+        self.from_talent = from_talent
+        for entry in self.entries.values():
+            if isinstance(entry, ttk.Combobox):
+                entry.set("")
+            elif isinstance(entry, tk.Text):
+                entry.delete("1.0", tk.END)
+            else:
+                entry.delete(0, tk.END)
+        if self.mode == "edit" and person:
+            for name, label in FIELD_LABELS.items():
+                if label not in self.entries:
+                    continue
+                value = getattr(person, name)
+                if isinstance(self.entries[label], ttk.Combobox):
+                    self.entries[label].set(value if value else "")
+                elif isinstance(self.entries[label], tk.Text):
+                    self.entries[label].insert(tk.END, value if value else "")
+                else:
+                    self.entries[label].insert(0, value if value else "")
+
+        if from_talent:
+            self.reason_panel.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 10))
+            self.reason_text.delete("1.0", tk.END)
+            self.reason_text.insert(tk.END, talent_reason if talent_reason else "")
+        else:
+            self.reason_panel.pack_forget()
+        if self.save_add_btn:
+            if from_talent:
+                self.save_add_btn.pack_forget()
+            else:
+                self.save_add_btn.pack(side=tk.LEFT, padx=5)
+
+        # 删除照片会在照片位置放一个“无照片”标签，换人时一并清掉
+        for child in self.photo_label.winfo_children():
+            child.destroy()
+        self.photo_label.config(image="")
+        self.photo_label.image = None
+        self.photo_path.set("")
+        if person and person.photo_path and os.path.exists(person.photo_path):
+            self.photo_path.set(person.photo_path)
+            try:
+                img = Image.open(person.photo_path)
+                img.thumbnail((100, 130), Image.Resampling.LANCZOS)
+                photo = ImageTk.PhotoImage(img)
+                self.photo_label.config(image=photo)
+                self.photo_label.image = photo
+                self.photo_label.update_idletasks()
+                logging.info(f"加载现有照片：{person.photo_path}")
+            except Exception as e:
+                messagebox.showwarning("警告", f"无法加载照片：{str(e)}")
+                logging.error(f"照片加载失败：{str(e)}")
+        else:
+            tk.Label(self.photo_label, text="无照片", font=("Roboto", 10), bg="#F5F5F5").pack(expand=True)
+
+    def save(self):
+        entries = self.entries
+        data = [
+            entries["真实姓名"].get() or None,
+            entries["性别"].get() or None,
+            entries["年龄"].get() or None,
+            entries["身份证号"].get() or None,
+            entries["手机号"].get() or None,
+            entries["省份"].get() or None,
+            entries["城市"].get() or None,
+            None,
+            entries["昵称"].get() or None,
+            entries["学历"].get() or None,
+            entries["政治面貌"].get() or None,
+            entries["个人职业"].get() or None,
+            entries["分会职务"].get() or None,
+            entries["在职状态"].get() or None,
+            entries["加入组织时间"].get() or None,
+            entries["跟捐天数"].get() or None,
+            entries["家庭住址"].get() or None,
+            entries["个人简历"].get("1.0", tk.END).strip() or None,
+            self.photo_path.get() or None,
+        ]
+        if not data[0] or not data[4]:
+            messagebox.showerror("错误", "真实姓名和手机号为必填项！")
+            return
+        try:
+            # 编辑人才库人员时清空的理由传空串，与未修改理由（None）区分
+            reason = None
+            if self.from_talent:
+                reason = self.reason_text.get("1.0", tk.END).strip()
+            if self.mode == "add":
+                if self.from_talent:
+                    person_id, message, error = save_and_add_to_talent_pool(data, reason or None)
+                else:
+                    person_id, message, error = save_person(data, self.mode, None)
+            else:
+                person_id, message, error = save_person(data, self.mode, self.person, self.from_talent, reason)
+            if error:
+                messagebox.showerror("错误", error)
+            else:
+                self.app.refresh_data()
+                messagebox.showinfo("提示", message)
+                self.close()
+                if person_id:
+                    updated_person = get_person_detail(person_id)
+                    if updated_person:
+                        self.app.show_person_details_manual(updated_person, self.from_talent)
+        except Exception as e:
+            messagebox.showerror("错误", f"保存失败：{str(e)}")
+
 
 class HRManagementApp:
     def __init__(self, root):
         self.root = root
         self.root.title("人事管理系统")
-        self.setup_database_and_icons()
-        migrate_db()
-        self.admin_data = load_admin_data()
+        self.root.report_callback_exception = self.report_callback_exception
+        if profiler.enabled:
+            # 在创建控件、绑定命令之前替换，按钮与事件调用的都是包装后的方法
+            for name in PROFILED_HANDLERS:
+                setattr(self, name, profiled(name, getattr(self, name)))
+        # 结构已是当前版本时只读取一次 user_version，建表与迁移只在首次运行或升级后执行
+        ensure_schema()
+        self.admin_data = {}
+        self.snapshot = None
+        self.snapshot_search = None
+        if SNAPSHOT_MODE and not snapshot.available():
+            logging.warning("未安装 numpy，列式快照不可用，主列表按条件查询数据库")
+        # 图标、行政区划与主列表在输入密码期间于后台读取，登录后直接显示
+        self.startup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gui-startup")
+        self.preload = self.startup_executor.submit(self.preload_main_data)
         self.root.geometry("800x480")
         self.root.configure(bg="#F0F0F0")
         self.center_window(self.root)
@@ -30,28 +517,44 @@ class HRManagementApp:
         self.edit_person_window = None
         self.export_data_window = None
         self.export_talent_window = None
-        self.detail_windows = {}  # 存储人员详情页窗口的字典
+        self.duplicates_window = None
+        self.stats_window = None
+        self.filter_window = None
+        self.maintenance_window = None
+        self.maintenance_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gui-maintenance")
+        # 定时维护默认由数据服务或 renshi maintain --due 执行；以 --maintenance 启动时界面也执行到期任务（不做基准快照）
+        self.maintenance_scheduler = None
+        if os.environ.get("RENSHI_MAINTENANCE") and not os.environ.get("RENSHI_SERVER"):
+            self.maintenance_scheduler = MaintenanceScheduler(tasks=CLIENT_TASKS).start()
+        self.tree_rows = []  # 主列表当前结果，按需分批插入 Treeview
+        self.tree_loaded = 0
+        self.advanced_filter = None  # 高级筛选条件组
+        self.sort_order = []  # [(字段, 'asc' | 'desc')]
+        self.include_archived = tk.BooleanVar(value=False)  # 主列表是否含已归档人员
+        self.detail_windows = OrderedDict()  # 人员详情窗口池：(人员ID, 是否来自人才库) -> DetailWindow，最近打开的在后
         self.talent_tree = None  # 人才库的 Treeview
         self.refresh_talent_list = None  # 刷新人才库列表的方法
         self.show_password_window()
 
-    def setup_database_and_icons(self):
-        # 初始化数据库并创建icons表
-        init_db()
-        with sqlite3.connect('hr_data.db') as conn:
-            c = conn.cursor()
-            c.execute('''CREATE TABLE IF NOT EXISTS icons (
-                name TEXT PRIMARY KEY,
-                data BLOB
-            )''')
-            conn.commit()
+    def report_callback_exception(self, exc_type, exc_value, exc_traceback):
+        # 其他进程长时间占用数据库时提示用户稍后重试，而不是只在控制台打印异常
+        if isinstance(exc_value, DatabaseBusyError):
+            messagebox.showwarning("数据库繁忙", str(exc_value))
+            return
+        logging.error("界面回调异常", exc_info=(exc_type, exc_value, exc_traceback))
+        messagebox.showerror("错误", f"操作失败：{exc_value}")
 
+    def setup_icons(self):
         # 加载图标到数据库（仅在表为空时执行）
         icon_folder = r"C:\Users\HUAWEI\Desktop\222\333\icons"
         icon_files = [
             "import.png", "export.png", "add.png", "backup.png", "talent.png","password.png"
         ]
-        with sqlite3.connect('hr_data.db') as conn:
+        with connect() as conn:
+            # 已有图标时只读检查，启动时不占用写锁
+            if conn.execute("SELECT 1 FROM icons LIMIT 1").fetchone():
+                return
+        with write_connection() as conn:
             c = conn.cursor()
             c.execute("SELECT COUNT(*) FROM icons")
             if c.fetchone()[0] == 0:  # 如果表为空，加载图标
@@ -69,7 +572,7 @@ class HRManagementApp:
 
     def load_icon_from_db(self, icon_name):
         """从数据库加载图标并返回PhotoImage对象"""
-        with sqlite3.connect('hr_data.db') as conn:
+        with connect() as conn:
             c = conn.cursor()
             c.execute("SELECT data FROM icons WHERE name=?", (icon_name,))
             result = c.fetchone()
@@ -109,7 +612,7 @@ class HRManagementApp:
         btn.bind("<Leave>", lambda e: btn.config(bg="#2196F3"))
 
     def verify_password(self):
-        with sqlite3.connect('hr_data.db') as conn:
+        with connect() as conn:
             c = conn.cursor()
             c.execute("SELECT password_enabled FROM users WHERE id=1")
             result = c.fetchone()
@@ -123,7 +626,7 @@ class HRManagementApp:
         password = self.password_entry.get()
         if check_password(password):
             self.password_window.destroy()
-            with sqlite3.connect('hr_data.db') as conn:
+            with connect() as conn:
                 c = conn.cursor()
                 c.execute("SELECT password_hash FROM users WHERE id=1")
                 result = c.fetchone()
@@ -145,7 +648,7 @@ class HRManagementApp:
         change_window.transient(self.root)
         change_window.grab_set()
 
-        with sqlite3.connect('hr_data.db') as conn:
+        with connect() as conn:
             c = conn.cursor()
             c.execute("SELECT password_enabled FROM users WHERE id=1")
             result = c.fetchone()
@@ -194,7 +697,7 @@ class HRManagementApp:
 
         def disable_password():
             if messagebox.askyesno("确认", "是否关闭密码保护？（下次登录将无需密码）"):
-                with sqlite3.connect('hr_data.db') as conn:
+                with write_connection() as conn:
                     c = conn.cursor()
                     c.execute("UPDATE users SET password_enabled = 0, password_hash = NULL WHERE id=1")
                     conn.commit()
@@ -213,7 +716,7 @@ class HRManagementApp:
                 return
             if new_password == confirm_password:
                 save_password(new_password)
-                with sqlite3.connect('hr_data.db') as conn:
+                with write_connection() as conn:
                     c = conn.cursor()
                     c.execute("UPDATE users SET password_enabled = 1 WHERE id=1")
                     conn.commit()
@@ -243,7 +746,33 @@ class HRManagementApp:
             enable_btn.bind("<Enter>", lambda e: enable_btn.config(bg="#1976D2"))
             enable_btn.bind("<Leave>", lambda e: enable_btn.config(bg="#2196F3"))
 
+    def preload_main_data(self):
+        # 在后台线程执行，不触碰任何控件
+        started = time.time()
+        self.setup_icons()
+        admin_data = load_admin_data()
+        if SNAPSHOT_MODE and snapshot.available():
+            self.snapshot = snapshot.RosterSnapshot().load()
+            rows = self.snapshot.query(None, [])
+        else:
+            rows = query_personnel(None, [])
+        logging.info(f"主窗口数据预加载完成，记录数：{len(rows)}，耗时：{time.time() - started:.2f}秒")
+        return admin_data, rows, time.time()
+
+    def take_preloaded(self):
+        """登录后取出预加载结果（尚未完成时等待）；失败或已过时返回 None，由 refresh_data 重新读取"""
+        try:
+            admin_data, rows, loaded_at = self.preload.result()
+        except Exception as e:
+            logging.warning(f"主窗口数据预加载失败，登录后重新读取：{str(e)}")
+            return None
+        self.admin_data = admin_data
+        if time.time() - loaded_at > PRELOAD_MAX_AGE:
+            return None
+        return rows
+
     def create_widgets(self):
+        rows = self.take_preloaded()
         toolbar = tk.Frame(self.root, bg="#2196F3")
         toolbar.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
         buttons = [
@@ -252,6 +781,9 @@ class HRManagementApp:
             ("新增人员", self.add_person, "add.png"),
             ("备份数据", self.backup_data, "backup.png"),
             ("人才库", self.show_talent_pool, "talent.png"),
+            ("查重合并", self.show_duplicates_window, "duplicates.png"),
+            ("人数统计", self.show_stats_dashboard, "stats.png"),
+            ("数据库维护", self.show_maintenance_window, "maintenance.png"),
         ]
         for text, command, icon in buttons:
             photo = self.load_icon_from_db(icon)
@@ -284,10 +816,17 @@ class HRManagementApp:
         tk.Label(query_frame, text="姓名/手机号：", font=("Roboto", 10, "bold"), bg="#FFFFFF").pack(side=tk.LEFT, padx=10)
         self.search_entry = tk.Entry(query_frame, width=15, font=("Roboto", 10), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
         self.search_entry.pack(side=tk.LEFT, padx=10)
+        self.person_search = LiveSearch(self.root, self.person_search_request, self.show_person_rows)
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
         query_btn = tk.Button(query_frame, text="查询", command=self.query_by_division, font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
         query_btn.pack(side=tk.LEFT, padx=10)
         query_btn.bind("<Enter>", lambda e: query_btn.config(bg="#1976D2"))
         query_btn.bind("<Leave>", lambda e: query_btn.config(bg="#2196F3"))
+        self.filter_btn = tk.Button(query_frame, text="高级筛选", command=self.show_advanced_filter_window, font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        self.filter_btn.pack(side=tk.LEFT, padx=5)
+        self.filter_btn.bind("<Enter>", lambda e: self.filter_btn.config(bg="#1976D2"))
+        self.filter_btn.bind("<Leave>", lambda e: self.filter_btn.config(bg="#2196F3"))
+        tk.Checkbutton(query_frame, text="含已归档", variable=self.include_archived, command=self.query_by_division, font=("Roboto", 10), bg="#FFFFFF").pack(side=tk.LEFT, padx=5)
 
         tree_frame = tk.Frame(self.root, bg="#FFFFFF")
         tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -295,76 +834,234 @@ class HRManagementApp:
         style.configure("Treeview", rowheight=25, font=("Roboto", 10))
         style.configure("Treeview.Heading", font=("Roboto", 10, "bold"), background="#E3F2FD")
         style.map("Treeview", background=[('selected', '#BBDEFB')], foreground=[('selected', 'black')])
-        self.tree = ttk.Treeview(tree_frame, columns=("ID", "姓名", "性别", "年龄", "手机号", "省份", "城市", "分会职务", "在职状态"), show="headings", height=10)
-        self.tree.heading("ID", text="ID")
-        self.tree.heading("姓名", text="姓名")
-        self.tree.heading("性别", text="性别")
-        self.tree.heading("年龄", text="年龄")
-        self.tree.heading("手机号", text="手机号")
-        self.tree.heading("省份", text="省份")
-        self.tree.heading("城市", text="城市")
-        self.tree.heading("分会职务", text="分会职务")
-        self.tree.heading("在职状态", text="在职状态")
+        self.tree = ttk.Treeview(tree_frame, columns=("ID", "姓名", "性别", "年龄", "手机号", "省份", "城市", "分会职务", "在职状态"), show="headings", height=10, selectmode="extended")
+        for col in TREE_COLUMN_FIELDS:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by_column(c))
         column_widths = {"ID": 50, "姓名": 120, "性别": 60, "年龄": 60, "手机号": 120, "省份": 100, "城市": 100, "分会职务": 120, "在职状态": 100}
         for col, width in column_widths.items():
             self.tree.column(col, width=width, anchor="center")
         scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.configure(yscrollcommand=lambda first, last: self.on_tree_scroll(scrollbar, first, last))
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.tree.tag_configure("red", foreground="#D32F2F")
         self.tree.tag_configure("blue", foreground="#1976D2")
+        self.tree.tag_configure("archived", foreground="#9E9E9E")
         self.tree.tag_configure("oddrow", background="#F5F5F5")
         self.tree.tag_configure("evenrow", background="#FFFFFF")
         self.tree.bind("<Double-1>", self.show_person_details)
+        self.tree.bind("<<TreeviewSelect>>", lambda e: self.prefetch_neighbours(self.tree))
         self.tree.bind("<Button-3>", self.show_popup_menu)
+        self.tree.bind("<Control-a>", lambda e: self.select_all_persons())
 
         self.popup_menu = tk.Menu(self.root, tearoff=0, font=("Roboto", 10))
-        self.popup_menu.add_command(label="删除该人员", command=self.delete_person_from_main)
-
-        self.refresh_data()
+        self.popup_menu.add_command(label="删除选中人员", command=self.delete_person_from_main)
+        self.popup_menu.add_command(label="加入人才库", command=self.bulk_add_to_talent_pool)
+        self.popup_menu.add_command(label="修改在职状态", command=lambda: self.show_bulk_update_window("status"))
+        self.popup_menu.add_command(label="修改分会职务", command=lambda: self.show_bulk_update_window("position"))
+        self.popup_menu.add_separator()
+        self.popup_menu.add_command(label="归档选中人员", command=self.archive_selected_persons)
+        self.popup_menu.add_command(label="恢复归档人员", command=self.restore_selected_persons)
+
+        if rows is None:
+            self.refresh_data()
+        else:
+            if self.snapshot is None:
+                scope, search, _ = self.person_search_request()
+                self.person_search.remember(scope, search, rows)
+            self.show_person_rows(rows)
+            logging.info(f"主窗口显示预加载数据，记录数：{len(rows)}")
 
     def show_popup_menu(self, event):
         item = self.tree.identify_row(event.y)
         if item:
-            self.tree.selection_set(item)
+            # 右键点击已选中的行时保留多选，否则只选中当前行
+            if item not in self.tree.selection():
+                self.tree.selection_set(item)
             self.popup_menu.post(event.x_root, event.y_root)
 
+    def selected_person_ids(self):
+        return [self.tree.item(item, "tags")[-1] for item in self.tree.selection()]
+
+    def prefetch_neighbours(self, tree, radius=5):
+        # 后台预取选中行上下相邻人员的详情，打开详情页时直接命中缓存
+        selected = tree.selection()
+        if len(selected) != 1:
+            return
+        items = tree.get_children()
+        idx = tree.index(selected[0])
+        neighbours = items[max(0, idx - radius):idx + radius + 1]
+        prefetch_persons([tree.item(item, "tags")[-1] for item in neighbours])
+
     def delete_person_from_main(self):
-        selected = self.tree.selection()
-        if not selected:
+        person_ids = self.selected_person_ids()
+        if not person_ids:
             messagebox.showwarning("提示", "请先选择要删除的人员！")
             return
-        item = self.tree.item(selected[0])
-        person_id = item["tags"][-1]
-        if messagebox.askyesno("确认", "是否彻底删除该人员？"):
-            message, error = delete_person(person_id)
+        prompt = "是否彻底删除该人员？" if len(person_ids) == 1 else f"是否彻底删除选中的 {len(person_ids)} 名人员？"
+        if messagebox.askyesno("确认", prompt):
+            message, error = bulk_delete_persons(person_ids)
             if error:
                 messagebox.showerror("错误", error)
             else:
                 self.refresh_data()
+                if self.talent_window and self.talent_window.winfo_exists():
+                    self.refresh_talent_list()
                 messagebox.showinfo("提示", message)
 
+    def archive_selected_persons(self):
+        person_ids = self.selected_person_ids()
+        if not person_ids:
+            messagebox.showwarning("提示", "请先选择要归档的人员！")
+            return
+        if messagebox.askyesno("确认", f"是否将选中的 {len(person_ids)} 名人员移入归档？归档后默认不在列表和导出中显示，可随时恢复。"):
+            message, error = archive_persons(person_ids)
+            if error:
+                messagebox.showerror("错误", error)
+                return
+            self.refresh_data()
+            if self.talent_window and self.talent_window.winfo_exists():
+                self.refresh_talent_list()
+            messagebox.showinfo("提示", message)
+
+    def restore_selected_persons(self):
+        person_ids = self.selected_person_ids()
+        if not person_ids:
+            messagebox.showwarning("提示", "请先选择要恢复的人员！")
+            return
+        message, error = restore_persons(person_ids)
+        if error:
+            messagebox.showerror("错误", error)
+            return
+        self.refresh_data()
+        if self.talent_window and self.talent_window.winfo_exists():
+            self.refresh_talent_list()
+        messagebox.showinfo("提示", message)
+
+    def restore_person(self, person_id, detail_window=None):
+        message, error = restore_persons([person_id])
+        if error:
+            messagebox.showerror("错误", error)
+            return
+        if detail_window:
+            self.close_detail_window(detail_window)
+        self.refresh_data()
+        if self.talent_window and self.talent_window.winfo_exists():
+            self.refresh_talent_list()
+        messagebox.showinfo("提示", message)
+
+    def bulk_add_to_talent_pool(self):
+        person_ids = self.selected_person_ids()
+        if not person_ids:
+            messagebox.showwarning("提示", "请先选择要加入人才库的人员！")
+            return
+        reason_window = tk.Toplevel(self.root)
+        reason_window.title("加入理由")
+        reason_window.geometry("400x300")
+        reason_window.configure(bg="#F0F0F0")
+        self.center_window(reason_window)
+        reason_window.transient(self.root)
+        reason_window.grab_set()
+
+        tk.Label(reason_window, text=f"请输入 {len(person_ids)} 名人员的加入理由：", font=("Roboto", 10), bg="#F0F0F0").pack(pady=5)
+        reason_text = scrolledtext.ScrolledText(reason_window, height=10, width=40, wrap=tk.WORD, font=("Roboto", 10), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
+        reason_text.pack(pady=5)
+
+        def confirm():
+            message, error = bulk_add_to_talent_pool(person_ids, reason_text.get("1.0", tk.END).strip())
+            if error:
+                messagebox.showerror("错误", error)
+                return
+            if self.talent_window and self.talent_window.winfo_exists():
+                self.refresh_talent_list()
+            reason_window.destroy()
+            messagebox.showinfo("提示", message)
+
+        button_frame = tk.Frame(reason_window, bg="#F0F0F0")
+        button_frame.pack(pady=10)
+        confirm_btn = tk.Button(button_frame, text="确认加入", command=confirm, font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        confirm_btn.pack(side=tk.LEFT, padx=5)
+        confirm_btn.bind("<Enter>", lambda e: confirm_btn.config(bg="#1976D2"))
+        confirm_btn.bind("<Leave>", lambda e: confirm_btn.config(bg="#2196F3"))
+        cancel_btn = tk.Button(button_frame, text="取消", command=reason_window.destroy, font=("Roboto", 10), bg="#FF9800", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        cancel_btn.pack(side=tk.LEFT, padx=5)
+        cancel_btn.bind("<Enter>", lambda e: cancel_btn.config(bg="#F57C00"))
+        cancel_btn.bind("<Leave>", lambda e: cancel_btn.config(bg="#FF9800"))
+
+    def show_bulk_update_window(self, field):
+        person_ids = self.selected_person_ids()
+        if not person_ids:
+            messagebox.showwarning("提示", "请先选择要修改的人员！")
+            return
+        label = "在职状态" if field == "status" else "分会职务"
+        update_window = tk.Toplevel(self.root)
+        update_window.title(f"批量修改{label}")
+        update_window.geometry("300x150")
+        update_window.configure(bg="#F0F0F0")
+        self.center_window(update_window)
+        update_window.transient(self.root)
+        update_window.grab_set()
+
+        tk.Label(update_window, text=f"将选中的 {len(person_ids)} 名人员的{label}修改为：", font=("Roboto", 10), bg="#F0F0F0").pack(pady=10)
+        if field == "status":
+            value_entry = ttk.Combobox(update_window, values=["在职", "离职", "无职务"], width=15, font=("Roboto", 10))
+            value_entry.set("在职")
+        else:
+            value_entry = tk.Entry(update_window, width=20, font=("Roboto", 10), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
+        value_entry.pack(pady=5)
+
+        def confirm():
+            value = value_entry.get().strip()
+            if field == "status":
+                if not value:
+                    messagebox.showerror("错误", "请选择在职状态！")
+                    return
+                message, error = bulk_update_persons(person_ids, status=value)
+            else:
+                message, error = bulk_update_persons(person_ids, position=value)
+            if error:
+                messagebox.showerror("错误", error)
+                return
+            update_window.destroy()
+            self.refresh_data()
+            messagebox.showinfo("提示", message)
+
+        confirm_btn = tk.Button(update_window, text="确认修改", command=confirm, font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        confirm_btn.pack(pady=10)
+        confirm_btn.bind("<Enter>", lambda e: confirm_btn.config(bg="#1976D2"))
+        confirm_btn.bind("<Leave>", lambda e: confirm_btn.config(bg="#2196F3"))
+
     def refresh_data(self):
         start_time = time.time()
         self.admin_data = load_admin_data()
         self.province_combo['values'] = ["全部"] + list(self.admin_data.keys())
         self.city_combo['values'] = ["全部"]
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        with sqlite3.connect('hr_data.db') as conn:
-            c = conn.cursor()
-            c.execute("SELECT id, real_name, gender, age, phone, province, city, position, status FROM personnel")
-            rows = c.fetchall()
-        for idx, row in enumerate(rows, 1):
-            position = row[7] if row[7] else "无职务"
-            tag = "red" if row[8] == "离职" else "blue" if row[8] == "无职务" else ""
-            row_tag = "oddrow" if idx % 2 else "evenrow"
-            logging.info(f"人员 {row[1]}: status={row[8]}, tag={tag}")
-            self.tree.insert("", "end", values=(row[0], row[1], row[2], row[3], row[4], row[5], row[6], position, row[8]), tags=(tag, row_tag, row[0]))
+        self.person_search.invalidate()
+        rows = self.load_person_tree()
         elapsed_time = time.time() - start_time
         logging.info(f"主窗口数据刷新完成，记录数：{len(rows)}，耗时：{elapsed_time:.2f}秒")
 
+    def fill_person_tree(self, chunk=300):
+        # 分批插入：先显示首批结果，滚动接近底部时再追加，大结果集也能即时刷新
+        start = self.tree_loaded
+        rows = self.tree_rows[start:start + chunk]
+        self.tree_loaded += len(rows)
+        for idx, person in enumerate(rows, start + 1):
+            position = person.position if person.position else "无职务"
+            tag = "archived" if person.archived else "red" if person.status == "离职" else "blue" if person.status == "无职务" else ""
+            row_tag = "oddrow" if idx % 2 else "evenrow"
+            self.tree.insert("", "end", values=(person.id, person.real_name, person.gender, person.age, person.phone, person.province, person.city, position, person.status), tags=(tag, row_tag, person.id))
+
+    def on_tree_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        if float(last) >= 0.95 and self.tree_loaded < len(self.tree_rows):
+            self.fill_person_tree()
+
+    def select_all_persons(self):
+        if self.tree_loaded < len(self.tree_rows):
+            self.fill_person_tree(len(self.tree_rows))
+        self.tree.selection_set(self.tree.get_children())
+
     def update_city_combo(self, event=None):
         province = self.province_combo.get()
         if province == "全部":
@@ -396,7 +1093,7 @@ class HRManagementApp:
             return
         self.export_data_window = tk.Toplevel(self.root)
         self.export_data_window.title("导出数据")
-        self.export_data_window.geometry("400x300")
+        self.export_data_window.geometry("400x420")
         self.export_data_window.configure(bg="#F0F0F0")
         self.center_window(self.export_data_window)
         self.export_data_window.protocol("WM_DELETE_WINDOW", lambda: self.close_export_data_window())
@@ -405,6 +1102,8 @@ class HRManagementApp:
         export_type = tk.StringVar(value="all")
         tk.Radiobutton(self.export_data_window, text="全部数据", variable=export_type, value="all", font=("Roboto", 10), bg="#F0F0F0").pack(anchor="center", padx=20)
         tk.Radiobutton(self.export_data_window, text="按分会导出", variable=export_type, value="division", font=("Roboto", 10), bg="#F0F0F0").pack(anchor="center", padx=20)
+        tk.Radiobutton(self.export_data_window, text="增量导出（上次导出后的变更）", variable=export_type, value="delta", font=("Roboto", 10), bg="#F0F0F0").pack(anchor="center", padx=20)
+        tk.Radiobutton(self.export_data_window, text="当前筛选结果（与主列表一致）", variable=export_type, value="filtered", font=("Roboto", 10), bg="#F0F0F0").pack(anchor="center", padx=20)
 
         division_frame = tk.Frame(self.export_data_window, bg="#F0F0F0")
         tk.Label(division_frame, text="省份:", font=("Roboto", 10), bg="#F0F0F0").pack(side=tk.LEFT, padx=5)
@@ -425,19 +1124,42 @@ class HRManagementApp:
                 city_combo['values'] = ["全部"] + self.admin_data[province]
             city_combo.set("全部")
 
-        province_combo.bind("<<ComboboxSelected>>", update_city_combo)
+        delta_frame = tk.Frame(self.export_data_window, bg="#F0F0F0")
+        tk.Label(delta_frame, text="起始时间:", font=("Roboto", 10), bg="#F0F0F0").pack(side=tk.LEFT, padx=5)
+        since_entry = tk.Entry(delta_frame, width=24, font=("Roboto", 10), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
+        since_entry.pack(side=tk.LEFT, padx=5)
+
+        def update_since(event=None):
+            since_entry.delete(0, tk.END)
+            since_entry.insert(0, get_export_watermark(province_combo.get(), city_combo.get()) or "")
+
+        province_combo.bind("<<ComboboxSelected>>", lambda e: (update_city_combo(), update_since()))
+        city_combo.bind("<<ComboboxSelected>>", update_since)
 
         def update_export_options():
-            if export_type.get() == "division":
+            if export_type.get() in ("division", "delta"):
                 division_frame.pack(pady=5)
             else:
                 division_frame.pack_forget()
+            if export_type.get() == "delta":
+                delta_frame.pack(pady=5)
+                update_since()
+            else:
+                delta_frame.pack_forget()
 
         export_type.trace("w", lambda *args: update_export_options())
         update_export_options()
+        # 增量导出按变更记录导出，不受此选项影响
+        include_archived = tk.BooleanVar(value=self.include_archived.get())
+        tk.Checkbutton(self.export_data_window, text="包含已归档人员", variable=include_archived, font=("Roboto", 10), bg="#F0F0F0").pack(side=tk.BOTTOM, pady=5)
 
         def do_export():
-            df, default_filename_or_error = export_data(export_type.get(), province_combo.get(), city_combo.get(), self.admin_data)
+            if export_type.get() == "delta":
+                self.do_export_delta(province_combo.get(), city_combo.get(), since_entry.get().strip() or None)
+                return
+            df, default_filename_or_error = export_data(export_type.get(), province_combo.get(), city_combo.get(), self.admin_data,
+                                                        criteria=self.current_filter(), order_by=self.sort_order,
+                                                        include_archived=include_archived.get())
             if df is None:
                 messagebox.showwarning("提示", default_filename_or_error)
                 return
@@ -450,51 +1172,11 @@ class HRManagementApp:
                         for province in provinces:
                             province_df = df[df['省份'] == province]
                             province_df.to_excel(writer, sheet_name=f"{province}省", index=False)
-                            ws = writer.sheets[f"{province}省"]
-                            thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-                            for cell in ws[1]:
-                                cell.alignment = Alignment(horizontal='center', vertical='center')
-                                cell.font = Font(name='SimSun', bold=True, size=10)
-                                cell.border = thin_border
-                            for col in ws.columns:
-                                col_letter = col[0].column_letter
-                                column_name = ws[f"{col_letter}1"].value or ''
-                                title_width = max(len(str(column_name)) * 1.2, 10)
-                                if column_name in ['家庭住址', '个人简历']:
-                                    title_width = max(title_width, 30)
-                                ws.column_dimensions[col_letter].width = title_width
-                            for row in ws.iter_rows(min_row=2):
-                                for cell in row:
-                                    cell.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-                                    cell.font = Font(name='SimSun', size=10)
-                                    cell.border = thin_border
-                            ws.row_dimensions[1].height = 20
-                            for row in range(2, ws.max_row + 1):
-                                ws.row_dimensions[row].height = 30
+                            self.format_export_sheet(writer.sheets[f"{province}省"])
                 else:
                     df.to_excel(file_path, index=False)
                     wb = openpyxl.load_workbook(file_path)
-                    ws = wb.active
-                    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-                    for cell in ws[1]:
-                        cell.alignment = Alignment(horizontal='center', vertical='center')
-                        cell.font = Font(name='SimSun', bold=True, size=10)
-                        cell.border = thin_border
-                    for col in ws.columns:
-                        col_letter = col[0].column_letter
-                        column_name = ws[f"{col_letter}1"].value or ''
-                        title_width = max(len(str(column_name)) * 1.2, 10)
-                        if column_name in ['家庭住址', '个人简历']:
-                            title_width = max(title_width, 30)
-                        ws.column_dimensions[col_letter].width = title_width
-                    for row in ws.iter_rows(min_row=2):
-                        for cell in row:
-                            cell.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-                            cell.font = Font(name='SimSun', size=10)
-                            cell.border = thin_border
-                    ws.row_dimensions[1].height = 20
-                    for row in range(2, ws.max_row + 1):
-                        ws.row_dimensions[row].height = 30
+                    self.format_export_sheet(wb.active)
                     wb.save(file_path)
                 messagebox.showinfo("成功", f"成功导出 {len(df)} 条数据！")
                 logging.info(f"导出数据完成：{len(df)} 条")
@@ -505,45 +1187,419 @@ class HRManagementApp:
         export_btn.bind("<Enter>", lambda e: export_btn.config(bg="#1976D2"))
         export_btn.bind("<Leave>", lambda e: export_btn.config(bg="#2196F3"))
 
+    def do_export_delta(self, province, city, since):
+        changed, deleted, watermark, default_filename_or_error = export_delta(province, city, since)
+        if changed is None:
+            messagebox.showwarning("提示", default_filename_or_error)
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")], initialfile=default_filename_or_error)
+        if file_path:
+            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+                changed.to_excel(writer, sheet_name="变更记录", index=False)
+                self.format_export_sheet(writer.sheets["变更记录"])
+                deleted.to_excel(writer, sheet_name="已删除", index=False)
+                self.format_export_sheet(writer.sheets["已删除"])
+            record_export_watermark(province, city, watermark, len(changed), len(deleted))
+            messagebox.showinfo("成功", f"增量导出完成：变更 {len(changed)} 条，删除 {len(deleted)} 条")
+            logging.info(f"增量导出完成：变更 {len(changed)} 条，删除 {len(deleted)} 条")
+        self.close_export_data_window()
+
+    def format_export_sheet(self, ws, wide_columns=('家庭住址', '个人简历')):
+        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+        for cell in ws[1]:
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+            cell.font = Font(name='SimSun', bold=True, size=10)
+            cell.border = thin_border
+        for col in ws.columns:
+            col_letter = col[0].column_letter
+            column_name = ws[f"{col_letter}1"].value or ''
+            title_width = max(len(str(column_name)) * 1.2, 10)
+            if column_name in wide_columns:
+                title_width = max(title_width, 30)
+            ws.column_dimensions[col_letter].width = title_width
+        for row in ws.iter_rows(min_row=2):
+            for cell in row:
+                cell.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
+                cell.font = Font(name='SimSun', size=10)
+                cell.border = thin_border
+        ws.row_dimensions[1].height = 20
+        for row in range(2, ws.max_row + 1):
+            ws.row_dimensions[row].height = 30
+
     def close_export_data_window(self):
         if self.export_data_window:
             self.export_data_window.destroy()
             self.export_data_window = None
 
     def query_by_division(self):
+        rows = self.load_person_tree()
+        logging.info(f"按条件查询完成，记录数：{len(rows)}")
+
+    def base_filter(self):
+        """查询栏省份、城市与高级筛选条件，不含姓名/手机号关键字"""
         province = self.province_combo.get().replace("省", "")
         city = self.city_combo.get().replace("市", "")
-        search = self.search_entry.get()
-        query = "SELECT id, real_name, gender, age, phone, province, city, position, status FROM personnel"
-        params = []
-        conditions = []
-        if province != "全部":
-            conditions.append("province LIKE ?")
-            params.append(f"%{province}%")
-        if city != "全部":
-            conditions.append("city LIKE ?")
-            params.append(f"%{city}%")
-        if search:
-            conditions.append("(real_name LIKE ? OR phone LIKE ?)")
-            params.extend([f"%{search}%", f"%{search}%"])
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-
-        with sqlite3.connect('hr_data.db') as conn:
-            c = conn.cursor()
-            c.execute(query, params)
-            rows = c.fetchall()
+        return all_of(
+            condition("province", "startswith", province) if province and province != "全部" else None,
+            condition("city", "startswith", city) if city and city != "全部" else None,
+            self.advanced_filter,
+        )
+
+    def current_filter(self, search=None):
+        """主列表当前的完整条件，导出“当前筛选结果”时使用同一条件"""
+        if search is None:
+            search = self.search_entry.get().strip()
+        return all_of(self.base_filter(), keyword_filter(search))
+
+    def person_search_request(self):
+        # 关键字之外的条件与排序相同时，结果可以在内存中按关键字收窄
+        search = self.search_entry.get().strip()
+        include_archived = self.include_archived.get()
+        scope = json.dumps([self.base_filter(), self.sort_order, include_archived], ensure_ascii=False, sort_keys=True)
+        criteria, order = self.current_filter(search), list(self.sort_order)
+        return scope, search, lambda: query_personnel(criteria, order, include_archived=include_archived)
+
+    def snapshot_query(self, search):
+        """列式快照能回答当前条件时在内存中筛选排序，否则返回 None，由调用方查询数据库"""
+        criteria, order = self.current_filter(search), list(self.sort_order)
+        if self.snapshot is None or self.include_archived.get() or not self.snapshot.supports(criteria, order):
+            self.snapshot_search = None
+            return None
+        self.snapshot_search = search
+        return self.snapshot.query(criteria, order)
+
+    def load_person_tree(self):
+        rows = self.snapshot_query(self.search_entry.get().strip())
+        if rows is None:
+            scope, search, loader = self.person_search_request()
+            rows = loader()
+            self.person_search.remember(scope, search, rows)
+        self.show_person_rows(rows)
+        return rows
+
+    def on_search_key(self, event=None):
+        # 快照模式下每次按键直接在内存中筛选，不经过防抖与查询线程
+        search = self.search_entry.get().strip()
+        if self.snapshot is not None and not self.include_archived.get() and search == self.snapshot_search:
+            # 方向键等不改变内容的按键
+            return
+        rows = self.snapshot_query(search)
+        if rows is None:
+            self.person_search.on_key(event)
+        else:
+            self.show_person_rows(rows)
+
+    def show_person_rows(self, rows):
+        self.tree.delete(*self.tree.get_children())
+        self.tree_rows = rows
+        self.tree_loaded = 0
+        self.fill_person_tree()
+
+    def sort_by_column(self, col):
+        field = TREE_COLUMN_FIELDS[col]
+        if self.sort_order and self.sort_order[0][0] == field:
+            direction = "desc" if self.sort_order[0][1] == "asc" else "asc"
+        else:
+            direction = "asc"
+        self.sort_order = [(field, direction)]
+        for name, column_field in TREE_COLUMN_FIELDS.items():
+            arrow = (" ▲" if direction == "asc" else " ▼") if column_field == field else ""
+            self.tree.heading(name, text=name + arrow)
+        self.load_person_tree()
+
+    def show_advanced_filter_window(self):
+        if self.filter_window and self.filter_window.winfo_exists():
+            self.filter_window.focus_set()
+            return
+        self.filter_window = tk.Toplevel(self.root)
+        self.filter_window.title("高级筛选")
+        self.filter_window.geometry("620x400")
+        self.filter_window.configure(bg="#F0F0F0")
+        self.center_window(self.filter_window)
+
+        field_names = {label: name for name, label in FILTER_LABELS.items() if name in FILTER_FIELDS}
+        op_names = {label: op for op, label in OPERATORS.items()}
+        mode = tk.StringVar(value="any" if self.advanced_filter and "any" in self.advanced_filter else "all")
+        mode_frame = tk.Frame(self.filter_window, bg="#F0F0F0")
+        mode_frame.pack(pady=5)
+        tk.Radiobutton(mode_frame, text="满足全部条件", variable=mode, value="all", font=("Roboto", 10), bg="#F0F0F0").pack(side=tk.LEFT, padx=10)
+        tk.Radiobutton(mode_frame, text="满足任一条件", variable=mode, value="any", font=("Roboto", 10), bg="#F0F0F0").pack(side=tk.LEFT, padx=10)
+        tk.Label(self.filter_window, text="“属于”多个值用逗号分隔，“介于”填写 最小值,最大值", font=("Roboto", 9), bg="#F0F0F0", fg="#757575").pack()
+
+        rows_frame = tk.Frame(self.filter_window, bg="#FFFFFF", bd=1, relief="solid")
+        rows_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        rows = []
+
+        def add_row(item=None):
+            frame = tk.Frame(rows_frame, bg="#FFFFFF")
+            frame.pack(fill=tk.X, padx=5, pady=3)
+            field_combo = ttk.Combobox(frame, values=list(field_names), width=12, font=("Roboto", 10), state="readonly")
+            field_combo.pack(side=tk.LEFT, padx=5)
+            op_combo = ttk.Combobox(frame, values=list(op_names), width=8, font=("Roboto", 10), state="readonly")
+            op_combo.pack(side=tk.LEFT, padx=5)
+            value_entry = tk.Entry(frame, width=25, font=("Roboto", 10), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
+            value_entry.pack(side=tk.LEFT, padx=5)
+            row = (frame, field_combo, op_combo, value_entry)
+            remove_btn = tk.Button(frame, text="删除", command=lambda: (rows.remove(row), frame.destroy()), font=("Roboto", 9), bg="#FF9800", fg="white", bd=0, relief="flat", padx=8, pady=2)
+            remove_btn.pack(side=tk.LEFT, padx=5)
+            remove_btn.bind("<Enter>", lambda e: remove_btn.config(bg="#F57C00"))
+            remove_btn.bind("<Leave>", lambda e: remove_btn.config(bg="#FF9800"))
+            field_combo.set(FILTER_LABELS[item["field"]] if item else FILTER_LABELS["status"])
+            op_combo.set(OPERATORS[item["op"]] if item else OPERATORS["eq"])
+            if item and item.get("value") is not None:
+                value = item["value"]
+                value_entry.insert(0, ",".join(map(str, value)) if isinstance(value, (list, tuple)) else str(value))
+            rows.append(row)
+
+        for item in (self.advanced_filter or {}).get(mode.get(), []):
+            add_row(item)
+        if not rows:
+            add_row()
+
+        def build_filter():
+            items = []
+            for _, field_combo, op_combo, value_entry in rows:
+                op = op_names[op_combo.get()]
+                text = value_entry.get().strip()
+                if op in ("in", "between"):
+                    value = [part.strip() for part in re.split(r"[,，]", text) if part.strip()]
+                    if op == "between" and len(value) != 2:
+                        raise ValueError(f"“{field_combo.get()}”介于条件需要填写两个值")
+                elif op in ("empty", "not_empty"):
+                    value = None
+                elif not text:
+                    continue
+                else:
+                    value = text
+                items.append(condition(field_names[field_combo.get()], op, value))
+            return {mode.get(): items} if items else None
 
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        def apply_filter():
+            previous = self.advanced_filter
+            try:
+                self.advanced_filter = build_filter()
+                rows_found = self.load_person_tree()
+            except ValueError as e:
+                self.advanced_filter = previous
+                messagebox.showerror("错误", str(e), parent=self.filter_window)
+                return
+            count = len(next(iter(self.advanced_filter.values()))) if self.advanced_filter else 0
+            self.filter_btn.config(text=f"高级筛选({count})" if count else "高级筛选")
+            logging.info(f"高级筛选完成，条件数：{count}，记录数：{len(rows_found)}")
+            self.filter_window.destroy()
+
+        def clear_filter():
+            self.advanced_filter = None
+            self.filter_btn.config(text="高级筛选")
+            self.load_person_tree()
+            self.filter_window.destroy()
+
+        button_frame = tk.Frame(self.filter_window, bg="#F0F0F0")
+        button_frame.pack(pady=10)
+        for text, command, color, hover in (("添加条件", add_row, "#2196F3", "#1976D2"),
+                                             ("应用筛选", apply_filter, "#2196F3", "#1976D2"),
+                                             ("清除筛选", clear_filter, "#FF9800", "#F57C00")):
+            btn = tk.Button(button_frame, text=text, command=command, font=("Roboto", 10), bg=color, fg="white", bd=0, relief="flat", padx=10, pady=5)
+            btn.pack(side=tk.LEFT, padx=5)
+            btn.bind("<Enter>", lambda e, b=btn, c=hover: b.config(bg=c))
+            btn.bind("<Leave>", lambda e, b=btn, c=color: b.config(bg=c))
 
-        for idx, row in enumerate(rows, 1):
-            position = row[7] if row[7] else "无职务"
-            tag = "red" if row[8] == "离职" else "blue" if row[8] == "无职务" else ""
-            row_tag = "oddrow" if idx % 2 else "evenrow"
-            logging.info(f"查询人员 {row[1]}: status={row[8]}, tag={tag}")
-            self.tree.insert("", "end", values=(row[0], row[1], row[2], row[3], row[4], row[5], row[6], position, row[8]), tags=(tag, row_tag, row[0]))
-        logging.info(f"按分会查询完成，记录数：{len(rows)}")
+    def show_duplicates_window(self):
+        if self.duplicates_window and self.duplicates_window.winfo_exists():
+            self.duplicates_window.focus_set()
+            return
+        self.duplicates_window = tk.Toplevel(self.root)
+        self.duplicates_window.title("查重合并")
+        self.duplicates_window.geometry("900x500")
+        self.duplicates_window.configure(bg="#F0F0F0")
+        self.center_window(self.duplicates_window)
+
+        tk.Label(self.duplicates_window, text="选中某组中要保留的人员，点击“合并到所选人员”将同组其他记录并入该人员", font=("Roboto", 10), bg="#F0F0F0").pack(pady=5)
+        tree_frame = tk.Frame(self.duplicates_window, bg="#FFFFFF")
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        columns = ("ID", "姓名", "身份证号", "手机号", "省份", "城市", "分会职务", "在职状态")
+        dup_tree = ttk.Treeview(tree_frame, columns=columns, show="tree headings", selectmode="browse")
+        dup_tree.heading("#0", text="重复组")
+        dup_tree.column("#0", width=180)
+        column_widths = {"ID": 50, "姓名": 100, "身份证号": 160, "手机号": 110, "省份": 80, "城市": 80, "分会职务": 100, "在职状态": 80}
+        for col, width in column_widths.items():
+            dup_tree.heading(col, text=col)
+            dup_tree.column(col, width=width, anchor="center")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=dup_tree.yview)
+        dup_tree.configure(yscrollcommand=scrollbar.set)
+        dup_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        status_label = tk.Label(self.duplicates_window, text="", font=("Roboto", 10), bg="#F0F0F0")
+        status_label.pack()
+
+        def load_groups():
+            for item in dup_tree.get_children():
+                dup_tree.delete(item)
+            start_time = time.time()
+            groups = find_duplicates()
+            for idx, group in enumerate(groups, 1):
+                parent = dup_tree.insert("", "end", text=f"第{idx}组：{'、'.join(group['reasons'])}", open=True, values=("",) * len(columns))
+                for person in group['persons']:
+                    dup_tree.insert(parent, "end", text="", values=(person.id, person.real_name, person.id_number, person.phone, person.province, person.city, person.position or "无职务", person.status), tags=(person.id,))
+            status_label.config(text=f"共找到 {len(groups)} 组疑似重复，耗时 {time.time() - start_time:.2f} 秒")
+
+        def merge_selected():
+            selected = dup_tree.selection()
+            parent = dup_tree.parent(selected[0]) if selected else ""
+            if not parent:
+                messagebox.showwarning("提示", "请先在重复组中选择要保留的人员！", parent=self.duplicates_window)
+                return
+            keep_id = dup_tree.item(selected[0], "tags")[-1]
+            merge_ids = [dup_tree.item(item, "tags")[-1] for item in dup_tree.get_children(parent) if item != selected[0]]
+            if not messagebox.askyesno("确认", f"是否将同组其他 {len(merge_ids)} 条记录合并到该人员？合并后其他记录将被删除。", parent=self.duplicates_window):
+                return
+            message, error = merge_persons(keep_id, merge_ids)
+            if error:
+                messagebox.showerror("错误", error, parent=self.duplicates_window)
+                return
+            dup_tree.delete(parent)
+            self.refresh_data()
+            if self.talent_window and self.talent_window.winfo_exists():
+                self.refresh_talent_list()
+            messagebox.showinfo("提示", message, parent=self.duplicates_window)
+
+        button_frame = tk.Frame(self.duplicates_window, bg="#F0F0F0")
+        button_frame.pack(pady=10)
+        merge_btn = tk.Button(button_frame, text="合并到所选人员", command=merge_selected, font=("Roboto", 10), bg="#FF9800", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        merge_btn.pack(side=tk.LEFT, padx=5)
+        merge_btn.bind("<Enter>", lambda e: merge_btn.config(bg="#F57C00"))
+        merge_btn.bind("<Leave>", lambda e: merge_btn.config(bg="#FF9800"))
+        rescan_btn = tk.Button(button_frame, text="重新查重", command=load_groups, font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        rescan_btn.pack(side=tk.LEFT, padx=5)
+        rescan_btn.bind("<Enter>", lambda e: rescan_btn.config(bg="#1976D2"))
+        rescan_btn.bind("<Leave>", lambda e: rescan_btn.config(bg="#2196F3"))
+
+        load_groups()
+
+    def show_stats_dashboard(self):
+        if self.stats_window and self.stats_window.winfo_exists():
+            self.stats_window.focus_set()
+            return
+        self.stats_window = tk.Toplevel(self.root)
+        self.stats_window.title("人数统计")
+        self.stats_window.geometry("600x480")
+        self.stats_window.configure(bg="#F0F0F0")
+        self.center_window(self.stats_window)
+
+        total_label = tk.Label(self.stats_window, text="", font=("Roboto", 11, "bold"), bg="#F0F0F0")
+        total_label.pack(pady=10)
+        notebook = ttk.Notebook(self.stats_window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        trees = {}
+        for dimension, label in REPORT_DIMENSIONS.items():
+            frame = tk.Frame(notebook, bg="#FFFFFF")
+            notebook.add(frame, text=label)
+            tree = ttk.Treeview(frame, columns=(label, "人数", "占比", "人才库人数"), show="headings")
+            for col, width in ((label, 200), ("人数", 100), ("占比", 100), ("人才库人数", 100)):
+                tree.heading(col, text=col)
+                tree.column(col, width=width, anchor="center")
+            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            tree.tag_configure("oddrow", background="#F5F5F5")
+            tree.tag_configure("evenrow", background="#FFFFFF")
+            trees[dimension] = tree
+
+        def load_stats():
+            # 统计数据直接读取触发器维护的汇总表，年龄段按出生日期索引范围计数，不扫描人员表
+            overview = get_headcount_overview()
+            total, talent_total = overview['total']
+            total_label.config(text=f"总人数：{total}    人才库：{talent_total}")
+            for dimension, tree in trees.items():
+                for item in tree.get_children():
+                    tree.delete(item)
+                for idx, (key, count, talent_count) in enumerate(overview[dimension], 1):
+                    share = f"{count / total:.1%}" if total else "-"
+                    tree.insert("", "end", values=(key, count, share, talent_count), tags=("oddrow" if idx % 2 else "evenrow",))
+
+        refresh_btn = tk.Button(self.stats_window, text="刷新", command=load_stats, font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        refresh_btn.pack(pady=10)
+        refresh_btn.bind("<Enter>", lambda e: refresh_btn.config(bg="#1976D2"))
+        refresh_btn.bind("<Leave>", lambda e: refresh_btn.config(bg="#2196F3"))
+        load_stats()
+
+    def show_maintenance_window(self):
+        if self.maintenance_window and self.maintenance_window.winfo_exists():
+            self.maintenance_window.focus_set()
+            return
+        self.maintenance_window = tk.Toplevel(self.root)
+        self.maintenance_window.title("数据库维护")
+        self.maintenance_window.geometry("760x520")
+        self.maintenance_window.configure(bg="#F0F0F0")
+        self.center_window(self.maintenance_window)
+
+        report_text = scrolledtext.ScrolledText(self.maintenance_window, wrap=tk.NONE, font=("Consolas", 9), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
+        report_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        status_label = tk.Label(self.maintenance_window, text="", font=("Roboto", 10), bg="#F0F0F0")
+        status_label.pack()
+        button_frame = tk.Frame(self.maintenance_window, bg="#F0F0F0")
+        button_frame.pack(pady=10)
+        buttons = []
+
+        def run_in_background(func, done, status):
+            # 整理与完整性检查可能耗时较长，在后台线程执行，界面保持响应
+            for btn in buttons:
+                btn.config(state="disabled")
+            status_label.config(text=status)
+            future = self.maintenance_executor.submit(func)
+
+            def poll():
+                if not self.maintenance_window.winfo_exists():
+                    return
+                if not future.done():
+                    self.maintenance_window.after(200, poll)
+                    return
+                for btn in buttons:
+                    btn.config(state="normal")
+                status_label.config(text="")
+                try:
+                    done(future.result())
+                except DatabaseBusyError as e:
+                    messagebox.showwarning("数据库繁忙", str(e), parent=self.maintenance_window)
+                except Exception as e:
+                    logging.error(f"数据库维护失败：{str(e)}")
+                    messagebox.showerror("错误", f"操作失败：{e}", parent=self.maintenance_window)
+            poll()
+
+        def show_report(report):
+            report_text.config(state="normal")
+            report_text.delete("1.0", tk.END)
+            report_text.insert(tk.END, format_report(report))
+            report_text.config(state="disabled")
+
+        def load_report():
+            run_in_background(health_report, show_report, "正在生成健康报告……")
+
+        def maintenance_done(results):
+            summary = "\n".join(f"{r['label']}：{'成功' if r['ok'] else '失败'}，{r['result']}" for r in results)
+            if all(r['ok'] for r in results):
+                messagebox.showinfo("维护完成", summary, parent=self.maintenance_window)
+            else:
+                messagebox.showwarning("维护完成", summary, parent=self.maintenance_window)
+            load_report()
+
+        def run_now(full_vacuum=False):
+            if full_vacuum and not messagebox.askyesno("确认", "完整整理会重写整个数据库文件，期间其他用户无法使用，是否继续？", parent=self.maintenance_window):
+                return
+            run_in_background(lambda: run_maintenance(list(TASKS), full_vacuum), maintenance_done, "正在维护数据库……")
+
+        for text, command, color, hover in (
+            ("刷新报告", load_report, "#2196F3", "#1976D2"),
+            ("立即维护", run_now, "#2196F3", "#1976D2"),
+            ("完整整理", lambda: run_now(full_vacuum=True), "#FF9800", "#F57C00"),
+        ):
+            btn = tk.Button(button_frame, text=text, command=command, font=("Roboto", 10), bg=color, fg="white", bd=0, relief="flat", padx=10, pady=5)
+            btn.pack(side=tk.LEFT, padx=10)
+            btn.bind("<Enter>", lambda e, b=btn, c=hover: b.config(bg=c))
+            btn.bind("<Leave>", lambda e, b=btn, c=color: b.config(bg=c))
+            buttons.append(btn)
+        load_report()
 
     def show_talent_pool(self):
         if self.talent_window and self.talent_window.winfo_exists():
@@ -561,7 +1617,7 @@ class HRManagementApp:
         tk.Label(query_frame, text="姓名/手机号：", font=("Roboto", 10, "bold"), bg="#FFFFFF").pack(side=tk.LEFT, padx=10)
         search_entry = tk.Entry(query_frame, width=20, font=("Roboto", 10), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
         search_entry.pack(side=tk.LEFT, padx=10)
-        query_btn = tk.Button(query_frame, text="查询", command=lambda: self.refresh_talent_list(search_entry.get()), font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
+        query_btn = tk.Button(query_frame, text="查询", command=lambda: self.refresh_talent_list(search_entry.get().strip()), font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
         query_btn.pack(side=tk.LEFT, padx=10)
         query_btn.bind("<Enter>", lambda e: query_btn.config(bg="#1976D2"))
         query_btn.bind("<Leave>", lambda e: query_btn.config(bg="#2196F3"))
@@ -574,7 +1630,7 @@ class HRManagementApp:
         style.map("Treeview", background=[('selected', '#BBDEFB')], foreground=[('selected', 'black')])
         self.talent_tree = ttk.Treeview(tree_frame, columns=("序号", "姓名", "手机号", "省份", "城市", "分会职务", "加入人才库理由", "加入人才库时间"), show="headings", style="Treeview")
         self.talent_tree.heading("序号", text="序号")
-        self.talent_tree.heading("姓名", text="姓名")
+        self.talent_tree.heading("姓名", text="姓名", command=lambda: toggle_pinyin_order())
         self.talent_tree.heading("手机号", text="手机号")
         self.talent_tree.heading("省份", text="省份")
         self.talent_tree.heading("城市", text="城市")
@@ -589,6 +1645,7 @@ class HRManagementApp:
         self.talent_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.talent_tree.bind("<Double-1>", lambda event: self.show_person_details_from_talent(event))
+        self.talent_tree.bind("<<TreeviewSelect>>", lambda e: self.prefetch_neighbours(self.talent_tree))
         self.talent_tree.tag_configure("oddrow", background="#F5F5F5")
         self.talent_tree.tag_configure("evenrow", background="#FFFFFF")
 
@@ -603,29 +1660,40 @@ class HRManagementApp:
         export_btn.bind("<Enter>", lambda e: export_btn.config(bg="#1976D2"))
         export_btn.bind("<Leave>", lambda e: export_btn.config(bg="#2196F3"))
 
+        def show_talent_rows(rows):
+            self.talent_tree.delete(*self.talent_tree.get_children())
+            for idx, person in enumerate(rows, 1):
+                reason = person.talent_reason if person.talent_reason else "无"
+                position = person.position if person.position else "无职务"
+                row_tag = "oddrow" if idx % 2 else "evenrow"
+                self.talent_tree.insert("", "end", values=(idx, person.real_name, person.phone, person.province, person.city, position, reason, person.talent_add_time), tags=(row_tag, person.id))
+
+        pinyin_order = False
+
+        def talent_search_request():
+            search = search_entry.get().strip()
+            order = pinyin_order
+            return ("talent", order), search, lambda: list_talent_pool(search, order)
+
+        talent_search = LiveSearch(self.talent_window, talent_search_request, show_talent_rows)
+        search_entry.bind("<KeyRelease>", talent_search.on_key)
+
         def refresh_talent_list(search=""):
-            for item in self.talent_tree.get_children():
-                self.talent_tree.delete(item)
-            with sqlite3.connect('hr_data.db') as conn:
-                c = conn.cursor()
-                query = """
-                    SELECT p.id, p.real_name, p.phone, p.province, p.city, p.position, t.reason, t.add_time
-                    FROM personnel p
-                    JOIN talent_pool t ON p.id = t.person_id
-                """
-                params = []
-                if search:
-                    query += " WHERE p.real_name LIKE ? OR p.phone LIKE ?"
-                    params = [f"%{search}%", f"%{search}%"]
-                query += " ORDER BY t.add_time DESC"
-                c.execute(query, params)
-                rows = c.fetchall()
+            # 人才库有变动时调用，清空搜索缓存后重新查询
+            talent_search.invalidate()
+            rows = list_talent_pool(search, pinyin_order)
             logging.info(f"人才库查询结果：{len(rows)} 条记录")
-            for idx, row in enumerate(rows, 1):
-                reason = row[6] if row[6] else "无"
-                position = row[5] if row[5] else "无职务"
-                row_tag = "oddrow" if idx % 2 else "evenrow"
-                self.talent_tree.insert("", "end", values=(idx, row[1], row[2], row[3], row[4], position, reason, row[7]), tags=(row_tag, row[0]))
+            talent_search.remember(("talent", pinyin_order), search, rows)
+            show_talent_rows(rows)
+
+        def toggle_pinyin_order():
+            # 点击“姓名”表头在按拼音排序与按加入时间排序之间切换
+            nonlocal pinyin_order
+            pinyin_order = not pinyin_order
+            self.talent_tree.heading("姓名", text="姓名 ▲" if pinyin_order else "姓名")
+            rows = list_talent_pool(search_entry.get().strip(), pinyin_order)
+            talent_search.remember(("talent", pinyin_order), search_entry.get().strip(), rows)
+            show_talent_rows(rows)
 
         self.refresh_talent_list = refresh_talent_list
         self.refresh_talent_list()
@@ -636,19 +1704,13 @@ class HRManagementApp:
             messagebox.showwarning("提示", "请先选择要移除的人员！")
             return
         if messagebox.askyesno("确认", "是否从人才库中移除选中人员？（数据库中保留）"):
-            with sqlite3.connect('hr_data.db') as conn:
-                c = conn.cursor()
-                for item in selected:
-                    person_id = self.talent_tree.item(item, "tags")[1]
-                    c.execute("SELECT real_name FROM personnel WHERE id=?", (person_id,))
-                    real_name = c.fetchone()[0]
-                    c.execute("DELETE FROM talent_pool WHERE person_id=?", (person_id,))
-                    c.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) VALUES (?, ?, ?)",
-                              ("从人才库中移除", real_name, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-                conn.commit()
+            person_ids = [self.talent_tree.item(item, "tags")[1] for item in selected]
+            message, error = bulk_remove_from_talent_pool(person_ids)
+            if error:
+                messagebox.showerror("错误", error)
+                return
             self.refresh_talent_list()
-            messagebox.showinfo("提示", "已从人才库中移除选中人员")
-            logging.info("从人才库中移除人员完成")
+            messagebox.showinfo("提示", message)
 
     def close_talent_window(self):
         if self.talent_window:
@@ -689,27 +1751,7 @@ class HRManagementApp:
         if file_path:
             df.to_excel(file_path, index=False)
             wb = openpyxl.load_workbook(file_path)
-            ws = wb.active
-            thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-            for cell in ws[1]:
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.font = Font(name='SimSun', bold=True, size=10)
-                cell.border = thin_border
-            for col in ws.columns:
-                col_letter = col[0].column_letter
-                column_name = ws[f"{col_letter}1"].value or ''
-                title_width = max(len(str(column_name)) * 1.2, 10)
-                if column_name in ['个人简历', '加入人才库理由']:
-                    title_width = max(title_width, 30)
-                ws.column_dimensions[col_letter].width = title_width
-            for row in ws.iter_rows(min_row=2):
-                for cell in row:
-                    cell.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-                    cell.font = Font(name='SimSun', size=10)
-                    cell.border = thin_border
-            ws.row_dimensions[1].height = 20
-            for row in range(2, ws.max_row + 1):
-                ws.row_dimensions[row].height = 30
+            self.format_export_sheet(wb.active, wide_columns=('个人简历', '加入人才库理由'))
             wb.save(file_path)
             messagebox.showinfo("成功", f"成功导出人才库名单！")
             logging.info("导出人才库完成")
@@ -727,10 +1769,7 @@ class HRManagementApp:
         item = self.talent_tree.item(selected[0])
         person_id = item["tags"][-1]
         logging.info(f"人才库人员详情：tags={item['tags']}, person_id={person_id}")
-        with sqlite3.connect('hr_data.db') as conn:
-            c = conn.cursor()
-            c.execute("SELECT * FROM personnel WHERE id=?", (person_id,))
-            person = c.fetchone()
+        person = get_person_detail(person_id)
         if person:
             self.show_person_details_manual(person, from_talent=True)
         else:
@@ -744,10 +1783,7 @@ class HRManagementApp:
         item = self.tree.item(selected[0])
         person_id = item["tags"][-1]
         logging.info(f"主窗口人员详情：tags={item['tags']}, person_id={person_id}")
-        with sqlite3.connect('hr_data.db') as conn:
-            c = conn.cursor()
-            c.execute("SELECT * FROM personnel WHERE id=?", (person_id,))
-            person = c.fetchone()
+        person = get_person_detail(person_id)
         if person:
             self.show_person_details_manual(person)
         else:
@@ -755,166 +1791,44 @@ class HRManagementApp:
             logging.error(f"人员详情查询失败：ID {person_id}")
 
     def show_person_details_manual(self, person, from_talent=False):
-        person_id = person[0]
-        key = (person_id, from_talent)
-        if key in self.detail_windows and self.detail_windows[key].winfo_exists():
-            self.detail_windows[key].focus_set()
+        key = (person.id, from_talent)
+        form = self.detail_windows.pop(key, None)
+        if form and form.shown():
+            self.detail_windows[key] = form
+            form.window.focus_set()
             return
-
-        detail_window = tk.Toplevel(self.root)
-        detail_window.title("人员详情")
-        detail_window.geometry("505x640")
-        detail_window.configure(bg="#F0F0F0")
-        self.center_window(detail_window)
-
-        self.detail_windows[key] = detail_window
-
-        def on_close():
-            if key in self.detail_windows:
-                del self.detail_windows[key]
-            detail_window.destroy()
-
-        detail_window.protocol("WM_DELETE_WINDOW", on_close)
-
-        main_frame = tk.Frame(detail_window, bg="#FFFFFF", bd=2, relief="solid")
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        basic_frame = tk.LabelFrame(main_frame, text="基本信息", font=("Roboto", 10, "bold"), bg="#FFFFFF")
-        basic_frame.pack(fill=tk.X, padx=5, pady=5)
-        basic_inner = tk.Frame(basic_frame, bg="#FFFFFF")
-        basic_inner.pack(fill=tk.X, padx=5, pady=5)
-
-        basic_inner.grid_columnconfigure(0, minsize=100)
-        basic_inner.grid_columnconfigure(1, minsize=180)
-        basic_inner.grid_columnconfigure(2, weight=0, minsize=150)
-
-        basic_fields = [("真实姓名", 1), ("性别", 2), ("年龄", 3), ("身份证号", 4), ("手机号", 5), ("分会职务", 13), ("在职状态", 14)]
-        for i, (field, idx) in enumerate(basic_fields):
-            tk.Label(basic_inner, text=f"{field}：", width=14, anchor="e", font=("Roboto", 10), bg="#FFFFFF").grid(row=i, column=0, sticky="e")
-            value = person[idx] if person[idx] else "无"
-            wraplength = 180 if field == "分会职务" else 0
-            tk.Label(basic_inner, text=value, anchor="w", wraplength=wraplength, font=("Roboto", 10), bg="#FFFFFF").grid(row=i, column=1, sticky="w")
-            if wraplength and len(value) > 12:
-                logging.info(f"分会职务换行：{value}, 长度={len(value)}")
-
-        photo_wrapper = tk.Frame(basic_inner, bg="#FFFFFF")
-        photo_wrapper.grid(row=0, column=2, rowspan=7, sticky="e", padx=(10, 10), pady=5)
-        photo_frame = tk.Frame(photo_wrapper, width=100, height=130, bd=1, relief="solid", bg="#F5F5F5", highlightbackground="#CCCCCC", highlightthickness=1)
-        photo_frame.pack(expand=True, fill="y")
-        photo_frame.pack_propagate(False)
-        photo_label = tk.Label(photo_frame, bg="#F5F5F5")
-        photo_label.pack(fill="both")
-        has_photo = person[-1] and os.path.exists(person[-1])
-        if has_photo:
-            try:
-                img = Image.open(person[-1])
-                img.thumbnail((100, 130), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                photo_label.config(image=photo)
-                photo_label.image = photo
-                photo_label.update_idletasks()
-                logging.info(f"详情页加载照片：{person[-1]}")
-            except Exception as e:
-                messagebox.showwarning("警告", f"无法加载照片：{str(e)}")
-                logging.error(f"加载照片失败：{str(e)}")
+        if form is None or not form.window.winfo_exists():
+            form = self.take_detail_window()
+        self.detail_windows[key] = form
+        new = form.person is None
+        form.fill(person, from_talent)
+        if new:
+            self.center_window(form.window)
         else:
-            tk.Label(photo_frame, text="无照片", font=("Roboto", 10), bg="#F5F5F5").pack(expand=True)
-
-        detail_frame = tk.LabelFrame(main_frame, text="详细信息", font=("Roboto", 10, "bold"), bg="#FFFFFF")
-        detail_frame.pack(fill=tk.X, padx=5, pady=5)
-        detail_inner = tk.Frame(detail_frame, bg="#FFFFFF")
-        detail_inner.pack(fill=tk.X, padx=10, pady=10)
+            form.window.deiconify()
+        form.window.focus_set()
 
-        detail_left = tk.Frame(detail_inner, bg="#FFFFFF")
-        detail_left.pack(side=tk.LEFT, fill=tk.Y)
-        detail_left.grid_columnconfigure(0, minsize=100)
-        detail_left.grid_columnconfigure(1, minsize=180)
-        detail_fields = [("省份", 6), ("城市", 7), ("昵称", 9), ("学历", 10), ("政治面貌", 11),
-                        ("个人职业", 12), ("加入组织时间", 15), ("跟捐天数", 16), ("家庭住址", 17)]
-        for i, (field, idx) in enumerate(detail_fields):
-            tk.Label(detail_left, text=f"{field}：", width=14, anchor="e", font=("Roboto", 10), bg="#FFFFFF").grid(row=i, column=0, sticky="e")
-            value = person[idx] if person[idx] else "无"
-            wraplength = 180 if field in ["个人职业", "家庭住址"] else 250
-            tk.Label(detail_left, text=value, anchor="w", wraplength=wraplength, font=("Roboto", 10), bg="#FFFFFF").grid(row=i, column=1, sticky="w")
-            if wraplength == 180 and len(value) > 12:
-                logging.info(f"{field}换行：{value}, 长度={len(value)}")
-
-        if from_talent:
-            detail_right = tk.Frame(detail_inner, bg="#FFFFFF")
-            detail_right.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 10))
-            reason_title = tk.Label(detail_right, text="加入人才库理由", font=("Roboto", 10, "bold"), bg="#FFFFFF", anchor="center")
-            reason_title.pack(fill=tk.X, pady=(0, 5))
-            with sqlite3.connect('hr_data.db') as conn:
-                c = conn.cursor()
-                c.execute("SELECT reason FROM talent_pool WHERE person_id=?", (person[0],))
-                reason = c.fetchone()
-            reason_frame = tk.Frame(detail_right, width=150, height=130, bg="#F5F5F5")
-            reason_frame.pack(fill=tk.X, padx=5, pady=5)
-            reason_frame.pack_propagate(False)
-
-            reason_text = tk.Text(
-                reason_frame, width=18, height=7, wrap=tk.WORD, font=("Roboto", 10),
-                bg="#F5F5F5", bd=0, highlightthickness=0, relief="flat"
-            )
-            reason_text.pack(side=tk.LEFT, padx=5, pady=5, fill="both", expand=True)
-            scrollbar = ttk.Scrollbar(reason_frame, orient=tk.VERTICAL, command=reason_text.yview)
-            reason_text.configure(yscrollcommand=scrollbar.set)
-            reason_text.insert(tk.END, reason[0] if reason and reason[0] else "无")
-            reason_text.config(state="disabled")
-            line_count = reason_text.count("1.0", tk.END, "displaylines")[0]
-            if line_count > 7:
-                scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-            if reason and reason[0] and len(reason[0]) > 12:
-                logging.info(f"加入人才库理由换行：{reason[0]}, 长度={len(reason[0])}")
-
-        bio_frame = tk.LabelFrame(main_frame, text="个人简历", font=("Roboto", 10, "bold"), bg="#FFFFFF")
-        bio_frame.pack(fill=tk.BOTH, padx=5, pady=5)
-        bio_inner = tk.Frame(bio_frame, bg="#F5F5F5")
-        bio_inner.pack(fill=tk.BOTH, padx=5, pady=5, expand=True)
-
-        bio_text = tk.Text(
-            bio_inner, width=45, height=5, wrap=tk.WORD, font=("Roboto", 10),
-            bg="#F5F5F5", bd=0, highlightthickness=0, relief="flat"
-        )
-        bio_content = person[-2] if person[-2] else "无"
-        logging.info(f"个人简历内容：{bio_content}")
-        bio_text.insert(tk.END, bio_content)
-        bio_text.config(state="disabled")
-        bio_text.pack(side=tk.LEFT, padx=5, pady=5, fill="both", expand=True)
-        bio_text.update_idletasks()
-        line_count = bio_text.count("1.0", tk.END, "displaylines")[0]
-        logging.info(f"个人简历行数：{line_count}")
-        if line_count >= 5:
-            scrollbar = ttk.Scrollbar(bio_inner, orient=tk.VERTICAL, command=bio_text.yview)
-            bio_text.configure(yscrollcommand=scrollbar.set)
-            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        button_frame = tk.Frame(main_frame, bg="#FFFFFF")
-        button_frame.pack(fill=tk.X, pady=10)
-        inner_button_frame = tk.Frame(button_frame, bg="#FFFFFF")
-        inner_button_frame.pack(anchor="center")
-        edit_btn = tk.Button(inner_button_frame, text="修改信息", command=lambda: self.edit_person(person[0], detail_window, from_talent), font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
-        edit_btn.pack(side=tk.LEFT, padx=5)
-        edit_btn.bind("<Enter>", lambda e: edit_btn.config(bg="#1976D2"))
-        edit_btn.bind("<Leave>", lambda e: edit_btn.config(bg="#2196F3"))
-        export_btn = tk.Button(inner_button_frame, text="导出信息", command=lambda: self.export_person_data(person, from_talent), font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
-        export_btn.pack(side=tk.LEFT, padx=5)
-        export_btn.bind("<Enter>", lambda e: export_btn.config(bg="#1976D2"))
-        export_btn.bind("<Leave>", lambda e: export_btn.config(bg="#2196F3"))
-        if not from_talent:
-            delete_btn = tk.Button(inner_button_frame, text="删除人员", command=lambda: self.delete_person(person[0], detail_window), font=("Roboto", 10), bg="#FF9800", fg="white", bd=0, relief="flat", padx=10, pady=5)
-            delete_btn.pack(side=tk.LEFT, padx=5)
-            delete_btn.bind("<Enter>", lambda e: delete_btn.config(bg="#F57C00"))
-            delete_btn.bind("<Leave>", lambda e: delete_btn.config(bg="#FF9800"))
-            with sqlite3.connect('hr_data.db') as conn:
-                c = conn.cursor()
-                c.execute("SELECT id FROM talent_pool WHERE person_id=?", (person[0],))
-                is_in_talent = c.fetchone() is not None
-            add_btn = tk.Button(inner_button_frame, text="加入人才库", command=lambda: self.show_reason_window(person[0], detail_window), font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5, state="disabled" if is_in_talent else "normal")
-            add_btn.pack(side=tk.LEFT, padx=5)
-            add_btn.bind("<Enter>", lambda e: add_btn.config(bg="#1976D2"))
-            add_btn.bind("<Leave>", lambda e: add_btn.config(bg="#2196F3"))
+    def take_detail_window(self):
+        """窗口数已到上限时复用最久未打开的隐藏详情窗口，否则新建"""
+        for key, form in list(self.detail_windows.items()):
+            if not form.window.winfo_exists():
+                del self.detail_windows[key]
+            elif len(self.detail_windows) >= DETAIL_POOL_SIZE and not form.shown():
+                del self.detail_windows[key]
+                return form
+        return DetailWindow(self)
+
+    def close_detail_window(self, window):
+        """关闭详情窗口：隐藏留待复用，窗口数超过上限时销毁"""
+        for key, form in self.detail_windows.items():
+            if form.window is window:
+                if len(self.detail_windows) > DETAIL_POOL_SIZE:
+                    del self.detail_windows[key]
+                    window.destroy()
+                else:
+                    window.withdraw()
+                return
+        window.destroy()
 
     def show_reason_window(self, person_id, detail_window=None):
         reason_window = tk.Toplevel(self.root)
@@ -951,7 +1865,7 @@ class HRManagementApp:
             messagebox.showinfo("提示", message)
             reason_window.destroy()
             if detail_window:
-                detail_window.destroy()
+                self.close_detail_window(detail_window)
 
     def delete_person(self, person_id, detail_window=None):
         if messagebox.askyesno("确认", "是否彻底删除该人员？"):
@@ -962,29 +1876,21 @@ class HRManagementApp:
                 self.refresh_data()
                 messagebox.showinfo("提示", message)
                 if detail_window:
-                    detail_window.destroy()
+                    self.close_detail_window(detail_window)
 
     def edit_person(self, person_id, detail_window=None, from_talent=False):
-        if self.edit_person_window and self.edit_person_window.winfo_exists():
-            self.edit_person_window.focus_set()
+        if self.edit_person_window and self.edit_person_window.shown():
+            self.edit_person_window.window.focus_set()
             return
         if detail_window:
-            detail_window.destroy()
-        with sqlite3.connect('hr_data.db') as conn:
-            c = conn.cursor()
-            c.execute("SELECT * FROM personnel WHERE id=?", (person_id,))
-            person = c.fetchone()
-            if from_talent:
-                c.execute("SELECT reason FROM talent_pool WHERE person_id=?", (person_id,))
-                reason = c.fetchone()
-                reason = reason[0] if reason else ""
-            else:
-                reason = ""
-        self.open_person_window(mode="edit", person=person, from_talent=from_talent, talent_reason=reason, detail_person=person if detail_window else None)
+            self.close_detail_window(detail_window)
+        person = get_person_detail(person_id)
+        reason = (person.talent_reason or "") if from_talent and person else ""
+        self.open_person_window(mode="edit", person=person, from_talent=from_talent, talent_reason=reason)
 
     def add_person(self):
-        if self.add_person_window and self.add_person_window.winfo_exists():
-            self.add_person_window.focus_set()
+        if self.add_person_window and self.add_person_window.shown():
+            self.add_person_window.window.focus_set()
             return
         self.open_person_window(mode="add")
 
@@ -1009,234 +1915,27 @@ class HRManagementApp:
         if current_focus:
             current_focus.focus_set()
 
-    def open_person_window(self, mode, person=None, from_talent=False, talent_reason="", detail_person=None):
-        if mode == "add":
-            if self.add_person_window and self.add_person_window.winfo_exists():
-                self.add_person_window.focus_set()
-                return
-        elif mode == "edit":
-            if self.edit_person_window and self.edit_person_window.winfo_exists():
-                self.edit_person_window.focus_set()
-                return
-        window_title = "新增人员" if mode == "add" else "编辑人员"
-        window = tk.Toplevel(self.root)
-        window.title(window_title)
-        window.geometry("505x640")
-        window.configure(bg="#F0F0F0")
-        self.center_window(window)
-        if mode == "add":
-            self.add_person_window = window
-            window.protocol("WM_DELETE_WINDOW", lambda: self.close_add_person_window())
-        else:
-            self.edit_person_window = window
-            window.protocol("WM_DELETE_WINDOW", lambda: self.close_edit_person_window())
-
-        main_frame = tk.Frame(window, bg="#FFFFFF", bd=2, relief="solid")
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        basic_frame = tk.LabelFrame(main_frame, text="基本信息", font=("Roboto", 10, "bold"), bg="#FFFFFF")
-        basic_frame.pack(fill=tk.X, padx=5, pady=5)
-        basic_inner = tk.Frame(basic_frame, bg="#FFFFFF")
-        basic_inner.pack(fill=tk.X, padx=5, pady=5)
-
-        basic_inner.grid_columnconfigure(0, minsize=100)
-        basic_inner.grid_columnconfigure(1, minsize=180)
-        basic_inner.grid_columnconfigure(2, weight=0, minsize=150)
-
-        basic_fields = [
-            ("真实姓名", tk.Entry, None, 20),
-            ("性别", ttk.Combobox, ["男", "女"], 10),
-            ("年龄", tk.Entry, None, 10),
-            ("身份证号", tk.Entry, None, 20),
-            ("手机号", tk.Entry, None, 20),
-            ("分会职务", tk.Entry, None, 20),
-            ("在职状态", ttk.Combobox, ["在职", "离职", "无职务"], 10),
-        ]
-        entries = {}
-        for i, (field, widget_type, values, width) in enumerate(basic_fields):
-            tk.Label(basic_inner, text=f"{field}：", width=14, anchor="e", font=("Roboto", 10), bg="#FFFFFF").grid(row=i, column=0, sticky="e")
-            entry = widget_type(basic_inner, width=width, font=("Roboto", 10))
-            if values:
-                entry['values'] = values
-            entry.grid(row=i, column=1, sticky="w")
-            if widget_type == tk.Entry:
-                entry.config(bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
-            entries[field] = entry
-
-        photo_wrapper = tk.Frame(basic_inner, bg="#FFFFFF")
-        photo_wrapper.grid(row=0, column=2, rowspan=7, sticky="e", padx=(10, 10), pady=5)
-        photo_frame = tk.Frame(photo_wrapper, width=100, height=130, bd=1, relief="solid", bg="#F5F5F5", highlightbackground="#CCCCCC", highlightthickness=1)
-        photo_frame.pack(expand=True, fill="y")
-        photo_frame.pack_propagate(False)
-        self.photo_label = tk.Label(photo_frame, bg="#F5F5F5")
-        self.photo_label.pack(fill="both")
-        self.photo_path = tk.StringVar()
-        if person and person[-1] and os.path.exists(person[-1]):
-            self.photo_path.set(person[-1])
-            try:
-                img = Image.open(person[-1])
-                img.thumbnail((100, 130), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                self.photo_label.config(image=photo)
-                self.photo_label.image = photo
-                self.photo_label.update_idletasks()
-                logging.info(f"加载现有照片：{person[-1]}")
-            except Exception as e:
-                messagebox.showwarning("警告", f"无法加载照片：{str(e)}")
-                logging.error(f"照片加载失败：{str(e)}")
+    def open_person_window(self, mode, person=None, from_talent=False, talent_reason=""):
+        form = self.add_person_window if mode == "add" else self.edit_person_window
+        if form and form.shown():
+            form.window.focus_set()
+            return
+        new = form is None or not form.window.winfo_exists()
+        if new:
+            form = PersonWindow(self, mode)
+            if mode == "add":
+                self.add_person_window = form
+            else:
+                self.edit_person_window = form
+        form.fill(person, from_talent, talent_reason)
+        # 上传照片作用于最近打开的新增或编辑窗口
+        self.photo_label = form.photo_label
+        self.photo_path = form.photo_path
+        if new:
+            self.center_window(form.window)
         else:
-            tk.Label(self.photo_label, text="无照片", font=("Roboto", 10), bg="#F5F5F5").pack(expand=True)
-
-        button_frame = tk.Frame(photo_wrapper, bg="#FFFFFF")
-        button_frame.pack(fill=tk.X, pady=5)
-        upload_btn = tk.Button(button_frame, text="上传照片", command=self.upload_photo, font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
-        upload_btn.pack(side=tk.LEFT, padx=5)
-        upload_btn.bind("<Enter>", lambda e: upload_btn.config(bg="#1976D2"))
-        upload_btn.bind("<Leave>", lambda e: upload_btn.config(bg="#2196F3"))
-        if mode == "edit":
-            delete_btn = tk.Button(button_frame, text="删除照片", command=lambda: delete_photo(self.photo_path, self.photo_label), font=("Roboto", 10), bg="#FF9800", fg="white", bd=0, relief="flat", padx=10, pady=5)
-            delete_btn.pack(side=tk.LEFT, padx=5)
-            delete_btn.bind("<Enter>", lambda e: delete_btn.config(bg="#F57C00"))
-            delete_btn.bind("<Leave>", lambda e: delete_btn.config(bg="#FF9800"))
-
-        detail_frame = tk.LabelFrame(main_frame, text="详细信息", font=("Roboto", 10, "bold"), bg="#FFFFFF")
-        detail_frame.pack(fill=tk.X, padx=5, pady=5)
-        detail_inner = tk.Frame(detail_frame, bg="#FFFFFF")
-        detail_inner.pack(fill=tk.X, padx=10, pady=10)
-
-        detail_left = tk.Frame(detail_inner, bg="#FFFFFF")
-        detail_left.pack(side=tk.LEFT, fill=tk.Y)
-        detail_fields = [
-            ("省份", tk.Entry, None, 20),
-            ("城市", tk.Entry, None, 20),
-            ("昵称", tk.Entry, None, 20),
-            ("学历", ttk.Combobox, ["初中", "高中", "大专", "本科", "硕士", "博士"], 10),
-            ("政治面貌", ttk.Combobox, ["中共党员", "共青团员", "群众"], 10),
-            ("个人职业", tk.Entry, None, 20),
-            ("加入组织时间", tk.Entry, None, 20),
-            ("跟捐天数", tk.Entry, None, 20),
-            ("家庭住址", tk.Entry, None, 20),
-        ]
-        for i, (field, widget_type, values, width) in enumerate(detail_fields):
-            tk.Label(detail_left, text=f"{field}：", width=14, anchor="e", font=("Roboto", 10), bg="#FFFFFF").grid(row=i, column=0, sticky="e")
-            entry = widget_type(detail_left, width=width, font=("Roboto", 10))
-            if values:
-                entry['values'] = values
-            entry.grid(row=i, column=1, sticky="w")
-            if widget_type == tk.Entry:
-                entry.config(bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
-            entries[field] = entry
-
-        if from_talent:
-            detail_right = tk.Frame(detail_inner, bg="#FFFFFF")
-            detail_right.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 10))
-            tk.Label(detail_right, text="加入人才库理由", font=("Roboto", 10, "bold"), bg="#FFFFFF", anchor="center").pack(fill=tk.X, pady=(0, 5))
-            reason_frame = tk.Frame(detail_right, bg="#F5F5F5", highlightbackground="#CCCCCC", highlightthickness=1)
-            reason_frame.pack(fill=tk.X)
-            reason_text = scrolledtext.ScrolledText(reason_frame, height=7, width=15, wrap=tk.WORD, font=("Roboto", 10), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
-            reason_text.pack(padx=15, pady=5)
-            reason_text.insert(tk.END, talent_reason if talent_reason else "")
-            entries["加入人才库理由"] = reason_text
-
-        bio_frame = tk.LabelFrame(main_frame, text="个人简历", font=("Roboto", 10, "bold"), bg="#FFFFFF")
-        bio_frame.pack(fill=tk.BOTH, padx=5, pady=5)
-        bio_text = scrolledtext.ScrolledText(bio_frame, height=5, width=45, wrap=tk.WORD, font=("Roboto", 10), bd=1, relief="solid", highlightbackground="#CCCCCC", highlightthickness=1)
-        bio_text.pack(fill=tk.X, padx=5, pady=5)
-        entries["个人简历"] = bio_text
-
-        if mode == "edit" and person:
-            entries["真实姓名"].insert(0, person[1] if person[1] else "")
-            entries["性别"].set(person[2] if person[2] else "")
-            entries["年龄"].insert(0, person[3] if person[3] else "")
-            entries["身份证号"].insert(0, person[4] if person[4] else "")
-            entries["手机号"].insert(0, person[5] if person[5] else "")
-            entries["省份"].insert(0, person[6] if person[6] else "")
-            entries["城市"].insert(0, person[7] if person[7] else "")
-            entries["昵称"].insert(0, person[9] if person[9] else "")
-            entries["学历"].set(person[10] if person[10] else "")
-            entries["政治面貌"].set(person[11] if person[11] else "")
-            entries["个人职业"].insert(0, person[12] if person[12] else "")
-            entries["分会职务"].insert(0, person[13] if person[13] else "")
-            entries["在职状态"].set(person[14] if person[14] else "")
-            entries["加入组织时间"].insert(0, person[15] if person[15] else "")
-            entries["跟捐天数"].insert(0, person[16] if person[16] else "")
-            entries["家庭住址"].insert(0, person[17] if person[17] else "")
-            bio_text.insert(tk.END, person[18] if person[18] else "")
-
-        def save_data():
-            data = [
-                entries["真实姓名"].get() or None,
-                entries["性别"].get() or None,
-                entries["年龄"].get() or None,
-                entries["身份证号"].get() or None,
-                entries["手机号"].get() or None,
-                entries["省份"].get() or None,
-                entries["城市"].get() or None,
-                None,
-                entries["昵称"].get() or None,
-                entries["学历"].get() or None,
-                entries["政治面貌"].get() or None,
-                entries["个人职业"].get() or None,
-                entries["分会职务"].get() or None,
-                entries["在职状态"].get() or None,
-                entries["加入组织时间"].get() or None,
-                entries["跟捐天数"].get() or None,
-                entries["家庭住址"].get() or None,
-                entries["个人简历"].get("1.0", tk.END).strip() or None,
-                self.photo_path.get() or None,
-            ]
-            if not data[0] or not data[4]:
-                messagebox.showerror("错误", "真实姓名和手机号为必填项！")
-                return
-            try:
-                if mode == "add":
-                    if from_talent:
-                        reason = entries["加入人才库理由"].get("1.0", tk.END).strip() or None
-                        person_id, message, error = save_and_add_to_talent_pool(data, reason)
-                    else:
-                        person_id, message, error = save_person(data, mode, None)
-                else:
-                    person_id, message, error = save_person(data, mode, person, from_talent)
-                    if from_talent and "加入人才库理由" in entries:
-                        reason = entries["加入人才库理由"].get("1.0", tk.END).strip() or None
-                        if reason:
-                            with sqlite3.connect('hr_data.db') as conn:
-                                c = conn.cursor()
-                                c.execute("UPDATE talent_pool SET reason = ? WHERE person_id = ?", (reason, person_id))
-                                conn.commit()
-                if error:
-                    messagebox.showerror("错误", error)
-                else:
-                    self.refresh_data()
-                    messagebox.showinfo("提示", message)
-                    window.destroy()
-                    if person_id:
-                        with sqlite3.connect('hr_data.db') as conn:
-                            c = conn.cursor()
-                            c.execute("SELECT * FROM personnel WHERE id=?", (person_id,))
-                            updated_person = c.fetchone()
-                        if updated_person:
-                            self.show_person_details_manual(updated_person, from_talent)
-            except Exception as e:
-                messagebox.showerror("错误", f"保存失败：{str(e)}")
-
-        button_frame = tk.Frame(main_frame, bg="#FFFFFF")
-        button_frame.pack(fill=tk.X, pady=10)
-        inner_button_frame = tk.Frame(button_frame, bg="#FFFFFF")
-        inner_button_frame.pack(anchor="center")
-        save_btn = tk.Button(inner_button_frame, text="保存", command=save_data, font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
-        save_btn.pack(side=tk.LEFT, padx=5)
-        save_btn.bind("<Enter>", lambda e: save_btn.config(bg="#1976D2"))
-        save_btn.bind("<Leave>", lambda e: save_btn.config(bg="#2196F3"))
-        cancel_btn = tk.Button(inner_button_frame, text="取消", command=window.destroy, font=("Roboto", 10), bg="#FF9800", fg="white", bd=0, relief="flat", padx=10, pady=5)
-        cancel_btn.pack(side=tk.LEFT, padx=5)
-        cancel_btn.bind("<Enter>", lambda e: cancel_btn.config(bg="#F57C00"))
-        cancel_btn.bind("<Leave>", lambda e: cancel_btn.config(bg="#FF9800"))
-        if mode == "add" and not from_talent:
-            save_add_btn = tk.Button(inner_button_frame, text="保存并加入人才库", command=lambda: self.save_and_add_to_talent_pool(entries, window), font=("Roboto", 10), bg="#2196F3", fg="white", bd=0, relief="flat", padx=10, pady=5)
-            save_add_btn.pack(side=tk.LEFT, padx=5)
-            save_add_btn.bind("<Enter>", lambda e: save_add_btn.config(bg="#1976D2"))
-            save_add_btn.bind("<Leave>", lambda e: save_add_btn.config(bg="#2196F3"))
+            form.window.deiconify()
+        form.window.focus_set()
 
     def save_and_add_to_talent_pool(self, entries, parent_window):
         reason_window = tk.Toplevel(self.root)
@@ -1297,12 +1996,12 @@ class HRManagementApp:
                     self.refresh_talent_list()
                 messagebox.showinfo("提示", message)
                 reason_window.destroy()
-                parent_window.destroy()
+                parent_window.withdraw()
         except Exception as e:
             messagebox.showerror("错误", f"保存失败：{str(e)}")
 
     def export_person_data(self, person, from_talent):
-        default_filename = f"{person[1]}_详细信息.pdf"
+        default_filename = f"{person.real_name}_详细信息.pdf"
         file_path = filedialog.asksaveasfilename(
             defaultextension=".pdf",
             filetypes=[("PDF files", "*.pdf")],
@@ -1319,13 +2018,11 @@ class HRManagementApp:
 
     def close_add_person_window(self):
         if self.add_person_window:
-            self.add_person_window.destroy()
-            self.add_person_window = None
+            self.add_person_window.close()
 
     def close_edit_person_window(self):
         if self.edit_person_window:
-            self.edit_person_window.destroy()
-            self.edit_person_window = None
+            self.edit_person_window.close()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1,7 +1,471 @@
-import tkinter as tk
-from gui import HRManagementApp
+import argparse
+import io
+import json
+import os
+import sys
 
-if __name__ == "__main__":
+
+def run_gui():
+    import tkinter as tk
+    from gui import HRManagementApp
     root = tk.Tk()
-    app = HRManagementApp(root)
-    root.mainloop()
\ No newline at end of file
+    HRManagementApp(root)
+    root.mainloop()
+
+
+def cmd_stats(args):
+    from database import get_headcount_overview, rebuild_headcount_stats
+    from stats import REPORT_DIMENSIONS
+    if args.rebuild:
+        message, error = rebuild_headcount_stats()
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+    overview = get_headcount_overview()
+    dimensions = [args.by] if args.by else list(REPORT_DIMENSIONS)
+    if args.json:
+        result = {"total": {"count": overview["total"][0], "talent_count": overview["total"][1]}}
+        for dimension in dimensions:
+            result[dimension] = [{"key": key, "count": count, "talent_count": talent_count}
+                                 for key, count, talent_count in overview[dimension]]
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0
+    print(f"总人数：{overview['total'][0]}  人才库：{overview['total'][1]}")
+    for dimension in dimensions:
+        print(f"\n按{REPORT_DIMENSIONS[dimension]}统计：")
+        for key, count, talent_count in overview[dimension]:
+            print(f"  {key:<20}\t{count:>8}\t人才库 {talent_count}")
+    return 0
+
+
+def _write_frames(path, frames):
+    import pandas as pd
+    if path.endswith('.csv'):
+        # CSV 只能容纳一张表，删除记录另存为同名 _deleted.csv
+        for suffix, (sheet, df) in zip(("", "_deleted"), frames):
+            target = path if not suffix else path[:-4] + suffix + ".csv"
+            df.to_csv(target, index=False, encoding='utf-8-sig')
+        return
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for sheet, df in frames:
+            df.to_excel(writer, sheet_name=sheet, index=False)
+
+
+def _export_format(args):
+    # 未指定格式时按输出文件扩展名判断；输出到标准输出时默认 CSV
+    if args.format:
+        return args.format
+    if args.output == "-":
+        return "csv"
+    for fmt in ("csv", "jsonl"):
+        if args.output and args.output.lower().endswith("." + fmt):
+            return fmt
+    return "xlsx"
+
+
+def cmd_export(args):
+    from database import export_data, export_delta, record_export_watermark, stream_export, export_filename
+    if args.delta:
+        changed, deleted, watermark, filename_or_error = export_delta(args.province, args.city, args.since)
+        if changed is None:
+            print(filename_or_error, file=sys.stderr)
+            return 1
+        output = args.output or filename_or_error + ".xlsx"
+        _write_frames(output, [("变更记录", changed), ("已删除", deleted)])
+        if not args.dry_run:
+            record_export_watermark(args.province, args.city, watermark, len(changed), len(deleted))
+        print(f"增量导出完成：变更 {len(changed)} 条，删除 {len(deleted)} 条，水位 {watermark} -> {output}")
+        return 0
+    export_type = "division" if args.province != "全部" or args.city != "全部" else "all"
+    fmt = _export_format(args)
+    if fmt != "xlsx":
+        # CSV、JSON Lines 逐批读取游标写出，不经过 pandas；输出到标准输出时不写 BOM，提示信息写到标准错误
+        if args.output == "-":
+            stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="")
+            try:
+                message, error = stream_export(stdout, fmt, export_type, args.province, args.city,
+                                               include_archived=args.include_archived)
+            finally:
+                stdout.flush()
+                stdout.detach()
+            print(error or message, file=sys.stderr)
+            return 1 if error else 0
+        output = args.output or f"{export_filename(export_type, args.province, args.city)}.{fmt}"
+        message, error = stream_export(output, fmt, export_type, args.province, args.city, include_archived=args.include_archived)
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+        print(f"{message} -> {output}")
+        return 0
+    df, filename_or_error = export_data(export_type, args.province, args.city, None, include_archived=args.include_archived)
+    if df is None:
+        print(filename_or_error, file=sys.stderr)
+        return 1
+    output = args.output or filename_or_error + ".xlsx"
+    _write_frames(output, [("人员名单", df)])
+    print(f"成功导出 {len(df)} 条数据 -> {output}")
+    return 0
+
+
+def cmd_stress(args):
+    from stress import run_stress, format_report
+    report = run_stress(args.workers, args.duration, args.db, args.seed_rows)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report))
+    return 0 if report['integrity'] == 'ok' and report['summary_consistent'] else 1
+
+
+def cmd_serve(args):
+    from service import serve
+    _use_db(args.db)
+    serve(args.host, args.port, args.readers)
+    return 0
+
+
+def _use_db(path):
+    import database
+    if path:
+        database.set_db_path(path)
+        database.ensure_schema()
+
+
+def cmd_maintain(args):
+    from maintenance import run_maintenance, run_due_maintenance
+    _use_db(args.db)
+    results = run_due_maintenance() if args.due else run_maintenance(args.tasks, args.full_vacuum)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    elif not results:
+        print("没有到期的维护任务")
+    else:
+        for result in results:
+            print(f"{result['label']:<24}{'成功' if result['ok'] else '失败'}  {result['seconds']:.2f} 秒  {result['result']}")
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+def cmd_health(args):
+    from maintenance import health_report, format_report
+    _use_db(args.db)
+    report = health_report(args.top)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report))
+    return 0
+
+
+def cmd_journal(args):
+    import cdc
+    _use_db(args.db)
+    if args.action == "snapshot":
+        message, error = cdc.take_snapshot()
+    elif args.action == "list":
+        for snapshot_id, path, taken_at, journal_seq, journal_at in cdc.list_snapshots():
+            print(f"{snapshot_id:>4}  {taken_at}  日志序号 {journal_seq:<10}{path}")
+        return 0
+    elif args.action == "restore":
+        if not args.as_of or not args.output:
+            print("恢复需要指定 --as-of 与 -o", file=sys.stderr)
+            return 1
+        message, error = cdc.restore_to(args.as_of, args.output)
+    else:
+        change_set = cdc.export_change_set(args.since, args.until)
+        output = args.output or "变更集.json"
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(change_set, f, ensure_ascii=False)
+        message, error = f"导出变更 {len(change_set['changes'])} 条 -> {output}", None
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+    print(message)
+    return 0
+
+
+def cmd_shard(args):
+    from shards import ShardSet, province_key
+    from filters import condition, all_of, keyword_filter
+    shard_set = ShardSet(args.shards)
+    if args.action == "split":
+        result = shard_set.split(args.db or "hr_data.db")
+        for province, count in result.items():
+            print(f"{province:<12}{count:>8} 人")
+        print(f"拆分完成：{len(result)} 个分库，共 {sum(result.values())} 人")
+        return 0
+    if args.action == "import":
+        if not args.files:
+            print("请指定要导入的文件", file=sys.stderr)
+            return 1
+        message, error = shard_set.import_data(args.files)
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+        print(message)
+        return 0
+    if args.action == "list":
+        overview = shard_set.overview()
+        if args.json:
+            print(json.dumps(overview, ensure_ascii=False, indent=2))
+            return 0
+        for item in overview:
+            print(f"{item['shard_no']:>4}  {item['province']:<12}{item['count']:>8} 人  人才库 {item['talent_count']:<6}"
+                  f"{item['file_size'] / 1024:>10.0f} KB  {item['path']}")
+        print(f"共 {len(overview)} 个分库，{sum(item['count'] for item in overview)} 人")
+        return 0
+    provinces = [province_key(args.province)] if args.province else None
+    criteria = all_of(condition("city", "startswith", args.city) if args.city else None, keyword_filter(args.search))
+    if args.action == "query":
+        rows = shard_set.query_personnel(criteria, [("province", "asc")], limit=args.limit, provinces=provinces,
+                                         include_archived=args.include_archived)
+        if args.json:
+            print(json.dumps([{name: getattr(person, name) for name in ('id', 'real_name', 'phone', 'province', 'city', 'position', 'status')}
+                              for person in rows], ensure_ascii=False, indent=2))
+            return 0
+        for person in rows:
+            print(f"{person.id:>12}  {person.real_name or '':<8}{person.phone or '':<14}{person.province or '':<8}{person.city or '':<8}"
+                  f"{person.position or '无职务'}")
+        print(f"共 {len(rows)} 人")
+        return 0
+    df, filename_or_error = shard_set.export_data(criteria, [("province", "asc")], provinces, include_archived=args.include_archived)
+    if df is None:
+        print(filename_or_error, file=sys.stderr)
+        return 1
+    output = args.output or filename_or_error + ".xlsx"
+    _write_frames(output, [("人员名单", df)])
+    print(f"成功导出 {len(df)} 条数据 -> {output}")
+    return 0
+
+
+def cmd_replicate(args):
+    import replication
+    _use_db(args.db)
+    if args.action == "site":
+        message, error = replication.set_site(args.name, args.reset_site)
+    elif args.action == "export":
+        message, error = replication.export_changes(args.output, args.since)
+    elif args.action == "log":
+        for direction, logged_at, site_name, site_id, rows, deletes, applied, watermark, file_name in replication.replication_log():
+            label = "导出" if direction == "export" else "合并"
+            applied = "" if applied is None else f"  生效 {applied}"
+            print(f"{logged_at}  {label}  {site_name or site_id[:8]:<12}{rows:>8} 人  删除 {deletes:<6}{applied}  水位 {watermark}  {file_name}")
+        return 0
+    else:
+        if not args.files:
+            print("请指定要合并的变更集文件", file=sys.stderr)
+            return 1
+        failed = 0
+        for path in args.files:
+            message, error = replication.merge_changes(path, args.force)
+            if error:
+                print(error, file=sys.stderr)
+                failed += 1
+            else:
+                print(message)
+        return 1 if failed else 0
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+    print(message)
+    return 0
+
+
+def cmd_archive(args):
+    import archive
+    _use_db(args.db)
+    if args.action == "policy":
+        if args.status is None and args.inactive_days is None:
+            hot, archived = archive.archive_counts()
+            print(f"归档策略：{archive.describe_policy(archive.get_archive_policy())}")
+            print(f"在册 {hot} 人，已归档 {archived} 人")
+            return 0
+        statuses = None if args.status is None else [status for status in args.status if status]
+        message, error = archive.set_archive_policy(statuses, args.inactive_days)
+    elif args.action == "run":
+        message, error = archive.apply_archive_policy(args.dry_run)
+    elif args.action == "list":
+        for person in archive.list_archived(args.search, limit=args.limit):
+            print(f"{person.id:>8}  {person.real_name or '':<10}{person.province or '':<8}{person.city or '':<8}"
+                  f"{person.status or '':<6}{person.archived_at[:19]}  {person.archive_reason or ''}")
+        return 0
+    else:
+        if not args.ids:
+            print("请指定要归档或恢复的人员 ID", file=sys.stderr)
+            return 1
+        if args.action == "restore":
+            message, error = archive.restore_persons(args.ids)
+        else:
+            message, error = archive.archive_persons(args.ids)
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+    print(message)
+    return 0
+
+
+def cmd_birthdays(args):
+    from database import list_birthdays
+    _use_db(args.db)
+    persons = list_birthdays(args.days)
+    for person in persons:
+        age = f"{person.age}岁" if person.age is not None else ""
+        print(f"{person.birthday}\t{person.real_name or ''}\t{age}\t{person.phone or ''}\t{person.province or ''}{person.city or ''}")
+    print(f"{args.days} 天内过生日的人员 {len(persons)} 名", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    from stats import REPORT_DIMENSIONS
+    parser = argparse.ArgumentParser(prog="renshi", description="人事管理系统，不带子命令时启动图形界面")
+    parser.add_argument("--server", help="图形界面连接人事数据服务（如 http://127.0.0.1:8765），不直接读写数据库文件")
+    parser.add_argument("--profile", nargs="?", type=float, const=100, metavar="毫秒",
+                        help="性能分析模式：记录每条 SQL 的耗时与行数，超过阈值（默认 100 毫秒）的语句记录执行计划，"
+                             "界面操作以 cProfile 记录，退出时报告写入 profile 目录")
+    parser.add_argument("--maintenance", action="store_true",
+                        help="图形界面在后台执行到期的定时维护（默认由数据服务或 renshi maintain --due 执行）")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="列式快照模式：主列表读入内存，筛选与排序不再查询数据库，适合大名册交互筛选（需要 numpy）")
+    parser.add_argument("--shards", default=os.environ.get("RENSHI_SHARDS", "shards"), metavar="目录",
+                        help="按省份分库的目录（默认 shards，或环境变量 RENSHI_SHARDS）")
+    parser.add_argument("--branch", metavar="省份", help="分会模式：图形界面与子命令只读写该省份的分库（不存在时新建）")
+    subparsers = parser.add_subparsers(dest="command")
+
+    stats_parser = subparsers.add_parser("stats", help="输出人数统计")
+    stats_parser.add_argument("--by", choices=list(REPORT_DIMENSIONS), help="只输出指定维度")
+    stats_parser.add_argument("--rebuild", action="store_true", help="先全量重建统计汇总表")
+    stats_parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    stats_parser.set_defaults(func=cmd_stats)
+
+    export_parser = subparsers.add_parser("export", help="导出人员数据（xlsx、csv 或 jsonl）")
+    export_parser.add_argument("-o", "--output", help="输出文件路径，默认按分会命名的 xlsx；- 表示标准输出")
+    export_parser.add_argument("--format", choices=["xlsx", "csv", "jsonl"],
+                               help="导出格式，默认按输出文件扩展名判断；csv、jsonl 流式写出，适合大批量导出与系统间对接")
+    export_parser.add_argument("--province", default="全部", help="只导出指定省份")
+    export_parser.add_argument("--city", default="全部", help="只导出指定城市")
+    export_parser.add_argument("--delta", action="store_true", help="只导出上次增量导出后变更或删除的人员")
+    export_parser.add_argument("--since", help="增量导出的起始时间，覆盖已记录的水位")
+    export_parser.add_argument("--dry-run", action="store_true", help="增量导出后不推进水位")
+    export_parser.add_argument("--include-archived", action="store_true", help="同时导出已归档的人员（增量导出不受影响）")
+    export_parser.set_defaults(func=cmd_export)
+
+    stress_parser = subparsers.add_parser("stress", help="多进程并发写入压力测试（在临时副本上运行）")
+    stress_parser.add_argument("--workers", type=int, default=4, help="并发进程数")
+    stress_parser.add_argument("--duration", type=float, default=10, help="每个进程运行秒数")
+    stress_parser.add_argument("--db", help="以指定数据库的副本为起点，默认新建空库")
+    stress_parser.add_argument("--seed-rows", type=int, default=200, help="新建空库时预置的人员数")
+    stress_parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    stress_parser.set_defaults(func=cmd_stress)
+
+    from service import DEFAULT_HOST, DEFAULT_PORT
+    serve_parser = subparsers.add_parser("serve", help="以 HTTP/JSON 服务方式提供数据访问，由本进程统一写入数据库")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST, help="监听地址，默认仅本机")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    serve_parser.add_argument("--readers", type=int, default=4, help="并发读取线程数")
+    serve_parser.add_argument("--db", help="数据库文件路径，默认 hr_data.db")
+    serve_parser.set_defaults(func=cmd_serve)
+
+    from maintenance import TASKS
+    maintain_parser = subparsers.add_parser("maintain", help="数据库维护：检查点、整理空闲页、完整性检查、更新统计信息")
+    maintain_parser.add_argument("--tasks", nargs="+", choices=list(TASKS), help="只执行指定任务，默认全部")
+    maintain_parser.add_argument("--full-vacuum", action="store_true", help="完整整理并启用增量整理（重写整个文件，期间其他用户无法使用）")
+    maintain_parser.add_argument("--due", action="store_true", help="只执行到期的任务，适合由系统计划任务调用")
+    maintain_parser.add_argument("--db", help="数据库文件路径，默认 hr_data.db")
+    maintain_parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    maintain_parser.set_defaults(func=cmd_maintain)
+
+    health_parser = subparsers.add_parser("health", help="输出数据库健康报告")
+    health_parser.add_argument("--top", type=int, default=10, help="列出最慢的语句条数")
+    health_parser.add_argument("--db", help="数据库文件路径，默认 hr_data.db")
+    health_parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    health_parser.set_defaults(func=cmd_health)
+
+    journal_parser = subparsers.add_parser("journal", help="变更日志：基准快照、时间点恢复、导出变更集")
+    journal_parser.add_argument("action", choices=["snapshot", "list", "restore", "export"],
+                                help="snapshot 保存基准快照；list 列出快照；restore 恢复到指定时间；export 导出变更集")
+    journal_parser.add_argument("--as-of", help="恢复到的时间，如 \"2024-05-01 18:00\"")
+    journal_parser.add_argument("--since", help="导出变更的起始时间（不含）")
+    journal_parser.add_argument("--until", help="导出变更的截止时间（含）")
+    journal_parser.add_argument("-o", "--output", help="恢复得到的数据库文件，或导出的变更集 JSON 文件")
+    journal_parser.add_argument("--db", help="数据库文件路径，默认 hr_data.db")
+    journal_parser.set_defaults(func=cmd_journal)
+
+    shard_parser = subparsers.add_parser("shard", help="按省份分库：拆分单库、按省份导入、全国查询与导出")
+    shard_parser.add_argument("action", choices=["list", "split", "import", "query", "export"],
+                              help="list 列出分库；split 将单库拆分为分库；import 按省份导入表格；query 全国查询；export 全国导出")
+    shard_parser.add_argument("files", nargs="*", help="import 时要导入的 xlsx/csv 文件")
+    shard_parser.add_argument("--db", help="split 时拆分的单库文件，默认 hr_data.db")
+    shard_parser.add_argument("--province", help="只查询、导出该省份的分库")
+    shard_parser.add_argument("--city", help="只查询、导出该城市")
+    shard_parser.add_argument("--search", help="姓名/手机号关键字")
+    shard_parser.add_argument("--limit", type=int, help="query 最多输出的人数")
+    shard_parser.add_argument("--include-archived", action="store_true", help="query/export 同时包含已归档的人员")
+    shard_parser.add_argument("-o", "--output", help="export 输出文件（xlsx 或 csv）")
+    shard_parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    shard_parser.set_defaults(func=cmd_shard)
+
+    replicate_parser = subparsers.add_parser("replicate", help="离线复制：分会导出变更集，总部合并")
+    replicate_parser.add_argument("action", choices=["site", "export", "merge", "log"],
+                                  help="site 查看或设置本站；export 导出上次导出以来的变更集；merge 合并变更集；log 查看复制记录")
+    replicate_parser.add_argument("files", nargs="*", help="merge 时要合并的变更集文件（.rscs），可以有多个")
+    replicate_parser.add_argument("--name", help="site 时设置本站名称，如分会名")
+    replicate_parser.add_argument("--reset-site", action="store_true", help="site 时重新生成站点标识（复制数据库文件部署新分会后使用）")
+    replicate_parser.add_argument("--since", help="export 的起始时间，覆盖上次导出的水位")
+    replicate_parser.add_argument("-o", "--output", help="export 输出的变更集文件")
+    replicate_parser.add_argument("--force", action="store_true", help="merge 时重新合并已合并过的变更集")
+    replicate_parser.add_argument("--db", help="数据库文件路径，默认 hr_data.db")
+    replicate_parser.set_defaults(func=cmd_replicate)
+
+    archive_parser = subparsers.add_parser("archive", help="归档分区：离职或长期未修改的人员移入归档表，默认不参与查询与导出")
+    archive_parser.add_argument("action", choices=["policy", "run", "list", "archive", "restore"],
+                                help="policy 查看或设置归档策略；run 按策略归档；list 列出已归档人员；archive/restore 归档或恢复指定人员")
+    archive_parser.add_argument("ids", nargs="*", type=int, help="archive/restore 的人员 ID")
+    archive_parser.add_argument("--status", nargs="*", metavar="状态",
+                                help="policy 时设置按在职状态归档（如 离职），不带值表示不按状态归档")
+    archive_parser.add_argument("--inactive-days", type=int, metavar="天数", help="policy 时设置超过多少天未修改即归档，0 表示不按时间归档")
+    archive_parser.add_argument("--dry-run", action="store_true", help="run 时只统计符合策略的人数")
+    archive_parser.add_argument("--search", default="", help="list 时按姓名、手机号或拼音筛选")
+    archive_parser.add_argument("--limit", type=int, default=200, help="list 最多列出的人数")
+    archive_parser.add_argument("--db", help="数据库文件路径，默认 hr_data.db")
+    archive_parser.set_defaults(func=cmd_archive)
+
+    birthdays_parser = subparsers.add_parser("birthdays", help="列出近期过生日的人员（生日由身份证号推算）")
+    birthdays_parser.add_argument("--days", type=int, default=30, help="今天起多少天内，默认 30")
+    birthdays_parser.add_argument("--db", help="数据库文件路径，默认 hr_data.db")
+    birthdays_parser.set_defaults(func=cmd_birthdays)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile is not None:
+        from querylog import profiler
+        # 写入环境变量，压力测试等子进程同样开启
+        os.environ["RENSHI_PROFILE"] = str(args.profile)
+        profiler.enable(args.profile)
+    if args.branch:
+        import database
+        from shards import ShardSet, province_key
+        path = ShardSet(args.shards).path_for(args.branch, create=True)
+        # 写入环境变量，数据服务、压力测试等子进程使用同一分库；其他省份的人员不能保存到本分库
+        os.environ["RENSHI_DB"] = path
+        os.environ["RENSHI_BRANCH"] = province_key(args.branch)
+        database.set_db_path(path)
+        database.set_branch(province_key(args.branch))
+    if not args.command:
+        if args.server:
+            os.environ["RENSHI_SERVER"] = args.server
+        if args.snapshot:
+            os.environ["RENSHI_SNAPSHOT"] = "1"
+        if args.maintenance:
+            os.environ["RENSHI_MAINTENANCE"] = "1"
+        run_gui()
+        return 0
+    if args.command != "shard":
+        # 全国查询只读各分库，不需要默认的单库文件
+        from database import ensure_schema
+        ensure_schema()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import archive
+import cdc
+import database
+from querylog import query_log
+
+# 维护任务及说明，按此顺序执行：先按策略归档，再整理、检查，最后更新统计信息
+TASKS = {
+    'archive': '按策略归档人员',
+    'checkpoint': 'WAL 检查点',
+    'vacuum': '整理空闲页',
+    'integrity': '完整性检查',
+    'analyze': '更新统计信息（ANALYZE）',
+    'optimize': '查询优化（PRAGMA optimize）',
+    'snapshot': '基准快照（时间点恢复）',
+}
+
+# 定时维护的间隔（天）
+SCHEDULE = {'archive': 7, 'checkpoint': 1, 'optimize': 1, 'vacuum': 7, 'analyze': 7, 'snapshot': 7, 'integrity': 30}
+
+# 图形界面的定时维护执行的任务：基准快照是整库复制，库在共享目录时每台电脑各写一份，只由数据服务或 renshi maintain 执行
+CLIENT_TASKS = tuple(task for task in SCHEDULE if task != 'snapshot')
+
+# 定时维护领取任务后在维护记录中留下 ok 为 NULL 的执行中记录；进程中途退出时，超过此时长的记录不再阻止其他进程执行
+CLAIM_TIMEOUT = datetime.timedelta(hours=6)
+
+_AUTO_VACUUM_MODES = {0: '未启用', 1: '完全', 2: '增量'}
+
+
+def maintenance_schema():
+    return [
+        '''CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT,
+            started_at TEXT,
+            seconds REAL,
+            ok INTEGER,
+            result TEXT
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log(task, started_at)",
+    ]
+
+
+def _autocommit_connection():
+    # VACUUM 不能在事务中执行，增量整理与检查点也由 SQLite 自行加锁
+    conn = database.connect()
+    conn.isolation_level = None
+    return conn
+
+
+def _freelist(conn):
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def _checkpoint(full_vacuum):
+    conn = _autocommit_connection()
+    try:
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        if mode != 'wal':
+            return f"当前日志模式为 {mode}，无需检查点"
+        busy, log_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        if busy:
+            return f"检查点未完成：有其他连接正在读取，已写回 {checkpointed}/{log_pages} 页"
+        return f"已写回 {checkpointed} 页并截断 WAL 文件"
+    finally:
+        conn.close()
+
+
+def _vacuum(full_vacuum):
+    conn = _autocommit_connection()
+    try:
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        before = _freelist(conn)
+        if full_vacuum:
+            # 完整整理会重写整个文件，同时切换为增量模式，此后定时维护只需增量整理
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return f"完整整理完成，空闲页 {before} -> {_freelist(conn)}，已启用增量整理"
+        if mode != 2:
+            return f"数据库未启用增量整理，空闲页 {before}；请手动执行一次完整整理"
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+        return f"增量整理完成，空闲页 {before} -> {_freelist(conn)}"
+    finally:
+        conn.close()
+
+
+def _integrity(full_vacuum):
+    with database.connect() as conn:
+        rows = [row[0] for row in conn.execute("PRAGMA integrity_check(20)")]
+    if rows == ['ok']:
+        return "ok"
+    raise RuntimeError("完整性检查发现问题：" + "；".join(rows))
+
+
+def _analyze(full_vacuum):
+    with database.write_connection() as conn:
+        conn.execute("ANALYZE")
+    return "完成"
+
+
+def _optimize(full_vacuum):
+    with database.write_connection() as conn:
+        conn.execute("PRAGMA optimize")
+    return "完成"
+
+
+def _archive(full_vacuum):
+    message, error = archive.apply_archive_policy()
+    if error:
+        raise RuntimeError(error)
+    return message
+
+
+def _snapshot(full_vacuum):
+    message, error = cdc.take_snapshot()
+    if error:
+        raise RuntimeError(error)
+    return message
+
+
+_RUNNERS = {'archive': _archive, 'checkpoint': _checkpoint, 'vacuum': _vacuum, 'integrity': _integrity, 'analyze': _analyze,
+            'optimize': _optimize, 'snapshot': _snapshot}
+
+
+@database.retry_db_operation()
+def _run_task(task, full_vacuum):
+    return _RUNNERS[task](full_vacuum)
+
+
+@database.retry_db_operation()
+def _record(task, started_at, seconds, ok, result, claim_id=None):
+    with database.write_connection() as conn:
+        if claim_id is not None:
+            conn.execute("UPDATE maintenance_log SET seconds = ?, ok = ?, result = ? WHERE id = ?",
+                         (seconds, int(ok), result, claim_id))
+        else:
+            conn.execute("INSERT INTO maintenance_log (task, started_at, seconds, ok, result) VALUES (?, ?, ?, ?, ?)",
+                         (task, started_at, seconds, int(ok), result))
+
+
+def run_maintenance(tasks=None, full_vacuum=False):
+    """执行维护任务（默认全部），返回每项任务的结果；单项失败不影响其余任务"""
+    unknown = [task for task in tasks or [] if task not in TASKS]
+    if unknown:
+        raise ValueError(f"未知的维护任务：{', '.join(unknown)}")
+    return _run([task for task in TASKS if not tasks or task in tasks], full_vacuum)
+
+
+def _run(tasks, full_vacuum=False, claims=None):
+    # claims 为定时维护已登记的执行中记录（任务 -> (开始时间, 记录 id)），执行结果写回该记录
+    claims = claims or {}
+    results = []
+    for task in tasks:
+        started_at, claim_id = claims.get(task, (datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), None))
+        started = time.perf_counter()
+        try:
+            result, ok = _run_task(task, full_vacuum), True
+        except Exception as e:
+            result, ok = str(e), False
+            logging.error(f"数据库维护 {TASKS[task]} 失败：{result}")
+        seconds = time.perf_counter() - started
+        _record(task, started_at, seconds, ok, result, claim_id)
+        logging.info(f"数据库维护 {TASKS[task]}：{result}，耗时 {seconds:.2f} 秒")
+        results.append({'task': task, 'label': TASKS[task], 'ok': ok, 'seconds': seconds, 'result': result})
+    return results
+
+
+def last_runs():
+    with database.connect() as conn:
+        rows = conn.execute("SELECT task, started_at, seconds, ok, result FROM maintenance_log "
+                            "WHERE id IN (SELECT MAX(id) FROM maintenance_log WHERE ok IS NOT NULL GROUP BY task)").fetchall()
+    return {task: {'started_at': started_at, 'seconds': seconds, 'ok': bool(ok), 'result': result}
+            for task, started_at, seconds, ok, result in rows}
+
+
+def due_tasks(now=None, tasks=None):
+    """超过 SCHEDULE 间隔未成功执行过、也没有其他进程正在执行的任务；tasks 指定时只检查其中的任务"""
+    with database.connect() as conn:
+        return _due_tasks(conn, now or datetime.datetime.now(), tasks)
+
+
+def _due_tasks(conn, now, tasks):
+    done = dict(conn.execute("SELECT task, MAX(started_at) FROM maintenance_log WHERE ok = 1 GROUP BY task").fetchall())
+    running = {task for (task,) in conn.execute("SELECT DISTINCT task FROM maintenance_log WHERE ok IS NULL AND started_at >= ?",
+                                                ((now - CLAIM_TIMEOUT).strftime("%Y-%m-%d %H:%M:%S"),))}
+    due = []
+    for task, days in SCHEDULE.items():
+        if tasks is not None and task not in tasks or task in running:
+            continue
+        last = done.get(task)
+        if last is None or now - datetime.datetime.strptime(last, "%Y-%m-%d %H:%M:%S") >= datetime.timedelta(days=days):
+            due.append(task)
+    return due
+
+
+@database.retry_db_operation()
+def _claim_due_tasks(tasks=None):
+    """在同一个写事务中检查到期任务并登记为执行中，多个进程同时检查时只有一个领到任务；返回 {任务: (开始时间, 记录 id)}"""
+    now = datetime.datetime.now()
+    started_at = now.strftime("%Y-%m-%d %H:%M:%S")
+    claims = {}
+    with database.write_connection() as conn:
+        for task in _due_tasks(conn, now, tasks):
+            cursor = conn.execute("INSERT INTO maintenance_log (task, started_at, ok, result) VALUES (?, ?, NULL, '执行中')",
+                                  (task, started_at))
+            claims[task] = (started_at, cursor.lastrowid)
+    return claims
+
+
+def run_due_maintenance(tasks=None):
+    claims = _claim_due_tasks(tasks)
+    if not claims:
+        return []
+    logging.info(f"定时数据库维护：{', '.join(TASKS[task] for task in claims)}")
+    return _run([task for task in TASKS if task in claims], claims=claims)
+
+
+class MaintenanceScheduler:
+    """后台线程定期检查并执行到期的维护任务；到期任务在写事务中领取，多台电脑共用数据库时不会重复执行。
+    tasks 指定时只执行其中的任务，默认全部"""
+
+    def __init__(self, interval=3600, initial_delay=300, tasks=None):
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.tasks = tasks
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="db-maintenance", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        # 启动后先等待一段时间，不与登录、首次加载争用数据库
+        delay = self.initial_delay
+        while not self._stop.wait(delay):
+            try:
+                run_due_maintenance(self.tasks)
+            except Exception as e:
+                logging.warning(f"定时数据库维护失败：{str(e)}")
+            delay = self.interval
+
+
+def _object_pages(conn):
+    """按表、索引统计页数与碎片率；碎片率为按 B 树顺序遍历时页号不连续的比例"""
+    types = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'index')").fetchall())
+    objects = {}
+    last = {}
+    for name, pageno, pgsize, unused in conn.execute("SELECT name, pageno, pgsize, unused FROM dbstat ORDER BY name, path"):
+        item = objects.setdefault(name, {'name': name, 'type': types.get(name, 'table'), 'pages': 0, 'bytes': 0,
+                                         'unused_bytes': 0, 'jumps': 0})
+        item['pages'] += 1
+        item['bytes'] += pgsize
+        item['unused_bytes'] += unused
+        if name in last and pageno != last[name] + 1:
+            item['jumps'] += 1
+        last[name] = pageno
+    for item in objects.values():
+        item['fragmentation'] = item.pop('jumps') / (item['pages'] - 1) if item['pages'] > 1 else 0.0
+    return sorted(objects.values(), key=lambda item: item['pages'], reverse=True)
+
+
+def health_report(slow_queries=10):
+    """数据库健康报告：文件与页统计、各表和索引的页数、空闲页、碎片率、维护记录与最慢的语句"""
+    with database.connect() as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = _freelist(conn)
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        try:
+            objects = _object_pages(conn)
+        except sqlite3.OperationalError as e:
+            # SQLite 编译时未启用 dbstat 时无法按对象统计
+            logging.warning(f"无法读取 dbstat：{str(e)}")
+            objects = []
+    used = sum(item['pages'] for item in objects)
+    return {
+        'path': os.path.abspath(database.DB_PATH),
+        'file_size': os.path.getsize(database.DB_PATH),
+        'page_size': page_size,
+        'page_count': page_count,
+        'free_pages': freelist,
+        'free_ratio': freelist / page_count if page_count else 0.0,
+        'fragmentation': sum(item['fragmentation'] * item['pages'] for item in objects) / used if used else 0.0,
+        'auto_vacuum': _AUTO_VACUUM_MODES.get(auto_vacuum, str(auto_vacuum)),
+        'journal_mode': journal_mode,
+        'objects': objects,
+        'last_runs': last_runs(),
+        'due_tasks': due_tasks(),
+        'slow_queries': query_log.slowest(slow_queries),
+    }
+
+
+def _size(num_bytes):
+    for unit in ('B', 'KB', 'MB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+
+def format_report(report):
+    lines = [
+        f"数据库：{report['path']}",
+        f"文件大小：{_size(report['file_size'])}，页大小 {report['page_size']}，共 {report['page_count']} 页",
+        f"空闲页：{report['free_pages']}（{report['free_ratio']:.1%}），碎片率：{report['fragmentation']:.1%}",
+        f"自动整理：{report['auto_vacuum']}，日志模式：{report['journal_mode']}",
+        "",
+        "表与索引：",
+    ]
+    for item in report['objects']:
+        kind = "索引" if item['type'] == 'index' else "表"
+        lines.append(f"  {item['name']:<32}{kind:<4}{item['pages']:>8} 页{_size(item['bytes']):>12}"
+                     f"  未用 {_size(item['unused_bytes'])}  碎片 {item['fragmentation']:.0%}")
+    lines += ["", "维护记录："]
+    for task, label in TASKS.items():
+        run = report['last_runs'].get(task)
+        state = f"{run['started_at']}  {'成功' if run['ok'] else '失败'}  {run['result']}" if run else "从未执行"
+        lines.append(f"  {label:<20}{state}")
+    if report['due_tasks']:
+        lines.append("  到期未执行：" + "、".join(TASKS[task] for task in report['due_tasks']))
+    lines += ["", "本进程最慢的语句："]
+    for entry in report['slow_queries']:
+        lines.append(f"  {entry['seconds'] * 1000:>9.1f} 毫秒  {entry['time']}  {entry['sql'][:120]}")
+    if not report['slow_queries']:
+        lines.append("  （无记录）")
+    return "\n".join(lines)
@@ -0,0 +1,97 @@
+import json
+
+from birth import BIRTH_FIELDS, age_on
+
+PERSON_FIELDS = (
+    'id', 'real_name', 'gender', 'age', 'id_number', 'phone', 'province', 'city', 'county',
+    'nickname', 'education', 'political_status', 'occupation', 'position', 'status',
+    'join_date', 'donation_days', 'address', 'bio', 'photo_path'
+)
+
+# 新增/编辑表单提交的数据顺序（不含 id）
+FORM_FIELDS = PERSON_FIELDS[1:]
+
+# 导入时未识别的列以 JSON 形式保存在 extra 中
+EXTRA_FIELD = 'extra'
+
+# 由姓名、城市计算的拼音列，保存时写入，用于拼音检索与排序（见 pinyin 模块）
+PINYIN_FIELDS = ('name_pinyin', 'name_initials', 'city_pinyin')
+
+# 离线复制用的列：行的全局唯一标识，以及从其他站点合并来的变更的来源站点与来源时间（本站修改时为空，见 replication 模块）
+SYNC_FIELDS = ('uuid', 'origin', 'origin_at')
+
+# 归档人员的标记、归档时间与原因；只在含归档人员的查询中取值（见 archive 模块）
+ARCHIVE_FIELDS = ('archived', 'archived_at', 'archive_reason')
+
+# 各视图需要的列：列表视图不读取简历、住址等大字段；出生日期用于计算年龄
+LIST_FIELDS = ('id', 'real_name', 'gender', 'age', 'phone', 'province', 'city', 'position', 'status',
+               'name_pinyin', 'name_initials', 'birth_date')
+TALENT_LIST_FIELDS = ('id', 'real_name', 'phone', 'province', 'city', 'position', 'name_pinyin', 'name_initials')
+# 由身份证号推算的出生日期、生日（月-日）与性别，为只读的生成列（见 birth 模块）
+DETAIL_FIELDS = PERSON_FIELDS + (EXTRA_FIELD,) + BIRTH_FIELDS
+
+FIELD_LABELS = {
+    'real_name': '真实姓名', 'gender': '性别', 'age': '年龄', 'id_number': '身份证号',
+    'phone': '手机号', 'province': '省份', 'city': '城市', 'county': '县区', 'nickname': '昵称',
+    'education': '学历', 'political_status': '政治面貌', 'occupation': '个人职业',
+    'position': '分会职务', 'status': '在职状态', 'join_date': '加入组织时间',
+    'donation_days': '跟捐天数', 'address': '家庭住址', 'bio': '个人简历'
+}
+
+EXPORT_FIELDS = ('real_name', 'gender', 'age', 'id_number', 'phone', 'province', 'city', 'nickname',
+                 'education', 'political_status', 'occupation', 'position', 'status', 'join_date',
+                 'donation_days', 'address', 'bio')
+
+BASIC_DETAIL_FIELDS = ('real_name', 'gender', 'age', 'id_number', 'phone', 'position', 'status')
+EXTRA_DETAIL_FIELDS = ('province', 'city', 'nickname', 'education', 'political_status', 'occupation',
+                       'join_date', 'donation_days', 'address')
+
+
+class Person:
+    """人员记录，未查询的列为 None"""
+    __slots__ = DETAIL_FIELDS + PINYIN_FIELDS + ('in_talent_pool', 'talent_reason', 'talent_add_time') + ARCHIVE_FIELDS
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def __repr__(self):
+        return f"Person(id={self.id!r}, real_name={self.real_name!r})"
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def extra_attributes(self):
+        if not self.extra:
+            return {}
+        try:
+            return json.loads(self.extra)
+        except ValueError:
+            return {}
+
+    def form_values(self):
+        return [getattr(self, name) for name in FORM_FIELDS]
+
+
+_SLOTS = frozenset(Person.__slots__)
+
+
+def person_factory(cursor, row):
+    """sqlite3 行工厂：按列名把查询结果装配为 Person"""
+    person = Person.__new__(Person)
+    for name in Person.__slots__:
+        setattr(person, name, None)
+    for (name, *_), value in zip(cursor.description, row):
+        if name in _SLOTS:
+            setattr(person, name, value)
+    if person.birth_date:
+        # 年龄以身份证号推算的出生日期为准，手填的年龄只在出生日期未知时使用
+        person.age = age_on(person.birth_date)
+    return person
+
+
+def select_columns(fields, alias=None):
+    if alias:
+        return ", ".join(f"{alias}.{name}" for name in fields)
+    return ", ".join(fields)
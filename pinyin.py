@@ -0,0 +1,60 @@
+import logging
+import re
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    # 未安装 pypinyin 时拼音列保持为空，安装后下次启动自动回填
+    lazy_pinyin = None
+
+
+def available():
+    return lazy_pinyin is not None
+
+
+def to_pinyin(text):
+    """返回 (全拼, 首字母)，如 "张三" -> ("zhangsan", "zs")；无法计算时返回 (None, None)"""
+    if lazy_pinyin is None or text is None or not str(text).strip():
+        return None, None
+    syllables = []
+    for chunk in lazy_pinyin(str(text)):
+        # 非汉字部分整体返回，按空白拆成单词
+        syllables.extend(word.lower() for word in chunk.split())
+    if not syllables:
+        return None, None
+    return "".join(syllables), "".join(word[0] for word in syllables)
+
+
+def person_pinyin(real_name, city):
+    name_pinyin, name_initials = to_pinyin(real_name)
+    return name_pinyin, name_initials, to_pinyin(city)[0]
+
+
+def is_pinyin_query(text):
+    return bool(text) and re.fullmatch(r'[A-Za-z]+', text) is not None
+
+
+def backfill_pinyin(c):
+    """为拼音列为空的人员回填：相同的姓名、城市只计算一次，再以集合方式写回"""
+    if lazy_pinyin is None:
+        return 0
+    c.execute("SELECT DISTINCT real_name FROM personnel WHERE name_pinyin IS NULL AND real_name IS NOT NULL AND real_name != ''")
+    names = [row[0] for row in c.fetchall()]
+    c.execute("SELECT DISTINCT city FROM personnel WHERE city_pinyin IS NULL AND city IS NOT NULL AND city != ''")
+    cities = [row[0] for row in c.fetchall()]
+    if not names and not cities:
+        return 0
+    c.execute("CREATE TEMP TABLE IF NOT EXISTS pinyin_map (kind TEXT, value TEXT, full TEXT, initials TEXT, PRIMARY KEY (kind, value))")
+    c.execute("DELETE FROM temp.pinyin_map")
+    c.executemany("INSERT INTO temp.pinyin_map VALUES ('name', ?, ?, ?)", [(name, *to_pinyin(name)) for name in names])
+    c.executemany("INSERT INTO temp.pinyin_map VALUES ('city', ?, ?, ?)", [(city, *to_pinyin(city)) for city in cities])
+    c.execute("UPDATE personnel SET "
+              "name_pinyin = (SELECT full FROM temp.pinyin_map WHERE kind = 'name' AND value = personnel.real_name), "
+              "name_initials = (SELECT initials FROM temp.pinyin_map WHERE kind = 'name' AND value = personnel.real_name) "
+              "WHERE name_pinyin IS NULL AND real_name IN (SELECT value FROM temp.pinyin_map WHERE kind = 'name')")
+    updated = c.rowcount
+    c.execute("UPDATE personnel SET city_pinyin = (SELECT full FROM temp.pinyin_map WHERE kind = 'city' AND value = personnel.city) "
+              "WHERE city_pinyin IS NULL AND city IN (SELECT value FROM temp.pinyin_map WHERE kind = 'city')")
+    c.execute("DELETE FROM temp.pinyin_map")
+    logging.info(f"拼音回填完成：{len(names)} 个不同姓名，{len(cities)} 个不同城市，更新 {updated} 人")
+    return updated
@@ -0,0 +1,283 @@
+import atexit
+import cProfile
+import functools
+import heapq
+import itertools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# 性能分析模式下每执行多少条虚拟机指令计一次进度，用作语句开销的参考
+PROGRESS_STEP = 1000
+
+
+class QueryLog:
+    """记录本进程最近执行的 SQL 语句耗时，健康报告据此列出最慢的语句"""
+
+    def __init__(self, maxlen=500):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=maxlen)
+
+    def record(self, sql, seconds):
+        with self._lock:
+            self._recent.append((seconds, " ".join(sql.split()), time.strftime("%Y-%m-%d %H:%M:%S")))
+
+    def slowest(self, n=10):
+        with self._lock:
+            entries = list(self._recent)
+        return [{'seconds': seconds, 'sql': sql, 'time': at} for seconds, sql, at in heapq.nlargest(n, entries)]
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+
+
+query_log = QueryLog()
+
+
+def normalize_sql(sql):
+    # 合并空白，IN (?, ?, ...) 不论个数视为同一语句
+    return re.sub(r"\?(?:\s*,\s*\?)+", "?, …", " ".join(sql.split()))
+
+
+def params_shape(parameters):
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(sorted(parameters)) + "}"
+    types = [type(value).__name__ for value in parameters]
+    if len(types) > 6:
+        return f"{len(types)} 个参数"
+    return "(" + ", ".join(types) + ")"
+
+
+class QueryProfiler:
+    """性能分析模式（默认关闭）：按语句汇总次数、耗时、行数与虚拟机开销，
+    慢语句记录执行计划，进程退出时把排名报告写入 directory"""
+
+    def __init__(self):
+        self.enabled = False
+        self.threshold = 0.1
+        self.directory = "profile"
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._plans = {}
+
+    def enable(self, threshold_ms=100, directory="profile"):
+        if not self.enabled:
+            atexit.register(self.write_report)
+        self.enabled = True
+        self.threshold = threshold_ms / 1000
+        self.directory = directory
+        logging.info(f"性能分析已开启：慢语句阈值 {threshold_ms:g} 毫秒，报告目录 {os.path.abspath(directory)}")
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._plans.clear()
+
+    def record(self, conn, sql, parameters, seconds, steps, trace_events, rows):
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {'sql': key, 'count': 0, 'seconds': 0.0, 'max': 0.0, 'fetch_seconds': 0.0,
+                                            'rows': 0, 'steps': 0, 'trace_events': 0, 'shapes': set(), 'plan': None}
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            entry['rows'] += rows
+            entry['steps'] += steps
+            entry['trace_events'] += trace_events
+            if len(entry['shapes']) < 5:
+                entry['shapes'].add(params_shape(parameters) if parameters is not None else "executemany")
+            need_plan = seconds >= self.threshold and key not in self._plans
+        if need_plan and parameters is not None:
+            plan = self._explain(conn, sql, parameters)
+            with self._lock:
+                self._plans[key] = plan
+                entry['plan'] = plan
+            logging.warning(f"慢语句 {seconds * 1000:.1f} 毫秒：{key[:300]}\n执行计划：\n" + "\n".join(plan or ["（无）"]))
+        elif seconds >= self.threshold:
+            logging.warning(f"慢语句 {seconds * 1000:.1f} 毫秒：{key[:300]}")
+        return key
+
+    def _explain(self, conn, sql, parameters):
+        if not sql.lstrip().lower().startswith(('select', 'with', 'insert', 'update', 'delete', 'replace')):
+            return None
+        try:
+            # 用基类游标执行，EXPLAIN 本身不计入统计
+            rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            return [f"无法获取执行计划：{str(e)}"]
+        return [row[-1] for row in rows]
+
+    def add_rows(self, key, rows, seconds, steps):
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is not None:
+                entry['rows'] += rows
+                entry['fetch_seconds'] += seconds
+                entry['steps'] += steps
+
+    def report(self, limit=None):
+        """按总耗时（执行加读取）从高到低排列的语句统计"""
+        with self._lock:
+            entries = [dict(entry, shapes=sorted(entry['shapes'])) for entry in self._stats.values()]
+        entries.sort(key=lambda entry: entry['seconds'] + entry['fetch_seconds'], reverse=True)
+        return entries[:limit] if limit else entries
+
+    def format_report(self, limit=None):
+        entries = self.report(limit)
+        lines = [f"{'总耗时(ms)':>12}{'读取(ms)':>10}{'次数':>8}{'平均(ms)':>10}{'最大(ms)':>10}{'行数':>10}"
+                 f"{'VM×' + str(PROGRESS_STEP):>10}{'trace':>8}  语句"]
+        for entry in entries:
+            lines.append(f"{entry['seconds'] * 1000:>12.1f}{entry['fetch_seconds'] * 1000:>10.1f}{entry['count']:>8}"
+                         f"{entry['seconds'] * 1000 / entry['count']:>10.2f}{entry['max'] * 1000:>10.1f}{entry['rows']:>10}"
+                         f"{entry['steps']:>10}{entry['trace_events']:>8}  {entry['sql'][:200]}")
+            lines.append(f"{'':>12}参数：{' | '.join(entry['shapes'])}")
+            for step in entry['plan'] or []:
+                lines.append(f"{'':>12}计划：{step}")
+        return "\n".join(lines)
+
+    def write_report(self):
+        if not self._stats:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"queries-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.format_report())
+        logging.info(f"SQL 性能报告已写入 {path}")
+        return path
+
+
+profiler = QueryProfiler()
+
+if os.environ.get("RENSHI_PROFILE"):
+    profiler.enable(float(os.environ["RENSHI_PROFILE"]))
+
+
+class TimedCursor(sqlite3.Cursor):
+    # 只计 execute 本身的耗时：排序、聚合在取第一行前完成，逐行读取的时间不计入
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            query_log.record(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            query_log.record(sql, time.perf_counter() - started)
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """性能分析模式使用的游标：另外统计虚拟机开销、trace 事件数和读取的行数"""
+    _key = None
+
+    def _run(self, method, sql, parameters, record_parameters):
+        conn = self.connection
+        steps, events = conn.progress_steps, conn.trace_events
+        started = time.perf_counter()
+        try:
+            return method(self, sql, parameters)
+        finally:
+            seconds = time.perf_counter() - started
+            query_log.record(sql, seconds)
+            # SELECT 的 rowcount 为 -1，行数在读取时累计
+            self._key = profiler.record(conn, sql, record_parameters, seconds, conn.progress_steps - steps,
+                                        conn.trace_events - events, max(self.rowcount, 0))
+
+    def execute(self, sql, parameters=()):
+        return self._run(sqlite3.Cursor.execute, sql, parameters, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(sqlite3.Cursor.executemany, sql, seq_of_parameters, None)
+
+    def _fetch(self, method, *args):
+        # 读取时 SQLite 仍在逐行执行，耗时与虚拟机开销计入该语句
+        steps, started = self.connection.progress_steps, time.perf_counter()
+        result = method(self, *args)
+        if self._key is not None:
+            rows = (result is not None) if method is sqlite3.Cursor.fetchone else len(result)
+            profiler.add_rows(self._key, rows, time.perf_counter() - started, self.connection.progress_steps - steps)
+        return result
+
+    def fetchone(self):
+        return self._fetch(sqlite3.Cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(sqlite3.Cursor.fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(sqlite3.Cursor.fetchall)
+
+    def __next__(self):
+        steps, started = self.connection.progress_steps, time.perf_counter()
+        row = super().__next__()
+        if self._key is not None:
+            profiler.add_rows(self._key, 1, time.perf_counter() - started, self.connection.progress_steps - steps)
+        return row
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3.connect 的 factory：该连接上执行的语句都会记入 query_log；
+    性能分析模式下另外安装 trace 与 progress 回调"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.progress_steps = 0
+        self.trace_events = 0
+        self.profiling = profiler.enabled
+        if self.profiling:
+            self.set_trace_callback(self._trace)
+            self.set_progress_handler(self._progress, PROGRESS_STEP)
+
+    def _trace(self, statement):
+        # 语句本身、隐式 BEGIN 以及触发器中执行的每段程序各回调一次，
+        # 同一语句的事件数明显多于执行次数时说明触发了触发器
+        self.trace_events += 1
+
+    def _progress(self):
+        self.progress_steps += 1
+        return 0
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or (ProfilingCursor if self.profiling else TimedCursor))
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+_profile_ids = itertools.count(1)
+_profiling = threading.local()
+
+
+def profiled(name, func):
+    """性能分析模式下以 cProfile 运行 func，统计写入 profiler.directory；未开启时直接调用"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # 同一线程内已在分析时（处理函数互相调用）不再嵌套
+        if not profiler.enabled or getattr(_profiling, 'active', False):
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        _profiling.active = True
+        started = time.perf_counter()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            _profiling.active = False
+            os.makedirs(profiler.directory, exist_ok=True)
+            path = os.path.join(profiler.directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{next(_profile_ids)}.prof")
+            profile.dump_stats(path)
+            logging.info(f"{name} 耗时 {(time.perf_counter() - started) * 1000:.1f} 毫秒，调用统计已写入 {path}")
+    return wrapper
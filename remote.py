@@ -0,0 +1,161 @@
+import base64
+import json
+import logging
+import os
+import urllib.error
+import urllib.request
+
+import divisions
+from concurrency import DatabaseBusyError
+from models import LIST_FIELDS
+from service import DEFAULT_HOST, DEFAULT_PORT, encode, decode
+
+SERVER_URL = os.environ.get('RENSHI_SERVER') or f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+
+
+class RemoteError(Exception):
+    """服务不可用或服务端执行失败"""
+
+
+class RemoteClient:
+    """人事数据服务的 JSON 客户端，返回值与 database 模块中的同名函数一致"""
+
+    def __init__(self, base_url=SERVER_URL, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers={"Content-Type": "application/json; charset=utf-8"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                error = json.loads(e.read()).get('error', {})
+            except ValueError:
+                error = {}
+            message = error.get('message') or str(e)
+            if e.code == 503:
+                raise DatabaseBusyError(message) from None
+            raise RemoteError(message) from None
+        except urllib.error.URLError as e:
+            raise RemoteError(f"无法连接人事数据服务 {self.base_url}：{e.reason}") from None
+
+    def call(self, operation, *args, **kwargs):
+        payload = self._request(f"/api/{operation}", {'args': encode(list(args)), 'kwargs': encode(kwargs)})
+        return decode(payload['result'])
+
+    def health(self):
+        return self._request("/api/health")
+
+
+client = RemoteClient()
+
+
+def set_server(base_url):
+    global client
+    client = RemoteClient(base_url)
+    logging.info(f"使用人事数据服务：{client.base_url}")
+
+
+def load_admin_data():
+    # 行政区划随程序发布，客户端直接读取，不经过数据服务
+    return divisions.admin_data()
+
+def import_data(file_paths, refresh_callback):
+    files = []
+    for file_path in file_paths:
+        with open(file_path, 'rb') as f:
+            files.append({'name': os.path.basename(file_path), 'content': base64.b64encode(f.read()).decode('ascii')})
+    message, error = client.call('import_data', files)
+    if not error:
+        refresh_callback()
+    return message, error
+
+def export_data(export_type, province, city, admin_data, criteria=None, order_by=None, include_archived=False):
+    # 分会列表由服务端按需查询，不上传 admin_data
+    return tuple(client.call('export_data', export_type, province, city, None, criteria=criteria, order_by=order_by,
+                             include_archived=include_archived))
+
+def export_delta(province="全部", city="全部", since=None):
+    return tuple(client.call('export_delta', province, city, since))
+
+def get_export_watermark(province="全部", city="全部"):
+    return client.call('get_export_watermark', province, city)
+
+def record_export_watermark(province, city, watermark, changed_count, deleted_count):
+    return client.call('record_export_watermark', province, city, watermark, changed_count, deleted_count)
+
+def export_talent_pool():
+    return tuple(client.call('export_talent_pool'))
+
+def save_person(data, mode, person, from_talent=False, talent_reason=None):
+    return tuple(client.call('save_person', list(data), mode, person, from_talent, talent_reason))
+
+def save_and_add_to_talent_pool(data, reason):
+    return tuple(client.call('save_and_add_to_talent_pool', list(data), reason))
+
+def add_to_talent_pool(person_id, reason):
+    return tuple(client.call('add_to_talent_pool', person_id, reason))
+
+def delete_person(person_id):
+    return tuple(client.call('delete_person', person_id))
+
+def bulk_delete_persons(person_ids):
+    return tuple(client.call('bulk_delete_persons', list(person_ids)))
+
+def bulk_add_to_talent_pool(person_ids, reason):
+    return tuple(client.call('bulk_add_to_talent_pool', list(person_ids), reason))
+
+def bulk_update_persons(person_ids, status=None, position=None):
+    return tuple(client.call('bulk_update_persons', list(person_ids), status=status, position=position))
+
+def bulk_remove_from_talent_pool(person_ids):
+    return tuple(client.call('bulk_remove_from_talent_pool', list(person_ids)))
+
+def get_person_detail(person_id):
+    return client.call('get_person_detail', person_id)
+
+def prefetch_persons(person_ids):
+    # 服务端自带详情缓存，客户端不做预取
+    pass
+
+def list_personnel(province=None, city=None, search=None, fields=LIST_FIELDS):
+    return client.call('list_personnel', province, city, search, list(fields))
+
+def query_personnel(criteria=None, order_by=None, fields=LIST_FIELDS, limit=None, include_archived=False):
+    return client.call('query_personnel', criteria, order_by, list(fields), limit, include_archived)
+
+def list_talent_pool(search="", pinyin_order=False):
+    return client.call('list_talent_pool', search, pinyin_order)
+
+def list_birthdays(days=30):
+    return client.call('list_birthdays', days)
+
+def find_duplicates(max_block=50):
+    return client.call('find_duplicates', max_block)
+
+def merge_persons(keep_id, merge_ids):
+    return tuple(client.call('merge_persons', keep_id, list(merge_ids)))
+
+def get_headcount_overview():
+    overview = client.call('get_headcount_overview')
+    overview['total'] = tuple(overview['total'])
+    for dimension, rows in overview.items():
+        if dimension != 'total':
+            overview[dimension] = [tuple(row) for row in rows]
+    return overview
+
+def archive_persons(person_ids, reason="手动归档"):
+    return tuple(client.call('archive_persons', list(person_ids), reason))
+
+def restore_persons(person_ids):
+    return tuple(client.call('restore_persons', list(person_ids)))
+
+def health_report(slow_queries=10):
+    return client.call('health_report', slow_queries)
+
+def run_maintenance(tasks=None, full_vacuum=False):
+    return client.call('run_maintenance', tasks, full_vacuum)
@@ -0,0 +1,323 @@
+import datetime
+import json
+import logging
+import os
+import uuid
+import zlib
+
+import database
+from archive import restore_from_archive
+from cdc import _normalize_time
+from pinyin import backfill_pinyin
+
+# 变更集文件：文件头之后是 zlib 压缩的 JSON，列名只写一次，每行为按列排列的数组
+MAGIC = b"RENSHI-CHANGESET\n"
+FORMAT_VERSION = 1
+
+# 不随行复制的列：id 各站点自行分配；来源与修改时间由复制元数据单独传递
+_LOCAL_COLUMNS = ('id', 'origin', 'origin_at', 'updated_at')
+
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+# 冲突判定：来源时间较晚者为准，时间相同时站点标识较大者为准；本站修改的来源即本站
+_ROW_VERSION = "(COALESCE({t}.origin_at, {t}.updated_at), COALESCE({t}.origin, :site))"
+_TOMBSTONE_VERSION = "(COALESCE({t}.origin_at, {t}.deleted_at), COALESCE({t}.origin, :site))"
+
+
+def replication_schema():
+    return [
+        '''CREATE TABLE IF NOT EXISTS replication_site (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            site_id TEXT,
+            site_name TEXT,
+            created_at TEXT
+        )''',
+        f"INSERT OR IGNORE INTO replication_site (id, site_id, created_at) VALUES (1, lower(hex(randomblob(16))), {_NOW_SQL})",
+        '''CREATE TABLE IF NOT EXISTS replication_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            direction TEXT,
+            changeset_id TEXT,
+            site_id TEXT,
+            site_name TEXT,
+            watermark TEXT,
+            row_count INTEGER,
+            delete_count INTEGER,
+            applied_count INTEGER,
+            file_name TEXT,
+            logged_at TEXT
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_replication_log_changeset ON replication_log(changeset_id)",
+    ]
+
+
+def site_info():
+    with database.connect() as conn:
+        site_id, site_name = conn.execute("SELECT site_id, site_name FROM replication_site WHERE id = 1").fetchone()
+    return {'site_id': site_id, 'site_name': site_name}
+
+
+@database.retry_db_operation()
+def set_site(name=None, reset=False):
+    """设置本站名称；reset 时重新生成站点标识，复制数据库文件部署新的分会后必须执行一次"""
+    try:
+        with database.write_connection() as conn:
+            if name is not None:
+                conn.execute("UPDATE replication_site SET site_name = ? WHERE id = 1", (name,))
+            if reset:
+                conn.execute("UPDATE replication_site SET site_id = lower(hex(randomblob(16))) WHERE id = 1")
+                conn.execute("DELETE FROM replication_log WHERE direction = 'export'")
+        info = site_info()
+        return f"本站：{info['site_name'] or '未命名'}（{info['site_id']}）", None
+    except Exception as e:
+        database._raise_if_busy(e)
+        logging.error(f"设置站点失败：{str(e)}")
+        return None, f"设置站点失败：{str(e)}"
+
+
+def last_export_watermark():
+    with database.connect() as conn:
+        row = conn.execute("SELECT watermark FROM replication_log WHERE direction = 'export' ORDER BY id DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+
+def replication_log(limit=50):
+    with database.connect() as conn:
+        return conn.execute("SELECT direction, logged_at, site_name, site_id, row_count, delete_count, applied_count, "
+                            "watermark, file_name FROM replication_log ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+
+def _replicated_columns(conn):
+    return [row[1] for row in conn.execute("PRAGMA table_info(personnel)") if row[1] not in _LOCAL_COLUMNS]
+
+
+def read_change_set(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError("不是有效的变更集文件")
+    payload = json.loads(zlib.decompress(data[len(MAGIC):]).decode("utf-8"))
+    if payload.get('format') != FORMAT_VERSION:
+        raise ValueError(f"不支持的变更集格式版本：{payload.get('format')}")
+    return payload
+
+
+def export_changes(output=None, since=None):
+    """把自上次导出（或 since）以来本站新增、修改、删除的人员写成变更集文件，并推进导出水位
+
+    返回 (信息, 错误)；没有变更时不生成文件。
+    """
+    try:
+        since = _normalize_time(since) if since else (last_export_watermark() or "")
+        conn = database.connect()
+        try:
+            # 人员与删除记录在同一读事务中读取，水位之后提交的修改下次导出
+            conn.execute("BEGIN")
+            site_id, site_name = conn.execute("SELECT site_id, site_name FROM replication_site WHERE id = 1").fetchone()
+            columns = _replicated_columns(conn)
+            rows = conn.execute(
+                f"SELECT {', '.join('p.' + name for name in columns)}, "
+                "EXISTS (SELECT 1 FROM talent_pool t WHERE t.person_id = p.id), "
+                "(SELECT t.reason FROM talent_pool t WHERE t.person_id = p.id ORDER BY t.id LIMIT 1), "
+                "(SELECT t.add_time FROM talent_pool t WHERE t.person_id = p.id ORDER BY t.id LIMIT 1), "
+                "COALESCE(p.origin, ?), COALESCE(p.origin_at, p.updated_at) "
+                "FROM personnel p WHERE p.updated_at > ? ORDER BY p.updated_at", (site_id, since)).fetchall()
+            deletes = conn.execute(
+                "SELECT uuid, COALESCE(origin, ?), COALESCE(origin_at, deleted_at), real_name FROM personnel_deleted "
+                "WHERE deleted_at > ? AND uuid IS NOT NULL ORDER BY deleted_at", (site_id, since)).fetchall()
+            watermark = conn.execute(
+                "SELECT MAX(ts) FROM (SELECT MAX(updated_at) AS ts FROM personnel WHERE updated_at > ? "
+                "UNION ALL SELECT MAX(deleted_at) FROM personnel_deleted WHERE deleted_at > ?)", (since, since)).fetchone()[0]
+        finally:
+            conn.close()
+        if not rows and not deletes:
+            return f"自 {since or '开始'} 以来没有变更", None
+        created_at = datetime.datetime.now()
+        payload = {
+            'format': FORMAT_VERSION,
+            'changeset_id': uuid.uuid4().hex,
+            'site_id': site_id,
+            'site_name': site_name,
+            'since': since or None,
+            'until': watermark,
+            'created_at': created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            'columns': columns,
+            'rows': [list(row) for row in rows],
+            'deletes': [list(row) for row in deletes],
+        }
+        output = output or f"变更集-{site_name or site_id[:8]}-{created_at:%Y%m%d-%H%M%S}.rscs"
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        with open(output, "wb") as f:
+            f.write(MAGIC + zlib.compress(data, 9))
+        _log('export', payload, len(rows), len(deletes), None, output)
+        logging.info(f"导出变更集 {output}：{len(rows)} 人，删除 {len(deletes)} 人，水位 {watermark}")
+        return f"导出变更 {len(rows)} 人、删除 {len(deletes)} 人 -> {output}", None
+    except Exception as e:
+        logging.error(f"导出变更集失败：{str(e)}")
+        return None, f"导出变更集失败：{str(e)}"
+
+
+@database.retry_db_operation()
+def _log(direction, payload, row_count, delete_count, applied_count, file_name):
+    with database.write_connection() as conn:
+        _insert_log(conn, direction, payload, row_count, delete_count, applied_count, file_name)
+
+
+def _insert_log(conn, direction, payload, row_count, delete_count, applied_count, file_name):
+    conn.execute("INSERT INTO replication_log (direction, changeset_id, site_id, site_name, watermark, row_count, delete_count, "
+                 "applied_count, file_name, logged_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 (direction, payload['changeset_id'], payload['site_id'], payload['site_name'], payload['until'], row_count,
+                  delete_count, applied_count, os.path.basename(file_name), datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def _stage(c, payload):
+    """把变更集写入临时表 incoming、incoming_deleted；只保留本库也有的列"""
+    local_columns = {row[1] for row in c.execute("PRAGMA table_info(personnel)")}
+    sent = payload['columns']
+    columns = [name for name in sent if name in local_columns and name not in _LOCAL_COLUMNS]
+    if 'uuid' not in columns:
+        raise ValueError("变更集缺少行标识")
+    positions = [sent.index(name) for name in columns]
+    tail = len(sent)
+    c.execute("DROP TABLE IF EXISTS temp.incoming")
+    c.execute(f"CREATE TEMP TABLE incoming ({', '.join(columns)}, talent, talent_reason, talent_add_time, origin, origin_at)")
+    c.executemany(f"INSERT INTO temp.incoming VALUES ({', '.join('?' for _ in range(len(columns) + 5))})",
+                  [[row[i] for i in positions] + row[tail:tail + 5] for row in payload['rows']])
+    c.execute("CREATE UNIQUE INDEX temp.idx_incoming_uuid ON incoming(uuid)")
+    c.execute("DROP TABLE IF EXISTS temp.incoming_deleted")
+    c.execute("CREATE TEMP TABLE incoming_deleted (uuid TEXT PRIMARY KEY, origin, origin_at, real_name)")
+    c.executemany("INSERT OR REPLACE INTO temp.incoming_deleted VALUES (?, ?, ?, ?)", payload['deletes'])
+    return columns
+
+
+def _adopt(c, columns):
+    """首次同步：本库按表格导入的同一人员（身份证号或姓名+手机号相同）改用对方的行标识，不再重复新增"""
+    if not {'id_key', 'name_key', 'phone_key'} <= set(columns):
+        return 0
+    c.execute("DROP TABLE IF EXISTS temp.adopt")
+    # 对方行标识已在本库的不认领；只走唯一索引，重复合并时不扫描人员表
+    c.execute("""CREATE TEMP TABLE adopt AS
+        SELECT i.uuid AS uuid, p.id AS person_id FROM temp.incoming i JOIN personnel p ON p.id_key = i.id_key
+        WHERE i.id_key IS NOT NULL AND i.id_key != '' AND NOT EXISTS (SELECT 1 FROM personnel x WHERE x.uuid = i.uuid)
+        UNION
+        SELECT i.uuid, p.id FROM temp.incoming i JOIN personnel p ON p.name_key IS i.name_key AND p.phone_key = i.phone_key
+        WHERE i.phone_key IS NOT NULL AND i.phone_key != '' AND NOT EXISTS (SELECT 1 FROM personnel x WHERE x.uuid = i.uuid)""")
+    # 本库人员自身也在变更集中、对方行标识是本库已归档的人员，或一对多匹配时不认领
+    c.execute("DELETE FROM temp.adopt WHERE "
+              "EXISTS (SELECT 1 FROM personnel p JOIN temp.incoming i ON i.uuid = p.uuid WHERE p.id = adopt.person_id) "
+              "OR EXISTS (SELECT 1 FROM personnel_archive a WHERE a.uuid = adopt.uuid) "
+              "OR uuid IN (SELECT uuid FROM temp.adopt GROUP BY uuid HAVING COUNT(*) > 1) "
+              "OR person_id IN (SELECT person_id FROM temp.adopt GROUP BY person_id HAVING COUNT(*) > 1)")
+    # 显式设置修改时间与来源时间，保留本库这一行原有的版本，不触发修改时间触发器
+    c.execute(f"UPDATE personnel SET uuid = (SELECT a.uuid FROM temp.adopt a WHERE a.person_id = personnel.id), "
+              f"origin_at = COALESCE(origin_at, updated_at), updated_at = {_NOW_SQL} "
+              "WHERE id IN (SELECT person_id FROM temp.adopt)")
+    return c.rowcount
+
+
+def _merge(c, payload, site):
+    columns = _stage(c, payload)
+    adopted = _adopt(c, columns)
+    params = {'site': site}
+    # 本库已归档的人员收到较新的修改时先恢复，再按普通更新合并；归档不改变行的版本
+    restored = restore_from_archive(
+        c, f"uuid IN (SELECT i.uuid FROM temp.incoming i JOIN personnel_archive a ON a.uuid = i.uuid "
+           f"WHERE {_ROW_VERSION.format(t='a')} < (i.origin_at, i.origin))", params)
+    # 本库的行或删除记录版本不低于变更时，该变更已合并过或已被更新的修改取代
+    stale = c.execute(
+        f"DELETE FROM temp.incoming WHERE "
+        f"EXISTS (SELECT 1 FROM personnel p WHERE p.uuid = incoming.uuid "
+        f"AND {_ROW_VERSION.format(t='p')} >= (incoming.origin_at, incoming.origin)) "
+        f"OR EXISTS (SELECT 1 FROM personnel_deleted d WHERE d.uuid = incoming.uuid "
+        f"AND {_TOMBSTONE_VERSION.format(t='d')} >= (incoming.origin_at, incoming.origin)) "
+        f"OR EXISTS (SELECT 1 FROM personnel_archive a WHERE a.uuid = incoming.uuid)", params).rowcount
+    updated = c.execute("SELECT COUNT(*) FROM temp.incoming i WHERE EXISTS (SELECT 1 FROM personnel p WHERE p.uuid = i.uuid)").fetchone()[0]
+    inserted = c.execute("SELECT COUNT(*) FROM temp.incoming").fetchone()[0] - updated
+    names = ", ".join(columns)
+    assignments = ", ".join(f"{name} = excluded.{name}" for name in columns if name != 'uuid')
+    c.execute(f"INSERT INTO personnel ({names}, origin, origin_at) SELECT {names}, origin, origin_at FROM temp.incoming WHERE true "
+              f"ON CONFLICT(uuid) DO UPDATE SET {assignments}, origin = excluded.origin, origin_at = excluded.origin_at, "
+              f"updated_at = {_NOW_SQL}")
+    # 人才库状态随人员一起以变更方为准
+    c.execute("DROP TABLE IF EXISTS temp.incoming_talent")
+    c.execute("CREATE TEMP TABLE incoming_talent AS SELECT p.id AS person_id, i.talent, i.talent_reason, i.talent_add_time "
+              "FROM temp.incoming i JOIN personnel p ON p.uuid = i.uuid")
+    c.execute("DELETE FROM talent_pool WHERE person_id IN (SELECT person_id FROM temp.incoming_talent WHERE NOT talent)")
+    c.execute("UPDATE talent_pool SET reason = (SELECT i.talent_reason FROM temp.incoming_talent i WHERE i.person_id = talent_pool.person_id), "
+              "add_time = (SELECT i.talent_add_time FROM temp.incoming_talent i WHERE i.person_id = talent_pool.person_id) "
+              "WHERE person_id IN (SELECT person_id FROM temp.incoming_talent i WHERE talent "
+              "AND (i.talent_reason IS NOT talent_pool.reason OR i.talent_add_time IS NOT talent_pool.add_time))")
+    c.execute("INSERT INTO talent_pool (person_id, add_time, reason) SELECT person_id, talent_add_time, talent_reason "
+              "FROM temp.incoming_talent i WHERE talent AND NOT EXISTS (SELECT 1 FROM talent_pool t WHERE t.person_id = i.person_id)")
+    # 人才库触发器把这些人员记为本站修改，恢复为变更方的来源
+    c.execute("UPDATE personnel SET origin = (SELECT i.origin FROM temp.incoming i WHERE i.uuid = personnel.uuid), "
+              "origin_at = (SELECT i.origin_at FROM temp.incoming i WHERE i.uuid = personnel.uuid) "
+              "WHERE uuid IN (SELECT uuid FROM temp.incoming) AND origin_at IS NULL")
+
+    c.execute(
+        f"DELETE FROM temp.incoming_deleted WHERE "
+        f"EXISTS (SELECT 1 FROM personnel p WHERE p.uuid = incoming_deleted.uuid "
+        f"AND {_ROW_VERSION.format(t='p')} >= (incoming_deleted.origin_at, incoming_deleted.origin)) "
+        f"OR EXISTS (SELECT 1 FROM personnel_deleted d WHERE d.uuid = incoming_deleted.uuid "
+        f"AND {_TOMBSTONE_VERSION.format(t='d')} >= (incoming_deleted.origin_at, incoming_deleted.origin)) "
+        f"OR EXISTS (SELECT 1 FROM personnel_archive a WHERE a.uuid = incoming_deleted.uuid "
+        f"AND {_ROW_VERSION.format(t='a')} >= (incoming_deleted.origin_at, incoming_deleted.origin))", params)
+    mark = c.execute("SELECT COALESCE(MAX(rowid), 0) FROM personnel_deleted").fetchone()[0]
+    c.execute("DELETE FROM talent_pool WHERE person_id IN (SELECT p.id FROM personnel p JOIN temp.incoming_deleted i ON i.uuid = p.uuid)")
+    deleted = c.execute("DELETE FROM personnel WHERE uuid IN (SELECT uuid FROM temp.incoming_deleted)").rowcount
+    deleted += c.execute("DELETE FROM personnel_archive WHERE uuid IN (SELECT uuid FROM temp.incoming_deleted)").rowcount
+    # 删除记录沿用变更方的版本；本库没有的人员也记下删除，晚到的旧修改不会使其复活
+    c.execute("UPDATE personnel_deleted SET origin = (SELECT i.origin FROM temp.incoming_deleted i WHERE i.uuid = personnel_deleted.uuid), "
+              "origin_at = (SELECT i.origin_at FROM temp.incoming_deleted i WHERE i.uuid = personnel_deleted.uuid) "
+              "WHERE rowid > ? AND uuid IN (SELECT uuid FROM temp.incoming_deleted)", (mark,))
+    c.execute(f"INSERT INTO personnel_deleted (uuid, real_name, origin, origin_at, deleted_at) "
+              f"SELECT uuid, real_name, origin, origin_at, {_NOW_SQL} FROM temp.incoming_deleted i "
+              f"WHERE NOT EXISTS (SELECT 1 FROM personnel_deleted d WHERE d.uuid = i.uuid AND d.rowid > ?)", (mark,))
+    # 对方未安装 pypinyin 时拼音为空，在此补齐
+    backfill_pinyin(c)
+    for table in ("incoming", "incoming_deleted", "incoming_talent", "adopt"):
+        c.execute(f"DROP TABLE IF EXISTS temp.{table}")
+    return {'inserted': inserted, 'updated': updated, 'deleted': deleted, 'stale': stale, 'adopted': adopted,
+            'restored': restored}
+
+
+@database.retry_db_operation()
+def merge_changes(path, force=False):
+    """合并其他站点导出的变更集，返回 (信息, 错误)
+
+    冲突按 (来源时间, 站点标识) 较大者为准，与合并顺序无关；已合并过的变更集默认跳过，
+    force 时重新合并，结果也不会改变。
+    """
+    try:
+        payload = read_change_set(path)
+    except Exception as e:
+        logging.error(f"读取变更集 {path} 失败：{str(e)}")
+        return None, f"读取变更集失败：{str(e)}"
+    name = os.path.basename(path)
+    try:
+        started = datetime.datetime.now()
+        with database.write_connection() as conn:
+            c = conn.cursor()
+            site = c.execute("SELECT site_id FROM replication_site WHERE id = 1").fetchone()[0]
+            if payload['site_id'] == site:
+                return None, f"{name} 由本站导出，无需合并"
+            if not force and c.execute("SELECT 1 FROM replication_log WHERE direction = 'import' AND changeset_id = ?",
+                                       (payload['changeset_id'],)).fetchone():
+                return f"{name} 已合并过，跳过", None
+            result = _merge(c, payload, site)
+            _insert_log(conn, 'import', payload, len(payload['rows']), len(payload['deletes']),
+                        result['inserted'] + result['updated'] + result['deleted'], path)
+        database.person_cache.clear()
+        database.notify_person_changes()
+        seconds = (datetime.datetime.now() - started).total_seconds()
+        message = (f"{name}（{payload['site_name'] or payload['site_id'][:8]}）：新增 {result['inserted']} 人，"
+                   f"更新 {result['updated']} 人，删除 {result['deleted']} 人，跳过已有或较旧的变更 {result['stale']} 条")
+        if result['adopted']:
+            message += f"，与本库已有人员对应 {result['adopted']} 人"
+        if result['restored']:
+            message += f"，恢复已归档人员 {result['restored']} 人"
+        logging.info(f"合并变更集 {message}，耗时 {seconds:.2f} 秒")
+        return message, None
+    except Exception as e:
+        database._raise_if_busy(e)
+        logging.error(f"合并变更集 {name} 失败：{str(e)}")
+        return None, f"合并变更集失败：{str(e)}"
@@ -0,0 +1,210 @@
+import base64
+import json
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import archive
+import database
+import maintenance
+from concurrency import DatabaseBusyError, contention_stats
+from models import DETAIL_FIELDS, PINYIN_FIELDS, Person
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 对外开放的数据操作：读操作由读线程池并发执行，写操作由唯一的写线程串行执行
+READ_OPERATIONS = (
+    'load_admin_data', 'list_personnel', 'query_personnel', 'list_talent_pool', 'get_person_detail', 'find_duplicates',
+    'export_data', 'export_delta', 'get_export_watermark', 'export_talent_pool',
+    'get_headcount_overview', 'get_headcount_stats', 'health_report', 'list_archived', 'get_archive_policy',
+    'list_birthdays',
+)
+WRITE_OPERATIONS = (
+    'import_data', 'save_person', 'save_and_add_to_talent_pool', 'add_to_talent_pool', 'delete_person',
+    'bulk_delete_persons', 'bulk_add_to_talent_pool', 'bulk_update_persons', 'bulk_remove_from_talent_pool',
+    'merge_persons', 'record_export_watermark', 'rebuild_headcount_stats', 'run_maintenance',
+    'archive_persons', 'restore_persons', 'apply_archive_policy', 'set_archive_policy',
+)
+
+# 由 archive 模块提供的操作
+ARCHIVE_OPERATIONS = ('list_archived', 'get_archive_policy', 'archive_persons', 'restore_persons', 'apply_archive_policy',
+                      'set_archive_policy')
+
+
+def encode(value):
+    """将数据层返回值转为可 JSON 序列化的结构，Person 与 DataFrame 带类型标记"""
+    if isinstance(value, Person):
+        return {'__type__': 'person', 'fields': {name: getattr(value, name) for name in Person.__slots__}}
+    if hasattr(value, 'to_dict') and hasattr(value, 'columns'):
+        frame = value.astype(object).where(value.notna(), None)
+        return {'__type__': 'frame', 'columns': [str(col) for col in frame.columns], 'data': frame.values.tolist()}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): encode(item) for key, item in value.items()}
+    if hasattr(value, 'item'):
+        # numpy 标量
+        return value.item()
+    return value
+
+
+def decode(value):
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if isinstance(value, dict):
+        kind = value.get('__type__')
+        if kind == 'person':
+            return Person(**value['fields'])
+        if kind == 'frame':
+            import pandas as pd
+            return pd.DataFrame(value['data'], columns=value['columns'])
+        return {key: decode(item) for key, item in value.items()}
+    return value
+
+
+def _import_uploaded(files):
+    """导入客户端上传的文件：[{'name': 文件名, 'content': base64}]"""
+    upload_dir = tempfile.mkdtemp(prefix="renshi_import_")
+    try:
+        paths = []
+        for i, item in enumerate(files):
+            path = os.path.join(upload_dir, f"{i}_{os.path.basename(item['name'])}")
+            with open(path, 'wb') as f:
+                f.write(base64.b64decode(item['content']))
+            paths.append(path)
+        return database.import_data(paths, lambda: None)
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+
+def _check_fields(fields):
+    # 列名会拼入 SQL，只接受已知字段
+    unknown = [name for name in fields if name not in DETAIL_FIELDS + PINYIN_FIELDS]
+    if unknown:
+        raise ValueError(f"未知字段：{', '.join(map(str, unknown))}")
+    return tuple(fields)
+
+
+def _list_personnel(province=None, city=None, search=None, fields=database.LIST_FIELDS):
+    return database.list_personnel(province, city, search, _check_fields(fields))
+
+
+def _query_personnel(criteria=None, order_by=None, fields=database.LIST_FIELDS, limit=None, include_archived=False):
+    # 条件与排序字段由 filters 模块校验
+    return database.query_personnel(criteria, order_by, _check_fields(fields), limit, include_archived)
+
+
+def _resolve(operation):
+    if operation == 'import_data':
+        return _import_uploaded
+    if operation == 'list_personnel':
+        return _list_personnel
+    if operation == 'query_personnel':
+        return _query_personnel
+    if operation in ('health_report', 'run_maintenance'):
+        return getattr(maintenance, operation)
+    if operation in ARCHIVE_OPERATIONS:
+        return getattr(archive, operation)
+    return getattr(database, operation)
+
+
+class HRService(ThreadingHTTPServer):
+    """人事数据 HTTP 服务，所有写入都经由本进程的单个写线程"""
+    daemon_threads = True
+
+    def __init__(self, address, readers=4):
+        super().__init__(address, ServiceHandler)
+        self.read_executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="service-read")
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-write")
+
+    def execute(self, operation, args, kwargs):
+        executor = self.write_executor if operation in WRITE_OPERATIONS else self.read_executor
+        return executor.submit(_resolve(operation), *args, **kwargs).result()
+
+    def server_close(self):
+        super().server_close()
+        self.read_executor.shutdown(wait=True)
+        self.write_executor.shutdown(wait=True)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "renshi/1.0"
+
+    def log_message(self, format, *args):
+        logging.debug("服务请求：" + format % args)
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, kind, message):
+        self._reply(status, {'error': {'type': kind, 'message': message}})
+
+    def do_GET(self):
+        if self.path == '/api/health':
+            self._reply(200, {'status': 'ok', 'database': database.DB_PATH, 'contention': contention_stats.snapshot()})
+        elif self.path == '/api/operations':
+            self._reply(200, {'read': list(READ_OPERATIONS), 'write': list(WRITE_OPERATIONS)})
+        else:
+            self._error(404, 'NotFound', f"未知地址：{self.path}")
+
+    def do_POST(self):
+        if not self.path.startswith('/api/'):
+            self._error(404, 'NotFound', f"未知地址：{self.path}")
+            return
+        operation = self.path[len('/api/'):]
+        if operation not in READ_OPERATIONS and operation not in WRITE_OPERATIONS:
+            self._error(404, 'NotFound', f"不支持的操作：{operation}")
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            args = decode(request.get('args', []))
+            kwargs = decode(request.get('kwargs', {}))
+        except (ValueError, TypeError) as e:
+            self._error(400, 'BadRequest', f"请求格式错误：{str(e)}")
+            return
+        try:
+            result = self.server.execute(operation, args, kwargs)
+        except DatabaseBusyError as e:
+            self._error(503, 'DatabaseBusyError', str(e))
+            return
+        except (TypeError, ValueError) as e:
+            self._error(400, type(e).__name__, str(e))
+            return
+        except Exception as e:
+            logging.error(f"服务执行 {operation} 失败：{str(e)}")
+            self._error(500, type(e).__name__, str(e))
+            return
+        self._reply(200, {'result': encode(result)})
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, readers=4):
+    """创建服务但不启动，port 为 0 时由系统分配端口（供本地测试客户端使用）"""
+    return HRService((host, port), readers=readers)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, readers=4):
+    server = make_server(host, port, readers)
+    host, port = server.server_address[:2]
+    if host not in ('127.0.0.1', 'localhost', '::1'):
+        logging.warning(f"服务监听在 {host}，接口没有身份验证，请只在可信网络中使用")
+    logging.info(f"人事数据服务已启动：http://{host}:{port}，数据库 {database.DB_PATH}")
+    # 服务进程是唯一直接访问数据库的进程，定时维护也由它执行
+    scheduler = maintenance.MaintenanceScheduler().start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        server.server_close()
+        logging.info("人事数据服务已停止")
@@ -5,7 +5,7 @@ setup(
     version="0.1.0",                  
     author="Xiao Xin",                
     author_email="xiaoxin5200@example.com",
-    py_modules=["gui", "main", "utils", "database"],
+    py_modules=["gui", "main", "utils", "database", "models", "cache", "dedup", "stats", "concurrency", "stress", "service", "remote", "asyncdb", "filters", "typeahead", "pinyin", "querylog", "maintenance", "cdc", "shards", "replication", "archive", "snapshot", "birth", "divisions"],
     package_dir={"": "."},
     entry_points={
         "console_scripts": [
@@ -13,4 +13,6 @@ setup(
         ],
     },
     install_requires=[],     # 空列表，表示无外部依赖
+    extras_require={"pinyin": ["pypinyin"],  # 可选：姓名拼音检索与排序
+                    "snapshot": ["numpy"]},  # 可选：主列表列式快照（--snapshot）
 )
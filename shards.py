@@ -0,0 +1,309 @@
+import contextlib
+import datetime
+import logging
+import os
+import sqlite3
+
+import pandas as pd
+
+import database
+import divisions
+from birth import BIRTH_FIELDS, select_fields
+from filters import compile_filter, compile_order
+from models import LIST_FIELDS, EXPORT_FIELDS, FORM_FIELDS, person_factory, select_columns
+
+CATALOG_FILE = "catalog.db"
+
+# 第 n 个分库新增人员的 id 从 n * ID_BLOCK 起分配，各分库的 id 互不重复，全国视图中仍可按 id 定位；
+# 从单库拆分来的人员保留原 id（均小于 ID_BLOCK）
+ID_BLOCK = 10 ** 9
+
+UNKNOWN_PROVINCE = "未填写"
+
+_TALENT_COLUMNS = ('id', 'person_id', 'add_time', 'reason')
+
+def province_key(province):
+    # 与导入、保存时一样按行政区划规范，“广东省”与“广东”属于同一分库
+    key = divisions.resolve(str(province or ""), "")[0]
+    return key or UNKNOWN_PROVINCE
+
+
+def max_attached():
+    # SQLite 默认编译上限为 10，超过时全国查询分批执行；Connection.getlimit 自 Python 3.11 起才有，更早的版本按默认值
+    limit = getattr(sqlite3, "SQLITE_LIMIT_ATTACHED", None)
+    if limit is None or not hasattr(sqlite3.Connection, "getlimit"):
+        return 10
+    conn = sqlite3.connect(":memory:")
+    try:
+        return conn.getlimit(limit)
+    finally:
+        conn.close()
+
+
+def _sqlite_sort_key(value):
+    # 与 SQLite 默认排序一致：NULL < 数值 < 文本 < BLOB
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, value)
+
+
+def _sort_persons(rows, order_by):
+    terms = list(order_by or [])
+    if not any(field == 'id' for field, _ in terms):
+        terms.append(('id', 'asc'))
+    # 稳定排序：从最后一个排序字段开始逐个排序
+    for field, direction in reversed(terms):
+        rows.sort(key=lambda person: _sqlite_sort_key(getattr(person, field)), reverse=direction == 'desc')
+    return rows
+
+
+class ShardSet:
+    """按省份分库：directory 下每个省份分会一个 shard-<编号>.db，catalog.db 记录省份与分库的对应关系。
+
+    分会以 --branch 只打开本省的分库，读写的都是小文件、互不争用写锁，其他省份的人员不能在分会保存；
+    总部通过 ATTACH 各分库并建立 UNION ALL 临时视图 all_personnel、all_talent_pool 做全国查询与导出。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.catalog_path = os.path.join(directory, CATALOG_FILE)
+        with database.write_connection(self.catalog_path) as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS shard_catalog (
+                shard_no INTEGER PRIMARY KEY,
+                province TEXT UNIQUE,
+                file_name TEXT,
+                created_at TEXT
+            )''')
+
+    def shards(self, provinces=None):
+        """[(编号, 省份, 文件路径)]，按编号排列；provinces 不为空时只返回这些省份的分库"""
+        with database.connect(path=self.catalog_path) as conn:
+            rows = conn.execute("SELECT shard_no, province, file_name FROM shard_catalog ORDER BY shard_no").fetchall()
+        keys = {province_key(province) for province in provinces} if provinces else None
+        return [(shard_no, province, os.path.join(self.directory, file_name)) for shard_no, province, file_name in rows
+                if keys is None or province in keys]
+
+    def path_for(self, province, create=False):
+        key = province_key(province)
+        with database.connect(path=self.catalog_path) as conn:
+            row = conn.execute("SELECT file_name FROM shard_catalog WHERE province = ?", (key,)).fetchone()
+        if row:
+            return os.path.join(self.directory, row[0])
+        if not create:
+            return None
+        with database.write_connection(self.catalog_path) as conn:
+            row = conn.execute("SELECT shard_no, file_name FROM shard_catalog WHERE province = ?", (key,)).fetchone()
+            if row:
+                return os.path.join(self.directory, row[1])
+            shard_no = conn.execute("SELECT COALESCE(MAX(shard_no), 0) + 1 FROM shard_catalog").fetchone()[0]
+            file_name = f"shard-{shard_no:03d}.db"
+            path = os.path.join(self.directory, file_name)
+            # 在目录库的写事务内建好分库，其他进程查到目录记录时分库已可用
+            self._init_shard(path, shard_no)
+            conn.execute("INSERT INTO shard_catalog (shard_no, province, file_name, created_at) VALUES (?, ?, ?, ?)",
+                         (shard_no, key, file_name, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        logging.info(f"新建分库 {file_name}：{key}")
+        return path
+
+    def _init_shard(self, path, shard_no):
+        database.ensure_schema(path)
+        with database.write_connection(path) as conn:
+            floor = shard_no * ID_BLOCK
+            if conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'personnel'", (floor,)).rowcount == 0:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('personnel', ?)", (floor,))
+
+    def _batches(self, provinces=None):
+        shards = self.shards(provinces)
+        size = max_attached()
+        return [shards[i:i + size] for i in range(0, len(shards), size)]
+
+    @contextlib.contextmanager
+    def global_connection(self, shards, include_archived=False):
+        """以目录库为主库 ATTACH 给定的分库，并建立全国视图 all_personnel、all_talent_pool（带 shard_no 列）；
+        include_archived 时 all_personnel 同时包含各分库的归档人员，并带 archived 列"""
+        conn = database.connect(path=self.catalog_path)
+        try:
+            for shard_no, province, path in shards:
+                conn.execute(f"ATTACH DATABASE ? AS s{shard_no}", (path,))
+            # 各分库转为列的 extra 属性可能不同，视图只取共有的列
+            tables = ("personnel", "personnel_archive") if include_archived else ("personnel",)
+            columns = None
+            for shard_no, province, path in shards:
+                for table in tables:
+                    # 生成列中只取由身份证号推算的列，转为列的 extra 属性各库不同
+                    names = [info[1] for info in conn.execute(f"PRAGMA s{shard_no}.table_xinfo({table})")
+                             if not info[6] or info[1] in BIRTH_FIELDS]
+                    columns = names if columns is None else [name for name in columns if name in names]
+            if include_archived:
+                # 归档表独有的列（归档时间、人才库状态等）不进入视图
+                selects = [f"SELECT {shard_no} AS shard_no, {select_columns(columns)}, {archived} AS archived FROM s{shard_no}.{table}"
+                           for shard_no, province, path in shards for archived, table in enumerate(tables)]
+            else:
+                selects = [f"SELECT {shard_no} AS shard_no, {select_columns(columns)} FROM s{shard_no}.personnel"
+                           for shard_no, province, path in shards]
+            conn.execute("CREATE TEMP VIEW all_personnel AS " + " UNION ALL ".join(selects))
+            selects = [f"SELECT {shard_no} AS shard_no, {select_columns(_TALENT_COLUMNS)} FROM s{shard_no}.talent_pool"
+                       for shard_no, province, path in shards]
+            conn.execute("CREATE TEMP VIEW all_talent_pool AS " + " UNION ALL ".join(selects))
+            yield conn
+        finally:
+            conn.close()
+
+    def query_personnel(self, criteria=None, order_by=None, fields=LIST_FIELDS, limit=None, provinces=None, include_archived=False):
+        """全国查询，条件与排序同 database.query_personnel；provinces 指定时只 ATTACH 这些省份的分库，
+        include_archived 时含已归档人员"""
+        where, params = compile_filter(criteria)
+        sort_fields = [field for field in dict.fromkeys([field for field, _ in order_by or []] + ['id']) if field not in fields]
+        columns = select_columns(tuple(fields) + tuple(sort_fields)) + (", archived" if include_archived else "")
+        query = f"SELECT {columns} FROM all_personnel{where}{compile_order(order_by)}"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        batches = self._batches(provinces)
+        rows = []
+        for batch in batches:
+            with self.global_connection(batch, include_archived) as conn:
+                conn.row_factory = person_factory
+                rows.extend(conn.execute(query, params).fetchall())
+        if len(batches) > 1:
+            # 分批查询时各批分别排序、截取，合并后再按同一规则排序
+            rows = _sort_persons(rows, order_by)[:limit or None]
+        return rows
+
+    def export_data(self, criteria=None, order_by=None, provinces=None, include_archived=False):
+        """全国导出，返回 (数据, 默认文件名) 或 (None, 错误信息)；分库超过 ATTACH 上限时各批分别排序后依次拼接，
+        include_archived 时含已归档人员"""
+        where, params = compile_filter(criteria)
+        query = f"SELECT {select_fields(EXPORT_FIELDS)}, extra FROM all_personnel{where}{compile_order(order_by)}"
+        frames = []
+        for batch in self._batches(provinces):
+            with self.global_connection(batch, include_archived) as conn:
+                frames.append(pd.read_sql_query(query, conn, params=params))
+        df = pd.concat(frames, ignore_index=True) if frames else None
+        if df is None or len(df) == 0:
+            return None, "未查询到符合条件的数据！"
+        return database.export_frame(df), ("、".join(province_key(p) for p in provinces) if provinces else "全国") + "人员名单"
+
+    def overview(self):
+        """各分库的人数、人才库人数与文件大小"""
+        result = []
+        for batch in self._batches():
+            with self.global_connection(batch) as conn:
+                counts = dict(conn.execute("SELECT shard_no, COUNT(*) FROM all_personnel GROUP BY shard_no").fetchall())
+                talent_counts = dict(conn.execute("SELECT shard_no, COUNT(*) FROM all_talent_pool GROUP BY shard_no").fetchall())
+            for shard_no, province, path in batch:
+                result.append({'shard_no': shard_no, 'province': province, 'path': path, 'count': counts.get(shard_no, 0),
+                               'talent_count': talent_counts.get(shard_no, 0), 'file_size': os.path.getsize(path)})
+        return result
+
+    def shard_of(self, person_id):
+        """人员所在分库的路径，找不到时返回 None"""
+        shards = self.shards()
+        if person_id >= ID_BLOCK:
+            paths = {shard_no: path for shard_no, province, path in shards}
+            return paths.get(person_id // ID_BLOCK)
+        for batch in self._batches():
+            with self.global_connection(batch) as conn:
+                row = conn.execute("SELECT shard_no FROM all_personnel WHERE id = ?", (person_id,)).fetchone()
+            if row:
+                return next(path for shard_no, province, path in batch if shard_no == row[0])
+        return None
+
+    def import_data(self, file_paths):
+        """导入表格，人员按省份写入各自的分库（查重在分库内进行）"""
+        try:
+            batches = database.read_import_files(file_paths)
+        except Exception as e:
+            logging.error(f"导入数据失败：{str(e)}")
+            return None, f"导入失败：{str(e)}"
+        by_province = {}
+        for rows in batches:
+            for data in rows:
+                by_province.setdefault(province_key(data['province']), []).append(data)
+        messages = []
+        for province, rows in sorted(by_province.items()):
+            message, error = database.import_rows([rows], path=self.path_for(province, create=True))
+            if error:
+                done = "；此前的省份已导入：" + "；".join(messages) if messages else ""
+                return None, f"{province}：{error}{done}"
+            messages.append(f"{province}：{message}")
+        return "\n".join(messages), None
+
+    def save_person(self, data, mode, person, from_talent=False, talent_reason=None):
+        """按 data 中的省份写入对应分库；编辑时省份改变则迁入新省份的分库（人员 id 随之改变）
+
+        先写入新分库再删除旧记录，中途失败时至多留下一条重复记录，可用查重合并处理。
+        """
+        province = dict(zip(FORM_FIELDS, data))['province']
+        old_path = self.shard_of(person.id) if mode == "edit" and person else None
+        new_path = self.path_for(province, create=True)
+        if old_path is None or old_path == new_path:
+            return database.save_person(data, mode if old_path else "add", person, from_talent, talent_reason, path=new_path)
+        with database.connect(path=old_path) as conn:
+            talent = conn.execute("SELECT add_time, reason FROM talent_pool WHERE person_id = ?", (person.id,)).fetchone()
+        person_id, message, error = database.save_person(data, "add", None, path=new_path)
+        if error:
+            return None, None, error
+        if talent:
+            reason = (talent_reason or None) if from_talent and talent_reason is not None else talent[1]
+            with database.write_connection(new_path) as conn:
+                conn.execute("INSERT INTO talent_pool (person_id, add_time, reason) VALUES (?, ?, ?)", (person_id, talent[0], reason))
+        _, error = database.delete_person(person.id, path=old_path)
+        if error:
+            return person_id, None, f"已写入 {province_key(province)} 分库，但删除原分库记录失败：{error}"
+        logging.info(f"人员 {person.id} 迁入 {province_key(province)} 分库，新 id {person_id}")
+        return person_id, f"编辑信息完成，人员已迁入 {province_key(province)} 分库", None
+
+    def split(self, source_path):
+        """把单库中的人员、人才库与归档人员按省份拆分到各分库，保留原有 id；可重复执行，已拆分的人员不会重复写入"""
+        with database.connect(path=source_path) as conn:
+            conn.create_function("province_key", 1, province_key, deterministic=True)
+            has_archive = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='personnel_archive'").fetchone()
+            query = "SELECT province_key(province) FROM personnel"
+            if has_archive:
+                query += " UNION SELECT province_key(province) FROM personnel_archive"
+            keys = [row[0] for row in conn.execute(query)]
+        result = {}
+        for key in sorted(keys):
+            path = self.path_for(key, create=True)
+            conn = database.connect(path=path)
+            try:
+                # ATTACH 不能在事务中执行，先附加再开始写事务
+                conn.isolation_level = None
+                conn.create_function("province_key", 1, province_key, deterministic=True)
+                conn.execute("ATTACH DATABASE ? AS src", (source_path,))
+                src_columns = [info[1] for info in conn.execute("PRAGMA src.table_info(personnel)")]
+                columns = select_columns([info[1] for info in conn.execute("PRAGMA main.table_info(personnel)")
+                                          if info[1] in src_columns])
+                conn.execute("BEGIN IMMEDIATE")
+                copied = conn.execute(f"INSERT OR IGNORE INTO personnel ({columns}) SELECT {columns} FROM src.personnel "
+                                      "WHERE province_key(province) = ?", (key,)).rowcount
+                conn.execute("INSERT INTO talent_pool (person_id, add_time, reason) "
+                             "SELECT t.person_id, t.add_time, t.reason FROM src.talent_pool t JOIN personnel p ON p.id = t.person_id "
+                             "WHERE NOT EXISTS (SELECT 1 FROM talent_pool x WHERE x.person_id = t.person_id)")
+                archived = 0
+                if has_archive:
+                    # 归档人员的人才库状态存于归档表自身的列，整行复制即可
+                    src_columns = [info[1] for info in conn.execute("PRAGMA src.table_info(personnel_archive)")]
+                    archive_columns = select_columns([info[1] for info in conn.execute("PRAGMA main.table_info(personnel_archive)")
+                                                      if info[1] in src_columns])
+                    archived = conn.execute(f"INSERT OR IGNORE INTO personnel_archive ({archive_columns}) SELECT {archive_columns} "
+                                            "FROM src.personnel_archive WHERE province_key(province) = ?", (key,)).rowcount
+                conn.execute("INSERT INTO operation_log (operation_type, operation_target, operation_time) VALUES (?, ?, ?)",
+                             ("拆分分库", f"自 {os.path.basename(source_path)} 写入 {copied} 人，归档人员 {archived} 人",
+                              datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+            result[key] = copied + archived
+            logging.info(f"拆分分库：{key} 写入 {copied} 人，归档人员 {archived} 人")
+        return result
@@ -0,0 +1,421 @@
+import json
+import logging
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    # 未安装 numpy 时不使用列式快照，主列表照常按条件查询数据库
+    np = None
+
+import database
+from birth import select_fields
+from filters import OPERATORS, _coerce
+from models import LIST_FIELDS, Person
+
+# 主列表的列式快照：人员表的列表列读入内存，按列存为 numpy 数组，筛选与排序在内存中以向量运算完成，
+# 不再往返数据库。取值种类少的列存为分类编码（取值表 + 每行的编码），字符串运算只在取值表上做一次；
+# 各条件的筛选结果按条件缓存，增删条件时只计算新条件，其余为位运算。
+# 年龄按出生日期计算（见 birth 模块），读入时的取值当天有效。
+# 本进程的写入经 database.notify_person_changes 通知，只重读变更的人员；
+# 其他进程或电脑写入同一数据库时由 PRAGMA data_version 发现，按修改时间增量重读，人数对不上时整体重读。
+
+CATEGORY_FIELDS = ('gender', 'province', 'city', 'position', 'status', 'education', 'city_pinyin')
+TEXT_FIELDS = ('real_name', 'phone', 'name_pinyin', 'name_initials', 'birth_date')
+NUMBER_FIELDS = ('id', 'age')
+SNAPSHOT_FIELDS = NUMBER_FIELDS + TEXT_FIELDS + CATEGORY_FIELDS
+
+# 数值列不支持按文本匹配
+_TEXT_OPS = ('contains', 'startswith')
+
+
+def available():
+    return np is not None
+
+
+def _like(value, needle):
+    # 与 SQLite LIKE 一致：ASCII 字母不区分大小写
+    return needle.lower() in value.lower()
+
+
+def _matches(value, op, param):
+    """单个取值是否满足条件，语义与 filters 编译的 SQL 一致（NULL 不满足任何比较）"""
+    if op == 'empty':
+        return value is None or value == ''
+    if op == 'not_empty':
+        return value is not None and value != ''
+    if value is None:
+        return False
+    if op == 'eq':
+        return value == param
+    if op == 'ne':
+        return value != param
+    if op == 'lt':
+        return value < param
+    if op == 'le':
+        return value <= param
+    if op == 'gt':
+        return value > param
+    if op == 'ge':
+        return value >= param
+    if op == 'contains':
+        return _like(value, param)
+    if op == 'startswith':
+        return value.startswith(param)
+    if op == 'in':
+        return value in param
+    return param[0] <= value <= param[1]
+
+
+class _CategoryColumn:
+    """分类编码列：codes 为每行取值在 categories 中的下标，0 号取值固定为 None"""
+
+    def __init__(self, values):
+        self.categories = [None]
+        self.lookup = {None: 0}
+        self.codes = np.fromiter((self._code(value) for value in values), dtype=np.int32, count=len(values))
+
+    def _code(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.categories)
+            self.categories.append(value)
+        return code
+
+    def set(self, index, value):
+        self.codes[index] = self._code(value)
+
+    def append(self, values):
+        self.codes = np.concatenate([self.codes, np.array([self._code(v) for v in values], dtype=np.int32)])
+
+    def mask(self, op, param):
+        # 条件只在取值表上逐个判断，再按编码取出每行的结果
+        hits = np.fromiter((_matches(value, op, param) for value in self.categories), dtype=bool, count=len(self.categories))
+        return hits[self.codes]
+
+    def sort_key(self):
+        # NULL 排在最前，与 SQLite 升序一致
+        ranks = np.empty(len(self.categories), dtype=np.int64)
+        ranks[0] = -1
+        ranks[1:] = np.argsort(np.argsort(np.array(self.categories[1:], dtype=str), kind='stable'), kind='stable')
+        return ranks[self.codes]
+
+    def value(self, index):
+        return self.categories[self.codes[index]]
+
+
+class _TextColumn:
+    """取值各不相同的文本列：定长 unicode 数组，NULL 另记在 nulls 中"""
+
+    def __init__(self, values):
+        self.values = np.array([value or '' for value in values], dtype=str)
+        self.nulls = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+        self._lower = None
+
+    def set(self, index, value):
+        text = value or ''
+        if len(text) > self.values.dtype.itemsize // 4:
+            # 定长数组赋值会截断，先放宽长度
+            self.values = self.values.astype(f'<U{len(text)}')
+        self.values[index] = text
+        self.nulls[index] = value is None
+        self._lower = None
+
+    def append(self, values):
+        self.values = np.concatenate([self.values, np.array([value or '' for value in values], dtype=str)])
+        self.nulls = np.concatenate([self.nulls, np.array([value is None for value in values], dtype=bool)])
+        self._lower = None
+
+    def mask(self, op, param):
+        values, present = self.values, ~self.nulls
+        if op == 'empty':
+            return self.nulls | (values == '')
+        if op == 'not_empty':
+            return present & (values != '')
+        if op == 'contains':
+            if self._lower is None:
+                self._lower = np.char.lower(values)
+            return present & (np.char.find(self._lower, param.lower()) >= 0)
+        if op == 'startswith':
+            return present & np.char.startswith(values, param)
+        if op == 'in':
+            return present & np.isin(values, np.array(param, dtype=str))
+        if op == 'between':
+            return present & (values >= param[0]) & (values <= param[1])
+        compare = {'eq': np.equal, 'ne': np.not_equal, 'lt': np.less, 'le': np.less_equal,
+                   'gt': np.greater, 'ge': np.greater_equal}[op]
+        return present & compare(values, param)
+
+    def sort_key(self):
+        ranks = np.unique(self.values, return_inverse=True)[1].astype(np.int64)
+        ranks[self.nulls] = -1
+        return ranks
+
+    def value(self, index):
+        return None if self.nulls[index] else str(self.values[index])
+
+
+class _NumberColumn:
+    """整数列：以 float64 存储，NULL 与非数值记为 NaN"""
+
+    def __init__(self, values):
+        self.values = np.array([self._number(value) for value in values], dtype=np.float64)
+
+    @staticmethod
+    def _number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+
+    def set(self, index, value):
+        self.values[index] = self._number(value)
+
+    def append(self, values):
+        self.values = np.concatenate([self.values, np.array([self._number(v) for v in values], dtype=np.float64)])
+
+    def mask(self, op, param):
+        values = self.values
+        present = ~np.isnan(values)
+        if op == 'empty':
+            return ~present
+        if op == 'not_empty':
+            return present
+        if op == 'in':
+            return present & np.isin(values, np.array(param, dtype=np.float64))
+        if op == 'between':
+            return present & (values >= param[0]) & (values <= param[1])
+        compare = {'eq': np.equal, 'ne': np.not_equal, 'lt': np.less, 'le': np.less_equal,
+                   'gt': np.greater, 'ge': np.greater_equal}[op]
+        return present & compare(values, param)
+
+    def sort_key(self):
+        return np.where(np.isnan(self.values), -np.inf, self.values)
+
+    def value(self, index):
+        number = self.values[index]
+        return None if np.isnan(number) else int(number)
+
+
+_COLUMN_TYPES = dict([(name, _NumberColumn) for name in NUMBER_FIELDS] + [(name, _TextColumn) for name in TEXT_FIELDS]
+                     + [(name, _CategoryColumn) for name in CATEGORY_FIELDS])
+
+
+class SnapshotRows:
+    """快照查询结果：按需把行组装为 Person，界面分批显示时只组装显示的行"""
+
+    def __init__(self, snapshot, indices):
+        self.snapshot = snapshot
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.snapshot.person(index) for index in self.indices[item]]
+        return self.snapshot.person(self.indices[item])
+
+    def __iter__(self):
+        for index in self.indices:
+            yield self.snapshot.person(index)
+
+
+class RosterSnapshot:
+    """在册人员的列式快照，线程安全；load 之后即可查询"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.columns = {}
+        self.alive = None
+        self.positions = {}
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._conn = None
+        self._conn_path = None
+        self._data_version = None
+        self._watermark = None
+        self._pending = set()
+        self._reload = False
+        self._masks = {}
+        self._sort_keys = {}
+        database.add_change_listener(self._on_change)
+
+    def close(self):
+        database.remove_change_listener(self._on_change)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _on_change(self, person_ids):
+        # 在写入线程中调用，只记下变更，下次查询时再重读
+        with self._lock:
+            if person_ids is None:
+                self._reload = True
+            else:
+                self._pending.update(int(person_id) for person_id in person_ids)
+
+    def _connection(self):
+        # 切换数据库文件（如分会模式）后重新连接
+        path = self.path or database.DB_PATH
+        if self._conn is not None and self._conn_path != path:
+            self._conn.close()
+            self._conn = None
+        if self._conn is None:
+            self._conn = database.connect(check_same_thread=False, path=path)
+            self._conn_path = path
+        return self._conn
+
+    def load(self):
+        """整体读取人员表，返回自身"""
+        with self._lock:
+            started = time.time()
+            conn = self._connection()
+            rows = conn.execute(f"SELECT {select_fields(SNAPSHOT_FIELDS)} FROM personnel").fetchall()
+            values = list(zip(*rows)) if rows else [() for _ in SNAPSHOT_FIELDS]
+            self.columns = {name: _COLUMN_TYPES[name](list(column)) for name, column in zip(SNAPSHOT_FIELDS, values)}
+            self.alive = np.ones(len(rows), dtype=bool)
+            self.positions = {int(person_id): index for index, person_id in enumerate(values[0])}
+            self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            self._watermark = conn.execute("SELECT MAX(updated_at) FROM personnel").fetchone()[0]
+            self._pending.clear()
+            self._reload = False
+            self._changed()
+            self.loaded = True
+            logging.info(f"列式快照读取完成，人员 {len(rows)} 名，耗时：{time.time() - started:.2f}秒")
+            return self
+
+    def _changed(self):
+        self._masks.clear()
+        self._sort_keys.clear()
+
+    def _sync(self):
+        conn = self._connection()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        external = data_version != self._data_version
+        self._data_version = data_version
+        if self._reload:
+            self.load()
+            return
+        if not external and not self._pending:
+            return
+        person_ids = set(self._pending)
+        self._pending.clear()
+        if external:
+            # 其他连接提交过写入：修改时间不早于水位的人员一并重读
+            person_ids.update(row[0] for row in conn.execute("SELECT id FROM personnel WHERE updated_at >= ?",
+                                                             (self._watermark or '',)))
+        if person_ids:
+            self._refresh(conn, person_ids)
+        if external:
+            count = conn.execute("SELECT COUNT(*) FROM personnel").fetchone()[0]
+            if count != int(self.alive.sum()):
+                # 删除、恢复归档等不改修改时间的变更无法增量发现，整体重读
+                self.load()
+
+    def _refresh(self, conn, person_ids):
+        rows = conn.execute(f"SELECT {select_fields(SNAPSHOT_FIELDS)}, updated_at FROM personnel "
+                            "WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(sorted(person_ids)),)).fetchall()
+        found = set()
+        appended = []
+        for row in rows:
+            person_id = row[0]
+            found.add(person_id)
+            if row[-1] and (self._watermark is None or row[-1] > self._watermark):
+                self._watermark = row[-1]
+            index = self.positions.get(person_id)
+            if index is None:
+                appended.append(row)
+                continue
+            self.alive[index] = True
+            for name, value in zip(SNAPSHOT_FIELDS, row):
+                self.columns[name].set(index, value)
+        if appended:
+            start = len(self.alive)
+            for position, name in enumerate(SNAPSHOT_FIELDS):
+                self.columns[name].append([row[position] for row in appended])
+            self.alive = np.concatenate([self.alive, np.ones(len(appended), dtype=bool)])
+            for offset, row in enumerate(appended):
+                self.positions[row[0]] = start + offset
+        for person_id in person_ids - found:
+            index = self.positions.get(person_id)
+            if index is not None:
+                self.alive[index] = False
+        self._changed()
+
+    def supports(self, criteria, order_by):
+        """条件与排序只用到快照中的列时返回 True，否则应查询数据库"""
+        for field, _ in order_by or []:
+            if field not in SNAPSHOT_FIELDS:
+                return False
+        return self._supports(criteria)
+
+    def _supports(self, node):
+        if not node:
+            return True
+        if 'all' in node or 'any' in node:
+            return all(self._supports(item) for item in node.get('all', node.get('any')))
+        field, op = node.get('field'), node.get('op')
+        if field not in SNAPSHOT_FIELDS or op not in OPERATORS:
+            return False
+        return not (field in NUMBER_FIELDS and op in _TEXT_OPS)
+
+    def _mask(self, node):
+        """返回满足条件的行掩码；没有条件时返回 None"""
+        if 'all' in node or 'any' in node:
+            parts = [mask for mask in (self._mask(item) for item in node.get('all', node.get('any'))) if mask is not None]
+            if not parts:
+                return None
+            combine = np.logical_and if 'all' in node else np.logical_or
+            return combine.reduce(parts) if len(parts) > 1 else parts[0]
+        key = json.dumps(node, ensure_ascii=False, sort_keys=True)
+        mask = self._masks.get(key)
+        if mask is None:
+            if len(self._masks) >= 256:
+                self._masks.clear()
+            mask = self._masks[key] = self._condition_mask(node)
+        return mask
+
+    def _condition_mask(self, node):
+        field, op, value = node['field'], node['op'], node.get('value')
+        if op in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            param = _coerce(field, value)
+        elif op in _TEXT_OPS:
+            param = str(value)
+        elif op == 'in':
+            param = [_coerce(field, item) for item in value or []]
+        elif op == 'between':
+            low, high = value
+            param = (_coerce(field, low), _coerce(field, high))
+        else:
+            param = None
+        return self.columns[field].mask(op, param)
+
+    def _sort_key(self, field, direction):
+        key = self._sort_keys.get(field)
+        if key is None:
+            key = self._sort_keys[field] = self.columns[field].sort_key()
+        return -key if direction == 'desc' else key
+
+    def query(self, criteria=None, order_by=None):
+        """与 database.query_personnel 结果一致（在册人员、列表列），返回 SnapshotRows"""
+        with self._lock:
+            self._sync()
+            mask = self._mask(criteria) if criteria else None
+            indices = np.flatnonzero(self.alive if mask is None else mask & self.alive)
+            order_by = list(order_by or [])
+            if not any(field == 'id' for field, _ in order_by):
+                order_by.append(('id', 'asc'))
+            # lexsort 以最后一个键为主键
+            keys = [self._sort_key(field, direction)[indices] for field, direction in reversed(order_by)]
+            return SnapshotRows(self, indices[np.lexsort(keys)])
+
+    def person(self, index):
+        person = Person.__new__(Person)
+        for name in Person.__slots__:
+            setattr(person, name, None)
+        for name in LIST_FIELDS:
+            setattr(person, name, self.columns[name].value(index))
+        return person
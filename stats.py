@@ -0,0 +1,117 @@
+from birth import AGE_SQL
+
+STAT_DIMENSIONS = {
+    'province': '省份',
+    'city': '城市',
+    'status': '在职状态',
+    'education': '学历',
+    'political_status': '政治面貌',
+}
+
+UNFILLED = '未填写'
+
+# 年龄段随日期变化，不进汇总表：查询时按 AGE_SQL 算出年龄，一次扫描人员表分段计数
+AGE_BRACKETS = (('18岁以下', None, 17), ('18-29岁', 18, 29), ('30-39岁', 30, 39), ('40-49岁', 40, 49),
+                ('50-59岁', 50, 59), ('60岁及以上', 60, None))
+
+# 统计页与 stats 命令展示的维度：汇总表维度加上年龄段
+REPORT_DIMENSIONS = dict(STAT_DIMENSIONS, age='年龄段')
+
+
+def _key_expr(dimension, row):
+    value = f"COALESCE(NULLIF({row}.{dimension}, ''), '{UNFILLED}')"
+    if dimension == 'city':
+        # 不同省份可能有同名城市，按“省份/城市”分组
+        return f"COALESCE(NULLIF({row}.province, ''), '{UNFILLED}') || '/' || {value}"
+    return value
+
+
+def _upsert(dimension, key_expr, column, delta):
+    return (f"INSERT INTO headcount_summary (dimension, key, {column}) VALUES ('{dimension}', {key_expr}, {delta}) "
+            f"ON CONFLICT(dimension, key) DO UPDATE SET {column} = {column} + ({delta});")
+
+
+def _upsert_from_person(dimension, key_expr, column, delta, person_id):
+    return (f"INSERT INTO headcount_summary (dimension, key, {column}) "
+            f"SELECT '{dimension}', {key_expr}, {delta} FROM personnel p WHERE p.id = {person_id} "
+            f"ON CONFLICT(dimension, key) DO UPDATE SET {column} = {column} + ({delta});")
+
+
+def _in_pool(row):
+    return f"EXISTS (SELECT 1 FROM talent_pool WHERE person_id = {row}.id)"
+
+
+def summary_schema():
+    """汇总表及维护触发器的建表语句，增删改人员或人才库时按变化量增量更新"""
+    statements = ['''CREATE TABLE IF NOT EXISTS headcount_summary (
+        dimension TEXT NOT NULL,
+        key TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        talent_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, key)
+    )''']
+    dims = ['total'] + list(STAT_DIMENSIONS)
+
+    def key_for(dimension, row):
+        return "'全部'" if dimension == 'total' else _key_expr(dimension, row)
+
+    body = "\n".join(_upsert(d, key_for(d, 'NEW'), 'count', 1) for d in dims)
+    statements.append(f"CREATE TRIGGER IF NOT EXISTS trg_summary_personnel_insert AFTER INSERT ON personnel BEGIN\n{body}\nEND")
+
+    body = "\n".join(_upsert(d, key_for(d, 'OLD'), 'count', -1) for d in dims)
+    statements.append(f"CREATE TRIGGER IF NOT EXISTS trg_summary_personnel_delete AFTER DELETE ON personnel BEGIN\n{body}\nEND")
+    body = "\n".join(_upsert(d, key_for(d, 'OLD'), 'talent_count', -1) for d in dims)
+    statements.append(f"CREATE TRIGGER IF NOT EXISTS trg_summary_personnel_delete_talent AFTER DELETE ON personnel "
+                      f"WHEN {_in_pool('OLD')} BEGIN\n{body}\nEND")
+
+    for d in STAT_DIMENSIONS:
+        watched = "OLD.province IS NOT NEW.province OR OLD.city IS NOT NEW.city" if d == 'city' else f"OLD.{d} IS NOT NEW.{d}"
+        columns = "province, city" if d == 'city' else d
+        body = "\n".join([_upsert(d, key_for(d, 'OLD'), 'count', -1), _upsert(d, key_for(d, 'NEW'), 'count', 1)])
+        statements.append(f"CREATE TRIGGER IF NOT EXISTS trg_summary_personnel_update_{d} AFTER UPDATE OF {columns} ON personnel "
+                          f"WHEN {watched} BEGIN\n{body}\nEND")
+        body = "\n".join([_upsert(d, key_for(d, 'OLD'), 'talent_count', -1), _upsert(d, key_for(d, 'NEW'), 'talent_count', 1)])
+        statements.append(f"CREATE TRIGGER IF NOT EXISTS trg_summary_personnel_update_{d}_talent AFTER UPDATE OF {columns} ON personnel "
+                          f"WHEN ({watched}) AND {_in_pool('NEW')} BEGIN\n{body}\nEND")
+
+    # 人才库变动：人员已被删除时由 personnel 删除触发器负责扣减
+    for event, row, delta in (('INSERT', 'NEW', 1), ('DELETE', 'OLD', -1)):
+        body = "\n".join(_upsert_from_person(d, key_for(d, 'p'), 'talent_count', delta, f"{row}.person_id") for d in dims)
+        statements.append(f"CREATE TRIGGER IF NOT EXISTS trg_summary_talent_{event.lower()} AFTER {event} ON talent_pool BEGIN\n{body}\nEND")
+    # 合并重复人员时人才库记录会转移到保留人员名下
+    body = "\n".join([_upsert_from_person(d, key_for(d, 'p'), 'talent_count', -1, "OLD.person_id") for d in dims] +
+                     [_upsert_from_person(d, key_for(d, 'p'), 'talent_count', 1, "NEW.person_id") for d in dims])
+    statements.append(f"CREATE TRIGGER IF NOT EXISTS trg_summary_talent_update AFTER UPDATE OF person_id ON talent_pool "
+                      f"WHEN OLD.person_id IS NOT NEW.person_id BEGIN\n{body}\nEND")
+    return statements
+
+
+def rebuild_summary(c):
+    c.execute("DELETE FROM headcount_summary")
+    c.execute("INSERT INTO headcount_summary (dimension, key, count, talent_count) "
+              "SELECT 'total', '全部', COUNT(*), (SELECT COUNT(*) FROM talent_pool t JOIN personnel p ON p.id = t.person_id) FROM personnel")
+    for d in STAT_DIMENSIONS:
+        key = _key_expr(d, 'p')
+        c.execute(f"INSERT INTO headcount_summary (dimension, key, count, talent_count) "
+                  f"SELECT '{d}', {key}, COUNT(DISTINCT p.id), COUNT(t.person_id) FROM personnel p "
+                  f"LEFT JOIN talent_pool t ON t.person_id = p.id GROUP BY {key}")
+
+
+def headcount(c, dimension):
+    c.execute("SELECT key, count, talent_count FROM headcount_summary "
+              "WHERE dimension=? AND (count > 0 OR talent_count > 0) ORDER BY count DESC, key", (dimension,))
+    return c.fetchall()
+
+
+def age_brackets(c):
+    """各年龄段的 (年龄段, 人数, 人才库人数)，出生日期与年龄都未知（或年龄不是数值）的计入“未填写”"""
+    cases, params = [], []
+    for label, low, high in AGE_BRACKETS:
+        bounds = ([f"a >= {int(low)}"] if low is not None else []) + ([f"a <= {int(high)}"] if high is not None else [])
+        cases.append(f"WHEN {' AND '.join(bounds)} THEN ?")
+        params.append(label)
+    counts = {label: (count, talent_count) for label, count, talent_count in c.execute(
+        f"SELECT CASE WHEN a IS NULL THEN ? {' '.join(cases)} END AS bracket, COUNT(*), SUM(talent) FROM ("
+        f"SELECT {AGE_SQL} AS a, EXISTS (SELECT 1 FROM talent_pool t WHERE t.person_id = p.id) AS talent "
+        f"FROM personnel p) GROUP BY bracket", [UNFILLED] + params)}
+    return [(label, *counts.get(label, (0, 0))) for label, _, _ in AGE_BRACKETS + ((UNFILLED, None, None),)]
@@ -0,0 +1,168 @@
+import csv
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+OPERATIONS = ('save', 'edit', 'import', 'delete')
+_WEIGHTS = (5, 4, 1, 2)
+# 省份、城市须在行政区划中，否则保存时校验失败
+_DIVISIONS = (('广东', '广州'), ('浙江', '杭州'), ('江苏', '南京'), ('四川', '成都'), ('湖北', '武汉'))
+
+
+def _form_values(rng, tag):
+    from models import FORM_FIELDS
+    data = {name: '' for name in FORM_FIELDS}
+    province, city = rng.choice(_DIVISIONS)
+    data.update(real_name=f"压测{tag}", gender=rng.choice(('男', '女')), age=rng.randint(18, 70),
+                phone=f"139{rng.randint(0, 99999999):08d}", province=province, city=city,
+                position="会员", status=rng.choice(('在职', '离职')))
+    return [data[name] for name in FORM_FIELDS]
+
+
+def _write_import_file(path, rng, tag, rows=20):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['姓名', '手机号', '省份', '城市', '在职状态'])
+        for i in range(rows):
+            writer.writerow([f"导入{tag}_{i}", f"137{rng.randint(0, 99999999):08d}", *rng.choice(_DIVISIONS), "在职"])
+
+
+def _worker(db_path, worker_id, duration, seed):
+    """单个压测进程：在 duration 秒内随机执行新增、编辑、导入、删除"""
+    import database
+    from concurrency import DatabaseBusyError, contention_stats
+    logging.getLogger().setLevel(logging.ERROR)
+    database.set_db_path(db_path)
+    rng = random.Random(seed)
+    results = {op: {'ok': 0, 'error': 0, 'busy': 0, 'latencies': []} for op in OPERATIONS}
+    own_ids = []
+    import_path = os.path.join(os.path.dirname(db_path), f"import_{worker_id}.csv")
+    deadline = time.monotonic() + duration
+    n = 0
+    while time.monotonic() < deadline:
+        op = rng.choices(OPERATIONS, _WEIGHTS)[0]
+        if op in ('edit', 'delete') and not own_ids:
+            op = 'save'
+        n += 1
+        tag = f"{worker_id}_{n}"
+        started = time.perf_counter()
+        try:
+            if op == 'save':
+                person_id, _, error = database.save_person(_form_values(rng, tag), "add", None)
+                if person_id:
+                    own_ids.append(person_id)
+            elif op == 'edit':
+                person = database.get_person(rng.choice(own_ids))
+                _, _, error = database.save_person(_form_values(rng, tag), "edit", person)
+            elif op == 'import':
+                _write_import_file(import_path, rng, tag)
+                _, error = database.import_data([import_path], lambda: None)
+            else:
+                _, error = database.delete_person(own_ids.pop(rng.randrange(len(own_ids))))
+            results[op]['error' if error else 'ok'] += 1
+        except DatabaseBusyError:
+            results[op]['busy'] += 1
+        except Exception as e:
+            logging.error(f"压测操作 {op} 异常：{str(e)}")
+            results[op]['error'] += 1
+        results[op]['latencies'].append(time.perf_counter() - started)
+    return results, contention_stats.snapshot()
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _prepare_database(work_dir, source_db, seed_rows):
+    import database
+    db_path = os.path.join(work_dir, "stress.db")
+    if source_db:
+        # 在副本上压测，不改动真实数据
+        source = sqlite3.connect(source_db)
+        target = sqlite3.connect(db_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    previous = database.DB_PATH
+    database.set_db_path(db_path)
+    try:
+        database.ensure_schema()
+        rng = random.Random(0)
+        for i in range(seed_rows if not source_db else 0):
+            database.save_person(_form_values(rng, f"seed_{i}"), "add", None)
+    finally:
+        database.set_db_path(previous)
+    return db_path
+
+
+def _check_consistency(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        total = conn.execute("SELECT COUNT(*) FROM personnel").fetchone()[0]
+        row = conn.execute("SELECT count FROM headcount_summary WHERE dimension='total'").fetchone()
+        return integrity, total, row[0] if row else 0
+    finally:
+        conn.close()
+
+
+def run_stress(workers=4, duration=10.0, source_db=None, seed_rows=200):
+    """多进程并发写入压测，返回吞吐量、失败数、重试次数与锁等待统计"""
+    work_dir = tempfile.mkdtemp(prefix="renshi_stress_")
+    try:
+        db_path = _prepare_database(work_dir, source_db, seed_rows)
+        # spawn 与 Windows 下的行为一致，各进程独立打开数据库
+        ctx = multiprocessing.get_context("spawn")
+        started = time.perf_counter()
+        with ctx.Pool(workers) as pool:
+            outputs = pool.starmap(_worker, [(db_path, i, duration, 1000 + i) for i in range(workers)])
+        elapsed = time.perf_counter() - started
+        integrity, total, summary_total = _check_consistency(db_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {'workers': workers, 'duration': elapsed, 'operations': {},
+              'retries': 0, 'busy_failures': 0, 'lock_waits': 0, 'lock_wait_total': 0.0, 'lock_wait_max': 0.0,
+              'integrity': integrity, 'summary_consistent': total == summary_total}
+    for op in OPERATIONS:
+        latencies = [t for results, _ in outputs for t in results[op]['latencies']]
+        report['operations'][op] = {
+            'ok': sum(results[op]['ok'] for results, _ in outputs),
+            'error': sum(results[op]['error'] for results, _ in outputs),
+            'busy': sum(results[op]['busy'] for results, _ in outputs),
+            'p50': _percentile(latencies, 0.5),
+            'p95': _percentile(latencies, 0.95),
+            'max': max(latencies, default=0.0),
+        }
+    for _, snapshot in outputs:
+        report['retries'] += sum(snapshot['retries'].values())
+        report['busy_failures'] += sum(snapshot['failures'].values())
+        report['lock_waits'] += snapshot['lock_waits']
+        report['lock_wait_total'] += snapshot['lock_wait_total']
+        report['lock_wait_max'] = max(report['lock_wait_max'], snapshot['lock_wait_max'])
+    completed = sum(stats['ok'] for stats in report['operations'].values())
+    report['throughput'] = completed / elapsed if elapsed else 0.0
+    return report
+
+
+def format_report(report):
+    lines = [f"进程数 {report['workers']}，耗时 {report['duration']:.1f} 秒，成功 {report['throughput']:.1f} 次/秒"]
+    lines.append(f"{'操作':<8}{'成功':>8}{'失败':>8}{'繁忙':>8}{'P50(ms)':>10}{'P95(ms)':>10}{'最大(ms)':>10}")
+    for op, stats in report['operations'].items():
+        lines.append(f"{op:<10}{stats['ok']:>8}{stats['error']:>8}{stats['busy']:>8}"
+                     f"{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}")
+    average = report['lock_wait_total'] / report['lock_waits'] if report['lock_waits'] else 0.0
+    lines.append(f"退避重试 {report['retries']} 次，重试耗尽 {report['busy_failures']} 次")
+    lines.append(f"写锁等待 {report['lock_waits']} 次，平均 {average * 1000:.1f} ms，最长 {report['lock_wait_max'] * 1000:.1f} ms")
+    lines.append(f"完整性检查：{report['integrity']}，统计汇总{'一致' if report['summary_consistent'] else '不一致'}")
+    return "\n".join(lines)
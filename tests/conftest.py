@@ -0,0 +1,24 @@
+import pytest
+
+import database
+from models import FORM_FIELDS
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """每个用例使用临时目录中的新数据库；工作目录同时切到临时目录，分库、快照等文件写在其中"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, "BRANCH_PROVINCE", None)
+    previous = database.DB_PATH
+    database.set_db_path(str(tmp_path / "hr_data.db"))
+    database.ensure_schema()
+    yield database.DB_PATH
+    database.set_db_path(previous)
+
+
+@pytest.fixture
+def person_form():
+    """按字段名生成表单数据元组，未给出的字段为空"""
+    def make(**values):
+        return tuple(values.get(name, "") for name in FORM_FIELDS)
+    return make
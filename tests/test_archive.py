@@ -0,0 +1,26 @@
+import archive
+import database
+import maintenance
+
+
+def test_new_database_does_not_archive_by_default(db, person_form):
+    person_id, _, _ = database.save_person(person_form(real_name="张三", phone="13800000001", status="离职"), "add", None)
+
+    assert archive.describe_policy(archive.get_archive_policy()) == "不自动归档"
+    results = maintenance.run_maintenance(['archive'])
+
+    assert results[0]['ok']
+    assert [person.id for person in database.query_personnel()] == [person_id]
+    assert archive.archive_counts() == (1, 0)
+
+
+def test_archive_policy_applies_once_enabled(db, person_form):
+    database.save_person(person_form(real_name="张三", phone="13800000001", status="离职"), "add", None)
+    kept, _, _ = database.save_person(person_form(real_name="李四", phone="13800000002", status="在职"), "add", None)
+
+    archive.set_archive_policy(statuses=["离职"])
+    message, error = archive.apply_archive_policy()
+
+    assert error is None
+    assert [person.id for person in database.query_personnel()] == [kept]
+    assert archive.archive_counts() == (1, 1)
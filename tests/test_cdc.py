@@ -0,0 +1,56 @@
+import datetime
+import sqlite3
+import time
+
+import cdc
+import database
+
+
+def _persons(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT real_name, position FROM personnel").fetchall())
+    finally:
+        conn.close()
+
+
+def _talent(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT p.real_name, t.reason FROM talent_pool t JOIN personnel p ON p.id = t.person_id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_restore_to_mid_journal_time(db, tmp_path, person_form):
+    kept, _, _ = database.save_person(person_form(real_name="张三", phone="13800000001", position="会员"), "add", None)
+    removed, _, _ = database.save_person(person_form(real_name="李四", phone="13800000002"), "add", None)
+    message, error = cdc.take_snapshot()
+    assert error is None, error
+
+    time.sleep(0.01)
+    edited, _, _ = database.save_person(person_form(real_name="王五", phone="13800000003", position="理事"), "add", None)
+    person = database.get_person_detail(edited)
+    database.save_person(person_form(real_name="王五", phone="13800000003", position="常务理事"), "edit", person)
+    database.add_to_talent_pool(kept, "骨干")
+    time.sleep(0.01)
+    as_of = datetime.datetime.now()
+    time.sleep(0.01)
+    # as_of 之后的修改、新增与删除都不应出现在恢复结果中
+    database.save_person(person_form(real_name="王五", phone="13800000003", position="会长"), "edit", person)
+    database.save_person(person_form(real_name="赵六", phone="13800000004"), "add", None)
+    database.delete_person(removed)
+
+    target = str(tmp_path / "restored.db")
+    message, error = cdc.restore_to(as_of.isoformat(sep=" "), target)
+
+    assert error is None, error
+    assert _persons(target) == {"张三": "会员", "李四": "", "王五": "常务理事"}
+    assert _talent(target) == [("张三", "骨干")]
+    assert _persons(database.DB_PATH) == {"张三": "会员", "王五": "会长", "赵六": ""}
+
+
+def test_restore_before_first_snapshot_fails(db, tmp_path):
+    message, error = cdc.restore_to("2000-01-01", str(tmp_path / "restored.db"))
+
+    assert message is None and "没有早于该时间的基准快照" in error
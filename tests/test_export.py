@@ -0,0 +1,41 @@
+import json
+
+import pandas as pd
+
+import database
+
+
+def _add(person_form, name, phone, extra=None):
+    person_id, _, error = database.save_person(person_form(real_name=name, phone=phone, province="湖南", city="长沙"), "add", None)
+    assert error is None
+    if extra is not None:
+        with database.write_connection() as conn:
+            conn.execute("UPDATE personnel SET extra = ? WHERE id = ?", (json.dumps(extra, ensure_ascii=False), person_id))
+    return person_id
+
+
+def test_export_with_mixed_null_extra(db, person_form):
+    # 导入时表头未能匹配的列存入 extra，其余人员的 extra 为 NULL
+    _add(person_form, "张三", "13800000001", {"微信": "zhangsan"})
+    _add(person_form, "李四", "13800000002")
+
+    df, filename = database.export_data("all", "全部", "全部", None)
+
+    assert filename
+    assert list(df["真实姓名"]) == ["张三", "李四"]
+    assert df["微信"].iloc[0] == "zhangsan"
+    assert pd.isna(df["微信"].iloc[1])
+
+
+def test_export_delta_with_mixed_null_extra(db, person_form):
+    _add(person_form, "张三", "13800000001")
+    _add(person_form, "李四", "13800000002", {"微信": "lisi"})
+
+    changed, deleted, watermark, _ = database.export_delta()
+
+    assert watermark
+    assert len(deleted) == 0
+    assert set(changed["真实姓名"]) == {"张三", "李四"}
+    assert {"创建时间", "最后修改时间", "微信"} <= set(changed.columns)
+    wechat = dict(zip(changed["真实姓名"], changed["微信"]))
+    assert wechat["李四"] == "lisi" and pd.isna(wechat["张三"])
@@ -0,0 +1,40 @@
+import datetime
+
+import database
+import maintenance
+
+
+def test_client_schedule_skips_snapshot(db):
+    assert 'snapshot' in maintenance.due_tasks()
+    assert 'snapshot' not in maintenance.due_tasks(tasks=maintenance.CLIENT_TASKS)
+
+    results = maintenance.run_due_maintenance(maintenance.CLIENT_TASKS)
+
+    assert {result['task'] for result in results} == set(maintenance.CLIENT_TASKS)
+    assert maintenance.due_tasks() == ['snapshot']
+
+
+def test_due_tasks_are_claimed_once(db):
+    first = maintenance._claim_due_tasks(['vacuum', 'analyze'])
+    second = maintenance._claim_due_tasks(['vacuum', 'analyze'])
+
+    assert set(first) == {'vacuum', 'analyze'}
+    assert second == {}
+    assert maintenance.due_tasks(tasks=['vacuum']) == []
+
+
+def test_stale_claim_does_not_block(db):
+    maintenance._claim_due_tasks(['analyze'])
+    later = datetime.datetime.now() + maintenance.CLAIM_TIMEOUT + datetime.timedelta(minutes=1)
+
+    assert maintenance.due_tasks(now=later, tasks=['analyze']) == ['analyze']
+
+
+def test_claimed_run_records_result_in_place(db):
+    results = maintenance.run_due_maintenance(['analyze'])
+
+    assert [result['task'] for result in results] == ['analyze']
+    assert maintenance.last_runs()['analyze']['ok']
+    assert maintenance.run_due_maintenance(['analyze']) == []
+    with database.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM maintenance_log WHERE task = 'analyze'").fetchone()[0] == 1
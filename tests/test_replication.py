@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+import database
+import replication
+
+
+def _use(path):
+    database.set_db_path(str(path))
+
+
+def _site(path, name):
+    _use(path)
+    database.ensure_schema()
+    replication.set_site(name)
+    return path
+
+
+def _export(path, output):
+    _use(path)
+    message, error = replication.export_changes(str(output))
+    assert error is None, error
+    return output
+
+
+def _merge(path, *change_sets, force=False):
+    _use(path)
+    for change_set in change_sets:
+        message, error = replication.merge_changes(str(change_set), force=force)
+        assert error is None, error
+    return _state(path)
+
+
+def _state(path):
+    # 本站的 id、修改时间各站不同，只比较复制的内容与版本
+    _use(path)
+    with database.connect() as conn:
+        persons = conn.execute("SELECT p.uuid, p.real_name, p.position, COALESCE(p.origin_at, p.updated_at), "
+                               "(SELECT t.reason FROM talent_pool t WHERE t.person_id = p.id) "
+                               "FROM personnel p ORDER BY p.uuid").fetchall()
+        deleted = conn.execute("SELECT DISTINCT uuid FROM personnel_deleted ORDER BY uuid").fetchall()
+    return persons, deleted
+
+
+def _find(path, real_name):
+    _use(path)
+    with database.connect() as conn:
+        return conn.execute("SELECT id FROM personnel WHERE real_name = ?", (real_name,)).fetchone()[0]
+
+
+def _edit(path, real_name, person_form, **changes):
+    person = database.get_person_detail(_find(path, real_name))
+    values = dict(real_name=real_name, phone=person.phone, province=person.province, city=person.city, **changes)
+    _, _, error = database.save_person(person_form(**values), "edit", person)
+    assert error is None, error
+
+
+@pytest.fixture
+def sites(db, tmp_path, person_form):
+    """站点 A 新增三人并同步到 B，之后两站分别修改：A 与 B 先后修改同一人，A 新增一人，B 删除一人"""
+    a = _site(tmp_path / "a.db", "A")
+    b = _site(tmp_path / "b.db", "B")
+    _use(a)
+    for i, name in enumerate(("张三", "李四", "王五")):
+        database.save_person(person_form(real_name=name, phone=f"1380000000{i}", province="湖南", city="长沙"), "add", None)
+    database.add_to_talent_pool(_find(a, "李四"), "骨干")
+    base = _export(a, tmp_path / "a1.rscs")
+    _merge(b, base)
+
+    time.sleep(0.01)
+    _use(a)
+    _edit(a, "张三", person_form, position="A站职务")
+    database.save_person(person_form(real_name="赵六", phone="13800000009", province="湖南", city="长沙"), "add", None)
+    time.sleep(0.01)
+    _use(b)
+    _edit(b, "张三", person_form, position="B站职务")
+    database.delete_person(_find(b, "王五"))
+    a2 = _export(a, tmp_path / "a2.rscs")
+    b2 = _export(b, tmp_path / "b2.rscs")
+    return {'base': base, 'a2': a2, 'b2': b2}
+
+
+def test_merge_order_does_not_matter(sites, tmp_path):
+    forward = _merge(_site(tmp_path / "c.db", "C"), sites['base'], sites['a2'], sites['b2'])
+    backward = _merge(_site(tmp_path / "d.db", "D"), sites['b2'], sites['a2'], sites['base'])
+
+    assert forward == backward
+    persons = {name: (position, reason) for _, name, position, _, reason in forward[0]}
+    # B 站的修改较晚，以 B 为准；B 删除的人员不因较早的新增记录复活
+    assert persons == {"张三": ("B站职务", None), "李四": ("", "骨干"), "赵六": ("", None)}
+    assert len(forward[1]) == 1
+
+
+def test_sites_converge_after_exchanging_changes(sites, tmp_path):
+    a = _merge(tmp_path / "a.db", sites['b2'])
+    b = _merge(tmp_path / "b.db", sites['a2'])
+
+    assert a == b
+
+
+def test_remerge_is_a_no_op(sites, tmp_path):
+    c = _site(tmp_path / "c.db", "C")
+    merged = _merge(c, sites['base'], sites['a2'], sites['b2'])
+
+    _use(c)
+    message, error = replication.merge_changes(str(sites['a2']))
+    assert error is None and "已合并过" in message
+    again = _merge(c, sites['base'], sites['a2'], sites['b2'], force=True)
+
+    assert again == merged
+    _use(c)
+    with database.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM personnel_deleted").fetchone()[0] == 1
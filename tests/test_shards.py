@@ -0,0 +1,85 @@
+import pytest
+
+import database
+import shards
+
+
+@pytest.fixture
+def shard_set(db, tmp_path):
+    return shards.ShardSet(str(tmp_path / "shards"))
+
+
+def _shard_no(shard_set, province):
+    return next(shard_no for shard_no, name, path in shard_set.shards() if name == province)
+
+
+def _talent_reason(path, person_id):
+    with database.connect(path=path) as conn:
+        row = conn.execute("SELECT reason FROM talent_pool WHERE person_id = ?", (person_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _add(shard_set, person_form, province, reason=None):
+    person_id, _, error = shard_set.save_person(person_form(real_name="张三", phone="13800000001", province=province), "add", None)
+    assert error is None, error
+    if reason is not None:
+        with database.write_connection(shard_set.path_for(province)) as conn:
+            conn.execute("INSERT INTO talent_pool (person_id, add_time, reason) VALUES (?, '2024-01-01 00:00:00', ?)",
+                         (person_id, reason))
+    return shard_set.query_personnel(None, None)[0]
+
+
+def test_new_person_gets_id_in_shard_block(shard_set, person_form):
+    hunan = _add(shard_set, person_form, "湖南省")
+    person_id, _, _ = shard_set.save_person(person_form(real_name="李四", phone="13800000002", province="广东"), "add", None)
+
+    assert hunan.id == _shard_no(shard_set, "湖南") * shards.ID_BLOCK + 1
+    assert person_id == _shard_no(shard_set, "广东") * shards.ID_BLOCK + 1
+    assert shard_set.shard_of(person_id) == shard_set.path_for("广东")
+
+
+def test_province_change_moves_person_and_talent_membership(shard_set, person_form):
+    person = _add(shard_set, person_form, "湖南", reason="骨干")
+    old_path = shard_set.path_for("湖南")
+
+    new_id, message, error = shard_set.save_person(
+        person_form(real_name="张三", phone="13800000001", province="广东"), "edit", person, True, None)
+
+    assert error is None, error
+    assert new_id // shards.ID_BLOCK == _shard_no(shard_set, "广东")
+    assert shard_set.shard_of(new_id) == shard_set.path_for("广东")
+    assert _talent_reason(shard_set.path_for("广东"), new_id) == "骨干"
+    with database.connect(path=old_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM personnel").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM talent_pool").fetchone()[0] == 0
+    assert [p.province for p in shard_set.query_personnel(None, None)] == ["广东"]
+
+
+def test_province_change_applies_edited_talent_reason(shard_set, person_form):
+    person = _add(shard_set, person_form, "湖南", reason="骨干")
+
+    new_id, _, error = shard_set.save_person(
+        person_form(real_name="张三", phone="13800000001", province="广东"), "edit", person, True, "")
+
+    assert error is None, error
+    with database.connect(path=shard_set.path_for("广东")) as conn:
+        assert conn.execute("SELECT reason FROM talent_pool WHERE person_id = ?", (new_id,)).fetchall() == [(None,)]
+
+
+def test_edit_within_province_keeps_id(shard_set, person_form):
+    person = _add(shard_set, person_form, "湖南")
+
+    person_id, _, error = shard_set.save_person(
+        person_form(real_name="张三", phone="13800000001", province="湖南", position="会长"), "edit", person)
+
+    assert error is None and person_id == person.id
+    assert shard_set.query_personnel(None, None)[0].position == "会长"
+
+
+def test_split_keeps_ids_and_is_repeatable(shard_set, person_form):
+    for i, province in enumerate(("湖南", "广东", "湖南省")):
+        database.save_person(person_form(real_name=f"人员{i}", phone=f"1380000000{i}", province=province), "add", None)
+
+    assert shard_set.split(database.DB_PATH) == {"广东": 1, "湖南": 2}
+    assert shard_set.split(database.DB_PATH) == {"广东": 0, "湖南": 0}
+    assert sorted(p.id for p in shard_set.query_personnel(None, None)) == [1, 2, 3]
@@ -0,0 +1,37 @@
+import datetime
+
+import database
+from birth import age_range
+from stats import AGE_BRACKETS, UNFILLED, age_brackets
+
+
+def _id_number(birth):
+    # 校验位按 GB 11643 计算，身份证号才会被识别并推算出生日期
+    body = f"430102{birth:%Y%m%d}123"
+    total = sum(int(d) * w for d, w in zip(body, (7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2)))
+    return body + "10X98765432"[total % 11]
+
+
+def test_age_brackets_match_per_bracket_ranges(db, person_form):
+    today = datetime.date.today()
+    people = [
+        dict(id_number=_id_number(today.replace(year=today.year - 30))),
+        dict(id_number=_id_number(today.replace(year=today.year - 65))),
+        dict(age=17), dict(age=45), dict(age=""), dict(),
+    ]
+    for i, values in enumerate(people):
+        person_id, _, error = database.save_person(person_form(real_name=f"人员{i}", phone=f"1380000000{i}", **values), "add", None)
+        assert error is None
+        if i % 2 == 0:
+            database.add_to_talent_pool(person_id, "骨干")
+
+    with database.connect() as conn:
+        result = age_brackets(conn.cursor())
+        # 与按出生日期范围逐段计数的结果一致
+        for label, low, high in AGE_BRACKETS:
+            params = []
+            expected = conn.execute(f"SELECT COUNT(*) FROM personnel WHERE {age_range(low, high, params)}", params).fetchone()[0]
+            assert dict((name, count) for name, count, _ in result)[label] == expected
+
+    assert result == [("18岁以下", 1, 1), ("18-29岁", 0, 0), ("30-39岁", 1, 1), ("40-49岁", 1, 0),
+                      ("50-59岁", 0, 0), ("60岁及以上", 1, 0), (UNFILLED, 2, 1)]
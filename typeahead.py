@@ -0,0 +1,141 @@
+import logging
+import time
+
+from pinyin import is_pinyin_query
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# 所有输入框共用一个查询线程，新查询开始前取消尚未执行的旧查询
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-search")
+
+
+def search_text(person):
+    # 与 SQL 关键字条件的匹配范围一致：姓名、手机号包含，姓名全拼、首字母前缀
+    return (f"{person.real_name or ''}\x00{person.phone or ''}".lower(),
+            person.name_pinyin or '', person.name_initials or '')
+
+
+def matches(text, needle, pinyin):
+    haystack, name_pinyin, name_initials = text
+    return needle in haystack or (pinyin and (name_pinyin.startswith(needle) or name_initials.startswith(needle)))
+
+
+class PrefixCache:
+    """搜索结果缓存：新关键字以已缓存的关键字开头时，在已有结果中收窄，不再查询数据库"""
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # (范围, 关键字) -> (结果, 检索文本)
+
+    def clear(self):
+        self._entries.clear()
+
+    def store(self, scope, text, rows, texts=None):
+        self._entries[(scope, text)] = (rows, texts if texts is not None else [search_text(row) for row in rows])
+        self._entries.move_to_end((scope, text))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def lookup(self, scope, text):
+        """命中时返回结果列表，否则返回 None"""
+        exact = self._entries.get((scope, text))
+        if exact is not None:
+            self._entries.move_to_end((scope, text))
+            return exact[0]
+        # 选用最长的可收窄关键字，候选集最小；拼音按前缀匹配，只有前缀关系才能保证是子集
+        base = None
+        for (entry_scope, entry_text), entry in self._entries.items():
+            if entry_scope == scope and text.startswith(entry_text) and (base is None or len(entry_text) > len(base[0])):
+                base = (entry_text, entry)
+        if base is None:
+            return None
+        rows, texts = base[1]
+        needle, pinyin = text.lower(), is_pinyin_query(text)
+        hits = [i for i, entry_texts in enumerate(texts) if matches(entry_texts, needle, pinyin)]
+        if len(hits) == len(rows):
+            narrowed, narrowed_texts = rows, texts
+        else:
+            narrowed, narrowed_texts = [rows[i] for i in hits], [texts[i] for i in hits]
+        self.store(scope, text, narrowed, narrowed_texts)
+        return narrowed
+
+
+class LiveSearch:
+    """输入即搜索：缓存可收窄时立即显示；否则防抖后在后台线程查询，过期的查询结果直接丢弃
+
+    request() 在界面线程中调用，返回 (范围, 关键字, 查询函数)；查询函数在后台线程执行。
+    render(rows) 在界面线程中显示结果。
+    """
+
+    def __init__(self, widget, request, render, delay=200):
+        self.widget = widget
+        self.request = request
+        self.render = render
+        self.delay = delay
+        self.cache = PrefixCache()
+        self._last = None  # 最近一次请求的 (范围, 关键字)
+        self._token = 0
+        self._pending = None
+        self._future = None
+
+    def on_key(self, event=None):
+        started = time.perf_counter()
+        scope, text, loader = self.request()
+        if (scope, text) == self._last:
+            # 方向键等不改变内容的按键，或与正在进行的查询相同
+            return
+        self._last = (scope, text)
+        self._token += 1
+        if self._pending:
+            self.widget.after_cancel(self._pending)
+            self._pending = None
+        rows = self.cache.lookup(scope, text)
+        if rows is not None:
+            self._cancel_inflight()
+            self.render(rows)
+            logging.debug(f"即时搜索命中缓存：{text!r}，{len(rows)} 条，耗时 {(time.perf_counter() - started) * 1000:.1f} 毫秒")
+            return
+        token = self._token
+        self._pending = self.widget.after(self.delay, lambda: self._start(token, scope, text, loader))
+
+    def _cancel_inflight(self):
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def _start(self, token, scope, text, loader):
+        self._pending = None
+        self._cancel_inflight()
+        self._future = _executor.submit(loader)
+        self._poll(token, scope, text, self._future, time.perf_counter())
+
+    def _poll(self, token, scope, text, future, started):
+        if token != self._token or future.cancelled():
+            return
+        if not future.done():
+            self.widget.after(10, lambda: self._poll(token, scope, text, future, started))
+            return
+        self._future = None
+        try:
+            rows = future.result()
+        except Exception as e:
+            logging.error(f"即时搜索失败：{str(e)}")
+            self._last = None
+            return
+        self.cache.store(scope, text, rows)
+        self.render(rows)
+        logging.debug(f"即时搜索查询：{text!r}，{len(rows)} 条，耗时 {(time.perf_counter() - started) * 1000:.1f} 毫秒")
+
+    def remember(self, scope, text, rows):
+        """记录同步查询的结果，后续输入可在其上收窄"""
+        self._token += 1
+        self._cancel_inflight()
+        self.cache.store(scope, text, rows)
+        self._last = (scope, text)
+
+    def invalidate(self):
+        """数据变更后清空缓存"""
+        self._token += 1
+        self._cancel_inflight()
+        self.cache.clear()
+        self._last = None
@@ -12,6 +12,8 @@ from reportlab.platypus import Paragraph
 from reportlab.lib.styles import ParagraphStyle
 import logging
 import sqlite3
+import database
+from models import FIELD_LABELS, BASIC_DETAIL_FIELDS, EXTRA_DETAIL_FIELDS
 
 try:
     pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
@@ -25,7 +27,7 @@ def hash_password(password):
 
 def check_password(input_password):
     try:
-        with sqlite3.connect('hr_data.db') as conn:
+        with database.connect() as conn:
             c = conn.cursor()
             c.execute("SELECT password_hash FROM users WHERE id=1")
             stored_hash = c.fetchone()
@@ -38,7 +40,7 @@ def check_password(input_password):
 
 def save_password(new_password):
     try:
-        with sqlite3.connect('hr_data.db') as conn:
+        with database.write_connection() as conn:
             c = conn.cursor()
             c.execute("UPDATE users SET password_hash=? WHERE id=1", (hash_password(new_password),))
             if conn.total_changes == 0:
@@ -78,7 +80,16 @@ def delete_photo(photo_path_var, photo_label):
 
 def backup_data(backup_path):
     if backup_path:
-        shutil.copy('hr_data.db', backup_path)
+        # 使用 SQLite 在线备份，其他进程写入时也能得到一致的副本
+        if os.path.exists(backup_path):
+            os.remove(backup_path)
+        source = database.connect()
+        target = sqlite3.connect(backup_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
         logging.info("数据备份完成")
         return "数据已备份！", None
     return None, "未选择备份路径"
@@ -120,20 +131,18 @@ def export_person_data(person, from_talent=False, file_path=None):
         photo_x = width - margin - 35 * mm
         photo_y = y - 35 * mm
         c.rect(photo_x, photo_y, 25 * mm, 35 * mm)
-        has_photo = person[-1] and os.path.exists(person[-1])
+        has_photo = person.photo_path and os.path.exists(person.photo_path)
         if has_photo:
-            c.drawImage(person[-1], photo_x, photo_y, width=25 * mm, height=35 * mm, preserveAspectRatio=True)
+            c.drawImage(person.photo_path, photo_x, photo_y, width=25 * mm, height=35 * mm, preserveAspectRatio=True)
         else:
             c.setFont(DEFAULT_FONT, 10)
             c.drawCentredString(photo_x + 12.5 * mm, photo_y + 17.5 * mm, "无照片")
 
-        basic_fields = ['真实姓名', '性别', '年龄', '身份证号', '手机号', '分会职务', '在职状态']
         c.setFont(DEFAULT_FONT, 10)
         label_width = 25 * mm
-        field_indices = [1, 2, 3, 4, 5, 13, 14]
-        for i, field in enumerate(basic_fields):
-            label = f"{field}："
-            value = str(person[field_indices[i]]) if person[field_indices[i]] else "无"
+        for field in BASIC_DETAIL_FIELDS:
+            label = f"{FIELD_LABELS[field]}："
+            value = str(getattr(person, field)) if getattr(person, field) else "无"
             c.drawRightString(x + label_width, y, label)
             c.drawString(x + label_width + 2 * mm, y, value)
             y -= 8 * mm
@@ -146,14 +155,19 @@ def export_person_data(person, from_talent=False, file_path=None):
         c.line(x, y, x + content_width, y)
         y -= 10 * mm
         c.setFont(DEFAULT_FONT, 9)
-        detail_fields = ['省份', '城市', '昵称', '学历', '政治面貌', '个人职业', '加入组织时间', '跟捐天数', '家庭住址']
-        field_indices = [6, 7, 9, 10, 11, 12, 15, 16, 17]
-        for i, field in enumerate(detail_fields):
-            label = f"{field}："
-            value = str(person[field_indices[i]]) if person[field_indices[i]] else "无"
+        for field in EXTRA_DETAIL_FIELDS:
+            label = f"{FIELD_LABELS[field]}："
+            value = str(getattr(person, field)) if getattr(person, field) else "无"
             c.drawRightString(x + label_width, y, label)
             c.drawString(x + label_width + 2 * mm, y, value)
             y -= 8 * mm
+        for key, value in person.extra_attributes().items():
+            if y < margin + 10 * mm:
+                new_page()
+                c.setFont(DEFAULT_FONT, 9)
+            c.drawRightString(x + label_width, y, f"{key}：")
+            c.drawString(x + label_width + 2 * mm, y, str(value) if value else "无")
+            y -= 8 * mm
 
         y -= 12.5 * mm
         c.setFont(DEFAULT_FONT, 13)
@@ -163,7 +177,7 @@ def export_person_data(person, from_talent=False, file_path=None):
         c.line(x, y, x + content_width, y)
         y -= 10 * mm
 
-        bio_text = person[-2] if person[-2] else "无"
+        bio_text = person.bio if person.bio else "无"
         style = ParagraphStyle(name='Normal', fontName=DEFAULT_FONT, fontSize=9, leading=14)
         paragraphs = bio_text.split('\n')
         page_bottom = margin + 10 * mm
@@ -184,11 +198,7 @@ def export_person_data(person, from_talent=False, file_path=None):
             c.line(x, y, x + content_width, y)
             y -= 10 * mm
 
-            with sqlite3.connect('hr_data.db') as conn:
-                c_db = conn.cursor()
-                c_db.execute("SELECT reason FROM talent_pool WHERE person_id=?", (person[0],))
-                reason = c_db.fetchone()
-            reason_text = reason[0] if reason and reason[0] else "无"
+            reason_text = person.talent_reason if person.talent_reason else "无"
             paragraphs = reason_text.split('\n')
             for para_text in paragraphs:
                 para = Paragraph(para_text, style)